@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0002_url_index"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.db.search_index import create_search_index_ddl
+    from app.models import url_index, url_index_state
+
+    # 0001 creates tables from current metadata, so only create what is missing
+    existing = set(inspect(bind).get_table_names())
+    for table in (url_index, url_index_state):
+        if table.name not in existing:
+            table.create(bind)
+    create_search_index_ddl(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    from app.models import url_index, url_index_state
+
+    if bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS url_index_fts")
+    else:
+        op.execute("DROP INDEX IF EXISTS ix_url_index_tsv")
+    url_index_state.drop(bind, checkfirst=True)
+    url_index.drop(bind, checkfirst=True)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0003_urls"
+down_revision = "0002_url_index"
+branch_labels = None
+depends_on = None
+
+_RESULT_TABLES = ("search_results_raw", "search_results_processed")
+_INDEX = {"search_results_raw": "ix_raw_url_id", "search_results_processed": "ix_processed_url_id"}
+_TMP_INDEX = "ix_urls_url_backfill"
+_BATCH = 1000
+
+
+def _backfill_urls(bind: sa.Connection, table: str) -> None:
+    """Insert each distinct URL of `table` into `urls` (hashes are computed in Python)."""
+    from app.core.hashing import url_key
+    from app.models import urls
+
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(urls).on_conflict_do_nothing(index_elements=["url_hash"])
+
+    result = bind.execution_options(stream_results=True).execute(sa.text(f"SELECT DISTINCT url FROM {table}"))
+    for chunk in result.partitions(_BATCH):
+        bind.execute(stmt, [{"url_hash": url_key(r[0]), "url": r[0]} for r in chunk])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import urls
+
+    insp = inspect(bind)
+    if "urls" not in insp.get_table_names():
+        urls.create(bind)
+
+    pending = [t for t in _RESULT_TABLES if "url_id" not in {c["name"] for c in insp.get_columns(t)}]
+    if not pending:
+        return
+
+    # Temporary lookup index so the correlated backfill UPDATE is not quadratic
+    using = " USING hash" if bind.dialect.name == "postgresql" else ""
+    op.execute(f"CREATE INDEX IF NOT EXISTS {_TMP_INDEX} ON urls{using} (url)")
+    for table in pending:
+        _backfill_urls(bind, table)
+        op.add_column(table, sa.Column("url_id", sa.Integer(), nullable=True))
+        op.execute(f"UPDATE {table} SET url_id = (SELECT u.id FROM urls u WHERE u.url = {table}.url)")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("url_id", existing_type=sa.Integer(), nullable=False)
+            batch.create_foreign_key(f"fk_{table}_url_id", "urls", ["url_id"], ["id"])
+            batch.drop_column("url")
+        op.create_index(_INDEX[table], table, ["url_id"])
+    op.execute(f"DROP INDEX IF EXISTS {_TMP_INDEX}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = inspect(bind)
+    for table in _RESULT_TABLES:
+        if "url_id" not in {c["name"] for c in insp.get_columns(table)}:
+            continue
+        op.add_column(table, sa.Column("url", sa.Text(), nullable=True))
+        op.execute(f"UPDATE {table} SET url = (SELECT u.url FROM urls u WHERE u.id = {table}.url_id)")
+        op.drop_index(_INDEX[table], table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("url", existing_type=sa.Text(), nullable=False)
+            fks = [fk["name"] for fk in insp.get_foreign_keys(table) if fk["referred_table"] == "urls"]
+            for name in fks:
+                if name:
+                    batch.drop_constraint(name, type_="foreignkey")
+            batch.drop_column("url_id")
+    op.drop_table("urls")
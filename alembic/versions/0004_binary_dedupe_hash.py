@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0004_binary_dedupe_hash"
+down_revision = "0003_urls"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_results_processed"
+_UQ = "uq_processed_run_dedupe"
+_BATCH = 1000
+
+
+def _dedupe_type(bind: sa.Connection) -> sa.types.TypeEngine:
+    col = next(c for c in inspect(bind).get_columns(_TABLE) if c["name"] == "dedupe_hash")
+    return col["type"]
+
+
+def _recompute(bind: sa.Connection, column: str, digest: Callable[[str], bytes | str]) -> None:
+    """Fill `column` for every processed row from its URL (hashes are computed in Python)."""
+    rows = bind.execution_options(stream_results=True).execute(
+        sa.text(f"SELECT p.id, u.url FROM {_TABLE} p JOIN urls u ON u.id = p.url_id")
+    )
+    stmt = sa.text(f"UPDATE {_TABLE} SET {column} = :h WHERE id = :id")
+    for chunk in rows.partitions(_BATCH):
+        bind.execute(stmt, [{"id": r[0], "h": digest(r[1])} for r in chunk])
+
+
+def _swap(
+    bind: sa.Connection, new_type: sa.types.TypeEngine, digest: Callable[[str], bytes | str]
+) -> None:
+    op.add_column(_TABLE, sa.Column("dedupe_hash_new", new_type, nullable=True))
+    _recompute(bind, "dedupe_hash_new", digest)
+    with op.batch_alter_table(_TABLE) as batch:
+        batch.drop_constraint(_UQ, type_="unique")
+        batch.drop_column("dedupe_hash")
+    with op.batch_alter_table(_TABLE) as batch:
+        batch.alter_column(
+            "dedupe_hash_new", new_column_name="dedupe_hash", existing_type=new_type, nullable=False
+        )
+    with op.batch_alter_table(_TABLE) as batch:
+        batch.create_unique_constraint(_UQ, ["run_id", "dedupe_hash"])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if isinstance(_dedupe_type(bind), sa.LargeBinary):
+        return  # created from current metadata
+    from app.core.hashing import dedupe_key
+
+    _swap(bind, sa.LargeBinary(8), dedupe_key)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not isinstance(_dedupe_type(bind), sa.LargeBinary):
+        return
+    from app.core.hashing import url_hash
+
+    _swap(bind, sa.Text(), url_hash)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0005_run_listing_indexes"
+down_revision = "0004_binary_dedupe_hash"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_runs"
+_INDEXES = {
+    "ix_runs_timestamp_id": ["run_timestamp", "id"],
+    "ix_runs_query_hash_timestamp_id": ["query_hash", "run_timestamp", "id"],
+}
+_BATCH = 1000
+
+
+def _backfill_query_hash(bind: sa.Connection) -> None:
+    from app.core.hashing import query_key
+
+    rows = bind.execution_options(stream_results=True).execute(sa.text(f"SELECT id, query FROM {_TABLE}"))
+    stmt = sa.text(f"UPDATE {_TABLE} SET query_hash = :h WHERE id = :id")
+    for chunk in rows.partitions(_BATCH):
+        bind.execute(stmt, [{"id": r[0], "h": query_key(r[1])} for r in chunk])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if "query_hash" not in {c["name"] for c in insp.get_columns(_TABLE)}:
+        op.add_column(_TABLE, sa.Column("query_hash", sa.LargeBinary(8), nullable=True))
+        _backfill_query_hash(bind)
+        with op.batch_alter_table(_TABLE) as batch:
+            batch.alter_column("query_hash", existing_type=sa.LargeBinary(8), nullable=False)
+    if bind.dialect.name == "sqlite":
+        # CURRENT_TIMESTAMP defaults have no fraction; SQLAlchemy binds always carry
+        # microseconds, and the two formats do not compare correctly as text.
+        op.execute(
+            f"UPDATE {_TABLE} SET run_timestamp = strftime('%Y-%m-%d %H:%M:%f000', run_timestamp) "
+            "WHERE run_timestamp NOT LIKE '%.%'"
+        )
+    existing = {i["name"] for i in inspect(bind).get_indexes(_TABLE)}
+    for name, cols in _INDEXES.items():
+        if name not in existing:
+            op.create_index(name, _TABLE, cols)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = inspect(bind)
+    existing = {i["name"] for i in insp.get_indexes(_TABLE)}
+    for name in _INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name=_TABLE)
+    if "query_hash" in {c["name"] for c in insp.get_columns(_TABLE)}:
+        with op.batch_alter_table(_TABLE) as batch:
+            batch.drop_column("query_hash")
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0006_run_snapshot"
+down_revision = "0005_run_listing_indexes"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_runs"
+
+
+def _has_snapshot(bind: sa.Connection) -> bool:
+    return "snapshot" in {c["name"] for c in inspect(bind).get_columns(_TABLE)}
+
+
+def upgrade() -> None:
+    # Existing runs keep NULL and are rebuilt from their normalized rows on read
+    if not _has_snapshot(op.get_bind()):
+        op.add_column(_TABLE, sa.Column("snapshot", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_snapshot(op.get_bind()):
+        with op.batch_alter_table(_TABLE) as batch:
+            batch.drop_column("snapshot")
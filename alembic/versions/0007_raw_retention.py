@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0007_raw_retention"
+down_revision = "0006_run_snapshot"
+branch_labels = None
+depends_on = None
+
+_RAW = "search_results_raw"
+_LEGACY = "search_results_raw_legacy"
+_SEQ = "search_results_raw_id_seq"
+_COLS = "id, run_id, provider, url_id, rank, meta, inserted_at"
+_MONTHS_AHEAD = 2
+
+_CREATE_RAW = """
+CREATE TABLE {table} (
+    id INTEGER NOT NULL DEFAULT nextval('{seq}'),
+    run_id INTEGER NOT NULL REFERENCES search_runs (id) ON DELETE CASCADE,
+    provider VARCHAR(50) NOT NULL,
+    url_id INTEGER NOT NULL REFERENCES urls (id),
+    rank INTEGER,
+    meta JSON,
+    inserted_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+    CONSTRAINT {pk} PRIMARY KEY ({pk_cols})
+){suffix}
+"""
+
+
+def _relkind(bind: sa.Connection) -> str | None:
+    return bind.execute(sa.text(f"SELECT relkind FROM pg_class WHERE relname = '{_RAW}'")).scalar()
+
+
+def _swap_raw(bind: sa.Connection, partitioned: bool) -> None:
+    """Rebuild search_results_raw (partitioned or plain) and copy the rows across."""
+    op.execute(f"ALTER SEQUENCE {_SEQ} OWNED BY NONE")
+    op.execute(f"ALTER TABLE {_RAW} RENAME TO {_LEGACY}")
+    # Constraint/index names are schema-wide; the originals go with the legacy table
+    op.execute("ALTER INDEX IF EXISTS ix_raw_run_provider RENAME TO ix_raw_run_provider_legacy")
+    op.execute("ALTER INDEX IF EXISTS ix_raw_url_id RENAME TO ix_raw_url_id_legacy")
+    if partitioned:
+        # The partition key has to be part of the primary key
+        op.execute(
+            _CREATE_RAW.format(
+                table=_RAW, seq=_SEQ, pk=f"pk_{_RAW}", pk_cols="id, inserted_at",
+                suffix=" PARTITION BY RANGE (inserted_at)",
+            )
+        )
+        from app.db.retention import raw_partition_ddl, raw_partition_months
+
+        now = datetime.now(UTC).replace(tzinfo=None)
+        first = bind.execute(sa.text(f"SELECT min(inserted_at) FROM {_LEGACY}")).scalar() or now
+        for month in raw_partition_months(first, now, _MONTHS_AHEAD):
+            op.execute(raw_partition_ddl(month)[1])
+        # Catches rows outside the prepared months until the retention job creates them
+        op.execute(f"CREATE TABLE IF NOT EXISTS {_RAW}_default PARTITION OF {_RAW} DEFAULT")
+    else:
+        op.execute(
+            _CREATE_RAW.format(table=_RAW, seq=_SEQ, pk=f"{_RAW}_pkey", pk_cols="id", suffix="")
+        )
+    op.execute(f"INSERT INTO {_RAW} ({_COLS}) SELECT {_COLS} FROM {_LEGACY}")
+    op.execute(f"DROP TABLE {_LEGACY}")
+    op.execute(f"ALTER SEQUENCE {_SEQ} OWNED BY {_RAW}.id")
+    op.execute(f"CREATE INDEX ix_raw_run_provider ON {_RAW} (run_id, provider)")
+    op.execute(f"CREATE INDEX ix_raw_url_id ON {_RAW} (url_id)")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import search_raw_archive
+
+    if "search_raw_archive" not in inspect(bind).get_table_names():
+        search_raw_archive.create(bind)
+    # Postgres: monthly range partitions so retention drops old raw rows as metadata
+    if bind.dialect.name == "postgresql" and _relkind(bind) != "p":
+        _swap_raw(bind, partitioned=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and _relkind(bind) == "p":
+        _swap_raw(bind, partitioned=False)
+    op.execute("DROP TABLE IF EXISTS search_raw_archive")
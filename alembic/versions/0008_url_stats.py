@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0008_url_stats"
+down_revision = "0007_raw_retention"
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+
+
+def _backfill(bind: sa.Connection) -> None:
+    """Aggregate existing processed rows per URL (masks are computed in Python)."""
+    from app.core.providers import provider_mask
+    from app.models import url_stats
+
+    rows = bind.execution_options(stream_results=True).execute(
+        sa.text(
+            "SELECT p.url_id, p.providers, r.run_timestamp, r.id FROM search_results_processed p "
+            "JOIN search_runs r ON r.id = p.run_id ORDER BY p.url_id, r.run_timestamp, r.id"
+        ).columns(
+            sa.column("url_id", sa.Integer),
+            sa.column("providers", sa.JSON),
+            sa.column("run_timestamp", sa.DateTime),
+            sa.column("id", sa.Integer),
+        )
+    )
+    pending: list[dict] = []
+    cur: dict | None = None
+    for url_id, providers, ts, run_id in rows:
+        if cur is None or cur["url_id"] != url_id:
+            cur = {
+                "url_id": url_id,
+                "first_seen": ts,
+                "last_seen": ts,
+                "run_count": 0,
+                "provider_mask": 0,
+                "last_run_id": run_id,
+            }
+            pending.append(cur)
+        cur["last_seen"], cur["last_run_id"] = ts, run_id
+        cur["run_count"] += 1
+        cur["provider_mask"] |= provider_mask(providers)
+        if len(pending) > _BATCH:
+            bind.execute(url_stats.insert(), pending[:-1])
+            pending = pending[-1:]
+    if pending:
+        bind.execute(url_stats.insert(), pending)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import url_stats
+
+    if "url_stats" not in inspect(bind).get_table_names():
+        url_stats.create(bind)
+    if bind.execute(sa.text("SELECT count(*) FROM url_stats")).scalar() == 0:
+        _backfill(bind)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS url_stats")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0009_query_urls"
+down_revision = "0008_url_stats"
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+
+
+def _backfill(bind: sa.Connection) -> None:
+    """Oldest run first, so insert-or-ignore leaves each URL's first run per query."""
+    from app.db.novelty import novelty_key
+    from app.models import query_urls
+
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(query_urls).on_conflict_do_nothing()
+
+    rows = bind.execution_options(stream_results=True).execute(
+        sa.text(
+            "SELECT r.id, r.query, p.url_id FROM search_results_processed p "
+            "JOIN search_runs r ON r.id = p.run_id ORDER BY r.run_timestamp, r.id"
+        )
+    )
+    keys: dict[str, bytes] = {}
+    for chunk in rows.partitions(_BATCH):
+        values = []
+        for run_id, query, url_id in chunk:
+            key = keys.get(query)
+            if key is None:
+                key = keys[query] = novelty_key(query)
+            values.append({"query_hash": key, "url_id": url_id, "first_run_id": run_id})
+        bind.execute(stmt, values)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import query_urls
+
+    if "query_urls" not in inspect(bind).get_table_names():
+        query_urls.create(bind)
+    if bind.execute(sa.text("SELECT count(*) FROM query_urls")).scalar() == 0:
+        _backfill(bind)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS query_urls")
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0010_provider_payloads"
+down_revision = "0009_query_urls"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import provider_payloads, run_payloads
+
+    tables = inspect(bind).get_table_names()
+    # Nothing to backfill: bodies were never kept before this revision
+    if "provider_payloads" not in tables:
+        provider_payloads.create(bind)
+    if "run_payloads" not in tables:
+        run_payloads.create(bind)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS run_payloads")
+    op.execute("DROP TABLE IF EXISTS provider_payloads")
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0011_processed_score"
+down_revision = "0010_provider_payloads"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_results_processed"
+
+
+def _has_score(bind: sa.Connection) -> bool:
+    return "score" in {c["name"] for c in inspect(bind).get_columns(_TABLE)}
+
+
+def upgrade() -> None:
+    # Existing rows keep NULL; `python -m app.cli reprocess` scores (and truncates) them
+    if not _has_score(op.get_bind()):
+        op.add_column(_TABLE, sa.Column("score", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_score(op.get_bind()):
+        with op.batch_alter_table(_TABLE) as batch:
+            batch.drop_column("score")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0012_commit_seq"
+down_revision = "0011_processed_score"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_runs"
+_INDEX = "ix_runs_commit_seq"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.models import commit_sequence
+
+    insp = inspect(bind)
+    if commit_sequence.name not in insp.get_table_names():
+        commit_sequence.create(bind)
+    if "commit_seq" not in {c["name"] for c in insp.get_columns(_TABLE)}:
+        op.add_column(_TABLE, sa.Column("commit_seq", sa.Integer(), nullable=True))
+    if _INDEX not in {i["name"] for i in inspect(bind).get_indexes(_TABLE)}:
+        op.create_index(_INDEX, _TABLE, ["commit_seq"])
+
+    # Runs already committed keep their id order; the counter continues above them
+    op.execute(f"UPDATE {_TABLE} SET commit_seq = id WHERE commit_seq IS NULL")
+    top = bind.execute(sa.text(f"SELECT coalesce(max(commit_seq), 0) FROM {_TABLE}")).scalar_one()
+    if bind.execute(sa.text("SELECT 1 FROM commit_sequence WHERE name = 'commit'")).first() is None:
+        bind.execute(sa.text("INSERT INTO commit_sequence (name, value) VALUES ('commit', :v)"), {"v": top})
+    else:
+        bind.execute(
+            sa.text("UPDATE commit_sequence SET value = :v WHERE name = 'commit' AND value < :v"), {"v": top}
+        )
+
+    # The local index watermark moves from raw ids to run commit order: resume at the
+    # first run with raw rows past the old watermark (re-folding it is harmless)
+    if "url_index_state" in insp.get_table_names():
+        last_raw = bind.execute(
+            sa.text("SELECT last_id FROM url_index_state WHERE source = 'raw'")
+        ).scalar_one_or_none()
+        has_runs = bind.execute(sa.text("SELECT 1 FROM url_index_state WHERE source = 'runs'")).first()
+        if last_raw is not None and has_runs is None:
+            first_pending = bind.execute(
+                sa.text("SELECT min(run_id) FROM search_results_raw WHERE id > :last"), {"last": last_raw}
+            ).scalar_one()
+            last_run = first_pending - 1 if first_pending is not None else top
+            bind.execute(
+                sa.text("INSERT INTO url_index_state (source, last_id) VALUES ('runs', :v)"), {"v": last_run}
+            )
+        op.execute("DELETE FROM url_index_state WHERE source = 'raw'")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    from app.models import commit_sequence
+
+    insp = inspect(bind)
+    if "url_index_state" in insp.get_table_names():
+        # Re-index everything on the next raw-id refresh rather than guess a raw watermark
+        op.execute("DELETE FROM url_index_state WHERE source = 'runs'")
+    if _INDEX in {i["name"] for i in insp.get_indexes(_TABLE)}:
+        op.drop_index(_INDEX, table_name=_TABLE)
+    if "commit_seq" in {c["name"] for c in insp.get_columns(_TABLE)}:
+        with op.batch_alter_table(_TABLE) as batch:
+            batch.drop_column("commit_seq")
+    commit_sequence.drop(bind, checkfirst=True)
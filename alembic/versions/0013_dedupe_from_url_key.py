@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Callable
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "0013_dedupe_from_url_key"
+down_revision = "0012_commit_seq"
+branch_labels = None
+depends_on = None
+
+_TABLE = "search_results_processed"
+_BATCH = 1000
+
+
+def _recompute(bind: sa.Connection, digest: Callable[[str, bytes], bytes]) -> None:
+    """Rewrite dedupe_hash of every processed row from its URL's (url, url_hash)."""
+    rows = bind.execution_options(stream_results=True).execute(
+        sa.text(f"SELECT p.id, u.url, u.url_hash FROM {_TABLE} p JOIN urls u ON u.id = p.url_id")
+    )
+    stmt = sa.text(f"UPDATE {_TABLE} SET dedupe_hash = :h WHERE id = :id")
+    for chunk in rows.partitions(_BATCH):
+        bind.execute(stmt, [{"id": r[0], "h": digest(r[1], bytes(r[2]))} for r in chunk])
+
+
+def upgrade() -> None:
+    from app.core.hashing import DEDUPE_BYTES
+
+    # dedupe_hash becomes a prefix of urls.url_hash, so no URL is hashed twice
+    _recompute(op.get_bind(), lambda url, key: key[:DEDUPE_BYTES])
+
+
+def downgrade() -> None:
+    # Separate 8-byte BLAKE2b digest, as written before
+    _recompute(op.get_bind(), lambda url, key: hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest())
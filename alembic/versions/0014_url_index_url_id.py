@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0014_url_index_url_id"
+down_revision = "0013_dedupe_from_url_key"
+branch_labels = None
+depends_on = None
+
+_TABLE = "url_index"
+# Rows are staged here while url_index is recreated under its own name
+_STAGE = "url_index_rekey"
+_BATCH = 1000
+
+# url_index before 0014: its own copy of the URL text, keyed by SHA-1 hex
+_legacy = sa.MetaData()
+_LEGACY_INDEX = sa.Table(
+    _TABLE,
+    _legacy,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column("url_hash", sa.String(64), nullable=False, unique=True),
+    sa.Column("url", sa.Text, nullable=False),
+    sa.Column("title", sa.Text, nullable=True),
+    sa.Column("snippet", sa.Text, nullable=True),
+    sa.Column("seen_count", sa.Integer, nullable=False, server_default="0"),
+    sa.Column("last_run_id", sa.Integer, nullable=True),
+    sa.Column("updated_at", sa.DateTime(timezone=False), server_default=sa.func.now(), nullable=False),
+)
+_LEGACY_PG_DOC = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(snippet, '') || ' ' || url)"
+_FIELDS = ("title", "snippet", "seen_count", "last_run_id", "updated_at")
+_COLUMNS = ", ".join(_FIELDS)
+
+
+def _stage(key: sa.Column) -> sa.Table:
+    return sa.Table(
+        _STAGE,
+        sa.MetaData(),
+        key,
+        sa.Column("title", sa.Text),
+        sa.Column("snippet", sa.Text),
+        sa.Column("seen_count", sa.Integer),
+        sa.Column("last_run_id", sa.Integer),
+        sa.Column("updated_at", sa.DateTime(timezone=False)),
+    )
+
+
+def _drop_documents(bind: sa.Connection) -> None:
+    if bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS url_index_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_url_index_tsv")
+        op.execute("DROP INDEX IF EXISTS ix_url_index_document")
+
+
+def _url_ids(bind: sa.Connection, texts: list[str]) -> dict[str, int]:
+    """{url: urls.id}, inserting URLs that have no `urls` row yet."""
+    from app.core.hashing import url_key
+    from app.models import urls
+
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    keys = {url_key(u): u for u in texts}
+    bind.execute(
+        insert(urls).on_conflict_do_nothing(index_elements=["url_hash"]),
+        [{"url_hash": k, "url": u} for k, u in keys.items()],
+    )
+    rows = bind.execute(sa.select(urls.c.id, urls.c.url_hash).where(urls.c.url_hash.in_(list(keys))))
+    return {keys[bytes(h)]: i for i, h in rows}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    from app.db.search_index import create_search_index_ddl, rebuild_search_documents
+    from app.models import url_index
+
+    insp = inspect(bind)
+    if _TABLE in insp.get_table_names() and "url_id" in {c["name"] for c in insp.get_columns(_TABLE)}:
+        return
+    _drop_documents(bind)
+    if _TABLE in insp.get_table_names():
+        stage = _stage(sa.Column("url_id", sa.Integer))
+        stage.create(bind)
+        old = _LEGACY_INDEX.c
+        rows = bind.execution_options(stream_results=True).execute(
+            sa.select(old.url, *(old[f] for f in _FIELDS))
+        )
+        for chunk in rows.partitions(_BATCH):
+            ids = _url_ids(bind, [r.url for r in chunk])
+            bind.execute(
+                stage.insert(), [{"url_id": ids[r.url], **{f: r._mapping[f] for f in _FIELDS}} for r in chunk]
+            )
+        op.drop_table(_TABLE)
+        url_index.create(bind)
+        op.execute(f"INSERT INTO {_TABLE} (url_id, {_COLUMNS}) SELECT url_id, {_COLUMNS} FROM {_STAGE}")
+        op.drop_table(_STAGE)
+    else:
+        url_index.create(bind)
+    create_search_index_ddl(bind)
+    rebuild_search_documents(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    from app.core.hashing import url_hash
+
+    _drop_documents(bind)
+    stage = _stage(sa.Column("url", sa.Text))
+    stage.create(bind)
+    selected = ", ".join(f"i.{c}" for c in _FIELDS)
+    op.execute(
+        f"INSERT INTO {_STAGE} (url, {_COLUMNS}) "
+        f"SELECT u.url, {selected} FROM {_TABLE} i JOIN urls u ON u.id = i.url_id"
+    )
+    op.drop_table(_TABLE)
+    _LEGACY_INDEX.create(bind)
+    rows = bind.execution_options(stream_results=True).execute(
+        sa.select(stage.c.url, *(stage.c[f] for f in _FIELDS))
+    )
+    for chunk in rows.partitions(_BATCH):
+        bind.execute(_LEGACY_INDEX.insert(), [{"url_hash": url_hash(r.url), **r._mapping} for r in chunk])
+    op.drop_table(_STAGE)
+
+    # Full-text structures as 0002 created them
+    if bind.dialect.name == "sqlite":
+        try:
+            op.execute(
+                "CREATE VIRTUAL TABLE url_index_fts USING fts5(title, snippet, url, tokenize='unicode61')"
+            )
+        except sa.exc.DBAPIError:
+            return
+        op.execute(
+            "INSERT INTO url_index_fts(rowid, title, snippet, url) "
+            f"SELECT id, coalesce(title, ''), coalesce(snippet, ''), url FROM {_TABLE}"
+        )
+    elif bind.dialect.name == "postgresql":
+        op.execute(f"CREATE INDEX ix_url_index_tsv ON {_TABLE} USING GIN ({_LEGACY_PG_DOC})")
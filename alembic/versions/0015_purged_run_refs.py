@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision = "0015_purged_run_refs"
+down_revision = "0014_url_index_url_id"
+branch_labels = None
+depends_on = None
+
+# Run ids kept without a foreign key; retention.purge_runs nulls them with the run
+_REFS = {
+    "url_stats": ("last_run_id", "ix_url_stats_last_run_id"),
+    "query_urls": ("first_run_id", "ix_query_urls_first_run_id"),
+    "url_index": ("last_run_id", "ix_url_index_last_run_id"),
+}
+# Were NOT NULL before 0015
+_REQUIRED = ("url_stats", "query_urls")
+# Created here; ix_query_urls_first_run_id comes with the table (0009)
+_NEW_INDEXES = ("ix_url_stats_last_run_id", "ix_url_index_last_run_id")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    for table in _REQUIRED:
+        column = _REFS[table][0]
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, existing_type=sa.Integer(), nullable=True)
+    for table, (column, index) in _REFS.items():
+        if table not in tables:
+            continue
+        # Runs purged before 0015 left these pointing at nothing (ids SQLite may reuse)
+        op.execute(
+            f"UPDATE {table} SET {column} = NULL WHERE {column} IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM search_runs r WHERE r.id = {table}.{column})"
+        )
+        if index in _NEW_INDEXES and index not in {i["name"] for i in insp.get_indexes(table)}:
+            op.create_index(index, table, [column])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    for table, (column, index) in _REFS.items():
+        if table in tables and index in _NEW_INDEXES:
+            if index in {i["name"] for i in insp.get_indexes(table)}:
+                op.drop_index(index, table_name=table)
+    for table in _REQUIRED:
+        column = _REFS[table][0]
+        # No run has id 0; it stands in for a purged run under NOT NULL
+        op.execute(f"UPDATE {table} SET {column} = 0 WHERE {column} IS NULL")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, existing_type=sa.Integer(), nullable=False)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Protocol, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Protocol, Sequence
 
 from app.core.placeholders import expand_date_placeholder
 from app.core.schema import ProviderNeutralQuery
@@ -13,9 +13,39 @@ class ProviderResult:
     query_used: str
     urls: Sequence[str]
     meta: dict
+    # Per-URL extras aligned with `urls` (title/snippet when the provider returns them)
+    details: Sequence[dict[str, Any]] = field(default_factory=list)
+    # Decoded response body as received, for the payload archive (app/db/payloads.py)
+    payload: dict[str, Any] | None = None
+    # Index of the site OR-group when the orchestrator sharded the call
+    shard: int | None = None
 
 
-def build_query_from_schema(schema: ProviderNeutralQuery) -> str:
+@dataclass(frozen=True)
+class QueryLimits:
+    """Upper bounds a provider accepts for the final `q` string."""
+
+    max_chars: int
+    max_words: int | None = None
+
+    def fits(self, query: str) -> bool:
+        if len(query) > self.max_chars:
+            return False
+        return self.max_words is None or len(query.split()) <= self.max_words
+
+
+# Google-style limits (2048-char URL budget, 32 significant words)
+DEFAULT_QUERY_LIMITS = QueryLimits(max_chars=2048, max_words=32)
+
+
+def _site_terms(sites: Sequence[str], site_join: str) -> list[str]:
+    terms = [f"site:{s}" for s in sites]
+    if site_join == "OR" and len(terms) > 1:
+        return ["(" + " OR ".join(terms) + ")"]
+    return terms
+
+
+def build_query_from_schema(schema: ProviderNeutralQuery, options: dict | None = None) -> str:
     # Keywords
     if schema.boolean == "OR":
         core = " OR ".join(schema.keywords)
@@ -24,9 +54,10 @@ def build_query_from_schema(schema: ProviderNeutralQuery) -> str:
 
     parts: list[str] = [core]
 
-    # Sites
+    # Sites (space-joined = implicit AND unless the caller asks for an OR-group)
     if schema.filters.sites:
-        parts.extend([f"site:{s}" for s in schema.filters.sites])
+        site_join = (options or {}).get("site_join", "AND")
+        parts.extend(_site_terms(schema.filters.sites, site_join))
 
     # Dates (after/before); expand placeholders to ISO if present
     if schema.filters.date_after:
@@ -46,6 +77,35 @@ def build_query_from_schema(schema: ProviderNeutralQuery) -> str:
     return " ".join([p for p in parts if p])
 
 
+def with_sites(schema: ProviderNeutralQuery, sites: list[str]) -> ProviderNeutralQuery:
+    """Copy of `schema` restricted to `sites` (other filters unchanged)."""
+    return schema.model_copy(update={"filters": schema.filters.model_copy(update={"sites": sites})})
+
+
+def shard_sites(schema: ProviderNeutralQuery, limits: QueryLimits = DEFAULT_QUERY_LIMITS) -> list[list[str]]:
+    """Greedily pack `filters.sites` into OR-groups whose full query fits `limits`.
+
+    Site order is preserved. A site that cannot fit even on its own still gets its
+    own group so no filter is silently dropped.
+    """
+    sites = list(schema.filters.sites)
+    if not sites:
+        return []
+
+    def fits(group: list[str]) -> bool:
+        return limits.fits(build_query_from_schema(with_sites(schema, group), {"site_join": "OR"}))
+
+    groups: list[list[str]] = []
+    current: list[str] = []
+    for site in sites:
+        if current and not fits([*current, site]):
+            groups.append(current)
+            current = []
+        current.append(site)
+    groups.append(current)
+    return groups
+
+
 class SearchProviderAdapter(Protocol):
     name: str
 
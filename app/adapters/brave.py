@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, ClassVar
 
 import httpx
 
-from app.adapters.base import ProviderResult, SearchProviderAdapter, build_query_from_schema
+from app.adapters.base import (
+    ProviderResult,
+    QueryLimits,
+    SearchProviderAdapter,
+    build_query_from_schema,
+)
 from app.core.schema import ProviderNeutralQuery
 from app.http.client import RetryPolicy, build_async_client, request_with_retries
 
@@ -36,9 +41,10 @@ class BraveAdapter(SearchProviderAdapter):
     client: httpx.AsyncClient | None = None
 
     name: str = "brave"
+    query_limits: ClassVar[QueryLimits] = QueryLimits(max_chars=400, max_words=50)
 
     async def search(self, schema: ProviderNeutralQuery, options: dict | None = None) -> ProviderResult:
-        query = build_query_from_schema(schema)
+        query = build_query_from_schema(schema, options)
         params: dict[str, Any] = {
             "q": query,
         }
@@ -63,7 +69,14 @@ class BraveAdapter(SearchProviderAdapter):
             policy=RetryPolicy(),
         )
         data = resp.json()
+        result = self.parse(data, query)
+        result.payload = data
+        return result
+
+    def parse(self, data: dict[str, Any], query: str) -> ProviderResult:
+        """Map a decoded response body to a ProviderResult (no I/O)."""
         urls: list[str] = []
+        details: list[dict[str, Any]] = []
         meta: dict[str, Any] = {}
         web = data.get("web") or {}
         results = web.get("results") or []
@@ -71,7 +84,10 @@ class BraveAdapter(SearchProviderAdapter):
             link = item.get("url")
             if link:
                 urls.append(link)
+                details.append({"title": item.get("title"), "snippet": item.get("description")})
         meta["queryUsed"] = query
         meta["raw_count"] = len(results)
-        return ProviderResult(provider=self.name, query_used=query, urls=urls, meta=meta)
+        return ProviderResult(
+            provider=self.name, query_used=query, urls=urls, meta=meta, details=details
+        )
 
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, ClassVar, Optional
 
 import httpx
 
-from app.adapters.base import ProviderResult, SearchProviderAdapter, build_query_from_schema
+from app.adapters.base import (
+    ProviderResult,
+    QueryLimits,
+    SearchProviderAdapter,
+    build_query_from_schema,
+)
 from app.core.schema import ProviderNeutralQuery
 from app.http.client import RetryPolicy, build_async_client, request_with_retries
 
@@ -26,9 +31,10 @@ class GoogleCSEAdapter(SearchProviderAdapter):
     client: httpx.AsyncClient | None = None
 
     name: str = "google"
+    query_limits: ClassVar[QueryLimits] = QueryLimits(max_chars=2048, max_words=32)
 
     async def search(self, schema: ProviderNeutralQuery, options: dict | None = None) -> ProviderResult:
-        query = build_query_from_schema(schema)
+        query = build_query_from_schema(schema, options)
         params: dict[str, Any] = {
             "key": self.api_key,
             "cx": self.cse_id,
@@ -51,14 +57,24 @@ class GoogleCSEAdapter(SearchProviderAdapter):
         )
 
         data = resp.json()
+        result = self.parse(data, query)
+        result.payload = data
+        return result
+
+    def parse(self, data: dict[str, Any], query: str) -> ProviderResult:
+        """Map a decoded response body to a ProviderResult (no I/O)."""
         urls: list[str] = []
+        details: list[dict[str, Any]] = []
         meta: dict[str, Any] = {}
         items = data.get("items") or []
         for item in items:
             link = item.get("link")
             if link:
                 urls.append(link)
+                details.append({"title": item.get("title"), "snippet": item.get("snippet")})
         meta["queryUsed"] = query
         meta["raw_count"] = len(items)
-        return ProviderResult(provider=self.name, query_used=query, urls=urls, meta=meta)
+        return ProviderResult(
+            provider=self.name, query_used=query, urls=urls, meta=meta, details=details
+        )
 
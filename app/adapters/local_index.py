@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, ClassVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.adapters.base import (
+    ProviderResult,
+    QueryLimits,
+    SearchProviderAdapter,
+    build_query_from_schema,
+)
+from app.core.schema import ProviderNeutralQuery
+from app.db.search_index import search_index
+from app.db.session import get_session_factory
+
+
+@dataclass
+class LocalIndexAdapter(SearchProviderAdapter):
+    """Zero-cost provider answering from URLs this service already harvested.
+
+    Put `local` first in `search.cascade_order` to surface known URLs without paying
+    an external provider; works fully offline. The index is kept current out of band
+    (config `local_index`, or `python -m app.cli index-refresh`).
+    """
+
+    session_factory: async_sessionmaker[AsyncSession] | None = None
+
+    name: str = "local"
+    query_limits: ClassVar[QueryLimits] = QueryLimits(max_chars=10_000)
+
+    async def search(self, schema: ProviderNeutralQuery, options: dict | None = None) -> ProviderResult:
+        query = build_query_from_schema(schema, options)
+        factory = self.session_factory or get_session_factory()
+        async with factory() as session:
+            urls = await search_index(session, schema, limit=schema.filters.max_results)
+        meta: dict[str, Any] = {"queryUsed": query, "raw_count": len(urls)}
+        return ProviderResult(provider=self.name, query_used=query, urls=urls, meta=meta)
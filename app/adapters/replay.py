@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.adapters.base import (
+    DEFAULT_QUERY_LIMITS,
+    ProviderResult,
+    QueryLimits,
+    build_query_from_schema,
+)
+from app.core.schema import ProviderNeutralQuery
+from app.db.payloads import PayloadCall
+
+
+def _parsers() -> dict[str, Any]:
+    """Real adapters used only for their `parse`; they never make a request here."""
+    from app.adapters.brave import BraveAdapter
+    from app.adapters.google import GoogleCSEAdapter
+    from app.adapters.serper import SerperAdapter
+
+    return {
+        "serper": SerperAdapter(api_key="replay"),
+        "google": GoogleCSEAdapter(api_key="replay", cse_id="replay"),
+        "brave": BraveAdapter(api_key="replay"),
+    }
+
+
+@dataclass
+class ReplayAdapter:
+    """Answers searches from archived provider payloads (app/db/payloads.py).
+
+    A call is matched on its exact (query, lang, geo) first. Queries with relative
+    date placeholders expand differently on another day, so otherwise the next
+    unused payload for the same (lang, geo) is taken in archive order.
+    """
+
+    name: str
+    parser: Any  # adapter whose `parse(data, query)` maps the stored body
+    calls: list[PayloadCall]
+    query_limits: QueryLimits = field(init=False)
+    _used: set[int] = field(init=False, default_factory=set)
+
+    def __post_init__(self) -> None:
+        # Shard the same way the live adapter did
+        self.query_limits = getattr(self.parser, "query_limits", DEFAULT_QUERY_LIMITS)
+
+    def _take(self, query: str, lang: str | None, geo: str | None) -> PayloadCall | None:
+        candidates = [
+            (i, c)
+            for i, c in enumerate(self.calls)
+            if i not in self._used and (c.lang, c.geo) == (lang, geo)
+        ]
+        for i, c in candidates:
+            if c.query_used == query:
+                self._used.add(i)
+                return c
+        if candidates:
+            i, c = candidates[0]
+            self._used.add(i)
+            return c
+        return None
+
+    async def search(self, schema: ProviderNeutralQuery, options: dict | None = None) -> ProviderResult:
+        query = build_query_from_schema(schema, options)
+        call = self._take(query, schema.filters.lang, schema.filters.geo)
+        if call is None:
+            raise LookupError(f"no archived {self.name} payload for {query!r}")
+        result = self.parser.parse(call.payload, call.query_used)
+        result.payload = call.payload
+        return result
+
+
+def replay_adapters(calls: Iterable[PayloadCall]) -> dict[str, ReplayAdapter]:
+    """One ReplayAdapter per provider that has archived calls and a known parser."""
+    by_provider: dict[str, list[PayloadCall]] = {}
+    for c in calls:
+        by_provider.setdefault(c.provider, []).append(c)
+    parsers = _parsers()
+    return {
+        name: ReplayAdapter(name=name, parser=parsers[name], calls=provider_calls)
+        for name, provider_calls in by_provider.items()
+        if name in parsers
+    }
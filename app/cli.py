@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import AsyncIterator
+from dataclasses import asdict
+from datetime import UTC, datetime
+from typing import Any
+
+from app.config import load_runtime_config
+from app.db.session import get_session_factory
+
+
+async def _retention(args: argparse.Namespace) -> dict[str, Any]:
+    from app.db.retention import exclusive_retention
+
+    settings = load_runtime_config().settings.retention
+    overrides = {
+        "run_max_age_days": args.run_max_age_days,
+        "raw_compact_after_days": args.compact_after_days,
+        "batch_size": args.batch_size,
+    }
+    settings = settings.model_copy(update={k: v for k, v in overrides.items() if v is not None})
+    report = await exclusive_retention(settings, get_session_factory())
+    if report is None:
+        return {"skipped": "another retention pass is running"}
+    return asdict(report)
+
+
+async def _index_refresh(args: argparse.Namespace) -> dict[str, Any]:
+    from app.db.search_index import refresh_search_index
+
+    batch_size = args.batch_size or load_runtime_config().settings.local_index.batch_size
+    async with get_session_factory()() as session:
+        consumed = await refresh_search_index(session, batch_size=batch_size)
+    return {"raw_rows": consumed}
+
+
+def _naive_utc(value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    d = datetime.fromisoformat(value)
+    return d.astimezone(UTC).replace(tzinfo=None) if d.tzinfo else d
+
+
+async def _export(args: argparse.Namespace) -> dict[str, Any] | None:
+    from app.core.export import ExportFormatUnavailable, check_export_format, encode_export
+    from app.db.export import EXPORT_COLUMNS, iter_export_batches
+
+    try:
+        check_export_format(args.format)
+    except ExportFormatUnavailable as e:
+        raise SystemExit(str(e))
+    rows = 0
+    async with get_session_factory()() as session:
+        batches = iter_export_batches(
+            session,
+            from_=_naive_utc(args.from_),
+            to=_naive_utc(args.to),
+            run_min=args.run_from,
+            run_max=args.run_to,
+            batch_size=args.batch_size,
+        )
+
+        async def counted() -> AsyncIterator[list[dict[str, Any]]]:
+            nonlocal rows
+            async for batch in batches:
+                rows += len(batch)
+                yield batch
+
+        out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")  # noqa: SIM115
+        try:
+            async for chunk in encode_export(args.format, counted(), EXPORT_COLUMNS):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+    # Stdout carries the export itself, so only report when writing to a file
+    return None if args.out == "-" else {"rows": rows, "path": args.out}
+
+
+async def _reprocess(args: argparse.Namespace) -> dict[str, Any]:
+    from app.core.reprocess import reprocess_runs
+
+    search = load_runtime_config().settings.search
+    async with get_session_factory()() as session:
+        report = await reprocess_runs(
+            session, search, run_min=args.run_from, run_max=args.run_to, batch_size=args.batch_size
+        )
+    return asdict(report)
+
+
+async def _replay(args: argparse.Namespace) -> dict[str, Any]:
+    from app.core.reprocess import replay_run
+
+    settings = load_runtime_config().settings
+    async with get_session_factory()() as session:
+        out = await replay_run(session, args.run_id, settings)
+    if out is None:
+        raise SystemExit(f"run {args.run_id} not found or has no archived payloads")
+    return {"run_id": out.run_id, "replay_of": args.run_id, "processed": len(out.processed)}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Source Harvester maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ret = sub.add_parser("retention", help="purge/compact old runs once (policy from config `retention`)")
+    ret.add_argument("--run-max-age-days", type=int, help="override retention.run_max_age_days")
+    ret.add_argument("--compact-after-days", type=int, help="override retention.raw_compact_after_days")
+    ret.add_argument("--batch-size", type=int, help="override retention.batch_size")
+    ret.set_defaults(handler=_retention)
+
+    idx = sub.add_parser("index-refresh", help="fold newly committed runs into the local search index")
+    idx.add_argument("--batch-size", type=int, help="override local_index.batch_size (runs per transaction)")
+    idx.set_defaults(handler=_index_refresh)
+
+    exp = sub.add_parser("export", help="stream processed results with run metadata to a file")
+    exp.add_argument("--format", choices=["ndjson", "csv", "parquet"], default="ndjson")
+    exp.add_argument("--from", dest="from_", help="ISO timestamp, inclusive")
+    exp.add_argument("--to", help="ISO timestamp, inclusive")
+    exp.add_argument("--run-from", type=int, help="first run id, inclusive")
+    exp.add_argument("--run-to", type=int, help="last run id, inclusive")
+    exp.add_argument("--batch-size", type=int, default=1000)
+    exp.add_argument("--out", default="-", help="output path, or - for stdout")
+    exp.set_defaults(handler=_export)
+
+    rep = sub.add_parser("reprocess", help="rebuild processed results from stored raw rows")
+    rep.add_argument("--run-from", type=int, help="first run id, inclusive")
+    rep.add_argument("--run-to", type=int, help="last run id, inclusive")
+    rep.add_argument("--batch-size", type=int, default=100, help="runs per transaction")
+    rep.set_defaults(handler=_reprocess)
+
+    rpl = sub.add_parser("replay", help="re-run a stored run against its archived provider payloads")
+    rpl.add_argument("run_id", type=int)
+    rpl.set_defaults(handler=_replay)
+
+    args = parser.parse_args(argv)
+    result = asyncio.run(args.handler(args))
+    if result is not None:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    main()
@@ -6,14 +6,14 @@ from pathlib import Path
 from typing import Iterable, Literal
 
 import yaml
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import AliasChoices, BaseModel, Field, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 # ----- Models for YAML + env config -----
 
 
-ProviderName = Literal["serper", "google", "brave"]
+ProviderName = Literal["serper", "google", "brave", "local"]
 
 
 class SearchDefaultOptions(BaseModel):
@@ -22,10 +22,44 @@ class SearchDefaultOptions(BaseModel):
     max_results: int = 50
 
 
+class ProviderRateLimit(BaseModel):
+    max_concurrency: int = Field(default=4, ge=1)
+    requests_per_second: float = Field(default=0.0, ge=0.0)  # 0 disables pacing
+
+
+class CanonicalizationSettings(BaseModel):
+    """URL canonicalization rules applied before cross-provider dedupe (app/core/canonical.py)."""
+
+    enabled: bool = True
+    force_https: bool = True
+    strip_www: bool = True
+    drop_default_ports: bool = True
+    strip_trailing_slash: bool = True
+    drop_fragment: bool = True
+    sort_query: bool = True
+    # Query parameters to remove; shell-style patterns, case-insensitive
+    strip_params: list[str] = Field(
+        default_factory=lambda: [
+            "utm_*", "fbclid", "gclid", "dclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+            "igshid", "_hsenc", "_hsmi", "ref_src", "spm",
+        ]
+    )
+    # amp. hosts, /amp path suffixes, ?amp, ?amp=1, ?outputType=amp and the Google AMP cache
+    fold_amp: bool = True
+    mobile_host_prefixes: list[str] = Field(default_factory=lambda: ["m.", "mobile."])
+    cache_size: int = Field(default=65536, ge=0)
+
+
 class SearchSettings(BaseModel):
     provider: Literal["auto", ProviderName] = "auto"
     cascade_order: list[ProviderName] = Field(default_factory=lambda: ["serper", "google", "brave"])
     default_options: SearchDefaultOptions = Field(default_factory=SearchDefaultOptions)
+    # Split filters.sites into OR-groups sized to each provider's query limits
+    site_sharding: bool = False
+    rate_limits: dict[ProviderName, ProviderRateLimit] = Field(default_factory=dict)
+    canonicalization: CanonicalizationSettings = Field(default_factory=CanonicalizationSettings)
+    # Reciprocal rank fusion constant: larger values flatten the gap between top ranks
+    rrf_k: int = Field(default=60, ge=1)
 
 
 class LLMSettings(BaseModel):
@@ -36,11 +70,61 @@ class LLMSettings(BaseModel):
     timeout_seconds: float = 5.0
 
 
+class RunCacheSettings(BaseModel):
+    # Completed runs kept serialized in process for GET /search-runs/{id}; 0 disables
+    max_entries: int = Field(default=1024, ge=0)
+
+
+class RetentionSettings(BaseModel):
+    # Periodic job inside this API process; enable it on one deployment (passes also
+    # take a Postgres advisory lock). `python -m app.cli retention` works either way.
+    # `enabled` is the older name of this key.
+    run_in_process: bool = Field(
+        default=False, validation_alias=AliasChoices("run_in_process", "enabled")
+    )
+    interval_seconds: float = Field(default=3600.0, gt=0)
+    # Delete runs (and, via cascade, all their rows) older than this; null keeps forever
+    run_max_age_days: int | None = Field(default=None, ge=1)
+    # Move raw rows of runs older than this into search_raw_archive; null disables
+    raw_compact_after_days: int | None = Field(default=None, ge=1)
+    batch_size: int = Field(default=500, ge=1)  # runs per transaction
+    # Postgres: monthly search_results_raw partitions created ahead of time
+    partition_months_ahead: int = Field(default=2, ge=0)
+
+
+class LocalIndexSettings(BaseModel):
+    # In-process refresh of url_index for the `local` provider; `python -m app.cli index-refresh` works either way
+    enabled: bool = False
+    refresh_interval_seconds: float = Field(default=60.0, gt=0)
+    batch_size: int = Field(default=100, ge=1)  # runs per transaction
+
+
+class PayloadArchiveSettings(BaseModel):
+    # Keep each provider response body (content-addressed, compressed) for offline replay
+    enabled: bool = False
+    # zstd needs the optional `zstandard` package; zlib is used when it is missing
+    codec: Literal["zstd", "zlib"] = "zstd"
+    level: int | None = None  # codec default when null
+
+
+class ResponseSettings(BaseModel):
+    # Run bodies (GET/POST /search-runs) this large are compressed when the client accepts it
+    compress_min_bytes: int = Field(default=4096, ge=0)
+    gzip_level: int = Field(default=5, ge=1, le=9)
+    # br needs the optional `brotli` package; clients get gzip without it
+    brotli_quality: int = Field(default=4, ge=0, le=11)
+
+
 class AppConfig(BaseModel):
     environment: Literal["dev", "test", "staging", "prod"] = "dev"
     debug: bool = False
     search: SearchSettings = Field(default_factory=SearchSettings)
     llm: LLMSettings = Field(default_factory=LLMSettings)
+    run_cache: RunCacheSettings = Field(default_factory=RunCacheSettings)
+    retention: RetentionSettings = Field(default_factory=RetentionSettings)
+    local_index: LocalIndexSettings = Field(default_factory=LocalIndexSettings)
+    payload_archive: PayloadArchiveSettings = Field(default_factory=PayloadArchiveSettings)
+    responses: ResponseSettings = Field(default_factory=ResponseSettings)
 
 
 class EnvOverrides(BaseSettings):
@@ -53,6 +137,11 @@ class EnvOverrides(BaseSettings):
     debug: bool | None = None
     search: SearchSettings | None = None
     llm: LLMSettings | None = None
+    run_cache: RunCacheSettings | None = None
+    retention: RetentionSettings | None = None
+    local_index: LocalIndexSettings | None = None
+    payload_archive: PayloadArchiveSettings | None = None
+    responses: ResponseSettings | None = None
 
     model_config = SettingsConfigDict(env_prefix="SH_", env_nested_delimiter="__", extra="ignore")
 
@@ -129,8 +218,11 @@ def _validate_secrets(cfg: AppConfig) -> None:
     elif cfg.search.provider == "brave":
         if not has_brave():
             missing.append("SH_BRAVE_KEY")
+    elif cfg.search.provider == "local":
+        pass  # local index needs no credentials
     else:  # auto
-        # Require at least one configured provider in cascade_order
+        # Require at least one configured external provider in cascade_order; the
+        # local index only replays what they harvested, so it does not count
         available = {
             "serper": has_serper(),
             "google": has_google(),
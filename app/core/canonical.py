@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import fnmatch
+import re
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.config import CanonicalizationSettings
+
+__all__ = ["Canonicalizer", "get_canonicalizer"]
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# Google AMP cache: https://<mangled>.cdn.ampproject.org/c/s/example.com/path
+_AMP_CACHE_RE = re.compile(r"^/[cv]/(s/)?([^/]+)(/.*)?$")
+# AMP switches, by lowercased key and value; other values select different content
+_AMP_QUERY = {("amp", ""), ("amp", "1"), ("outputtype", "amp")}
+
+
+class Canonicalizer:
+    """Rule-driven URL canonicalization used to dedupe results across providers.
+
+    Scheme and host are always lowercased; the other rules follow the settings.
+    `canonicalize` is memoized per instance (LRU). URLs that cannot be parsed as
+    absolute http(s) URLs are returned unchanged.
+    """
+
+    def __init__(self, settings: CanonicalizationSettings | None = None) -> None:
+        self.settings = settings or CanonicalizationSettings()
+        patterns = [fnmatch.translate(p.lower()) for p in self.settings.strip_params]
+        self._strip = re.compile("|".join(patterns)).match if patterns else None
+        self._fold_prefixes = tuple(
+            (["www."] if self.settings.strip_www else [])
+            + (["amp."] if self.settings.fold_amp else [])
+            + list(self.settings.mobile_host_prefixes)
+        )
+        self.canonicalize: Callable[[str], str] = lru_cache(maxsize=self.settings.cache_size)(self._apply)
+
+    def canonicalize_many(self, urls: Iterable[str]) -> dict[str, str]:
+        """Map each distinct input URL to its canonical form."""
+        canon = self.canonicalize
+        return {u: canon(u) for u in dict.fromkeys(urls)}
+
+    def _apply(self, url: str) -> str:
+        s = self.settings
+        if not s.enabled:
+            return url
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            return url
+        scheme = parts.scheme.lower()
+        host = parts.hostname or ""
+        if scheme not in _DEFAULT_PORTS or not host:
+            return url
+        path = parts.path
+
+        if s.fold_amp and host.endswith(".cdn.ampproject.org"):
+            m = _AMP_CACHE_RE.match(path)
+            if m:
+                scheme = "https" if m.group(1) else "http"
+                origin = urlsplit(f"{scheme}://{m.group(2)}")
+                host, port, path = origin.hostname or host, origin.port, m.group(3) or ""
+
+        if s.drop_default_ports and port == _DEFAULT_PORTS[scheme]:
+            port = None
+        if s.force_https and scheme == "http":
+            scheme = "https"
+            if s.drop_default_ports and port == 443:
+                port = None
+        for prefix in self._fold_prefixes:
+            if host.startswith(prefix) and host.count(".") > 1:
+                host = host[len(prefix) :]
+                break
+
+        if s.fold_amp and (path.endswith("/amp") or path.endswith("/amp/")):
+            path = path[: path.rstrip("/").rfind("/amp")]
+        if s.strip_trailing_slash:
+            path = path.rstrip("/")
+
+        query = parts.query
+        if query and (self._strip or s.fold_amp or s.sort_query):
+            strip = self._strip
+            pairs = [
+                (k, v)
+                for k, v in parse_qsl(query, keep_blank_values=True)
+                if not (strip and strip(k.lower()))
+                and not (s.fold_amp and (k.lower(), v.lower()) in _AMP_QUERY)
+            ]
+            if s.sort_query:
+                pairs.sort()
+            query = urlencode(pairs)
+
+        if ":" in host:
+            host = f"[{host}]"  # IPv6 literal
+        netloc = host if port is None else f"{host}:{port}"
+        if parts.username is not None:
+            netloc = parts.netloc.rpartition("@")[0] + "@" + netloc
+        fragment = "" if s.drop_fragment else parts.fragment
+        return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+_canonicalizers: dict[str, Canonicalizer] = {}
+
+
+def get_canonicalizer(settings: CanonicalizationSettings | None = None) -> Canonicalizer:
+    """Shared instance per distinct rule set, so the LRU survives across runs."""
+    settings = settings or CanonicalizationSettings()
+    key = settings.model_dump_json()
+    inst = _canonicalizers.get(key)
+    if inst is None:
+        inst = _canonicalizers[key] = Canonicalizer(settings)
+    return inst
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import gzip
+import importlib.util
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+
+from app.config import ResponseSettings
+
+__all__ = [
+    "JSON_MEDIA_TYPE",
+    "MSGPACK_MEDIA_TYPE",
+    "PROCESSED_FIELDS",
+    "RUN_FIELDS",
+    "Representation",
+    "dumps",
+    "negotiate",
+    "parse_fields",
+]
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Keys of a stored run body's processed items (GET /search-runs/{id}, reprocess)
+RUN_FIELDS = ("url", "providers", "confidence", "score", "dedupe_hash", "legacy_dedupe_hash")
+# POST /search-runs items also say whether each URL is new for the query
+PROCESSED_FIELDS = (*RUN_FIELDS, "novel")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON, as every JSON response and stored snapshot is encoded.
+
+    Same options as FastAPI's ORJSONResponse; they also cover SQLAlchemy's
+    `quoted_name` (a str subclass) in row-mapping keys.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _qvalues(header: str | None) -> dict[str, float]:
+    """Token -> q from an Accept or Accept-Encoding header."""
+    out: dict[str, float] = {}
+    for part in (header or "").split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        out[token] = q
+    return out
+
+
+def parse_fields(
+    fields: str | None, allowed: tuple[str, ...] = PROCESSED_FIELDS
+) -> tuple[str, ...] | None:
+    """`?fields=url,score` -> ("url", "score").
+
+    Raises ValueError on names outside `allowed`, the keys the route's items carry,
+    so a projection never silently returns empty items.
+    """
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"unknown field(s) {', '.join(unknown)}; expected {', '.join(allowed)}")
+    return names or None
+
+
+@dataclass(frozen=True)
+class Representation:
+    """How one run body (GET/POST /search-runs) is sent to a client."""
+
+    media_type: str = JSON_MEDIA_TYPE
+    # Processed-item keys to keep; None keeps every key
+    fields: tuple[str, ...] | None = None
+    # Content-Encoding the client accepts, applied to bodies past compress_min_bytes
+    encoding: str | None = None
+
+    def _key(self, encoding: str | None) -> str:
+        parts = ["msgpack" if self.media_type == MSGPACK_MEDIA_TYPE else "json"]
+        if self.fields:
+            parts.append("+".join(self.fields))
+        if encoding:
+            parts.append(encoding)
+        return "-".join(parts)
+
+    def etag(self, etag: str, encoding: str | None) -> str:
+        """Strong ETag of this variant, derived from the plain JSON body's ETag."""
+        key = self._key(encoding)
+        return etag if key == "json" else etag[:-1] + "-" + key + '"'
+
+    def _encode(self, payload: bytes | Mapping[str, Any]) -> bytes:
+        if self.media_type == JSON_MEDIA_TYPE and self.fields is None:
+            return payload if isinstance(payload, bytes) else dumps(payload)
+        data = orjson.loads(payload) if isinstance(payload, bytes) else payload
+        if self.fields is not None:
+            keep = self.fields
+            data = {
+                **data,
+                "processed": [{k: r[k] for k in keep if k in r} for r in data["processed"]],
+            }
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            import msgpack
+
+            return msgpack.packb(data, use_bin_type=True)
+        return dumps(data)
+
+    def render(
+        self,
+        payload: bytes | Mapping[str, Any],
+        settings: ResponseSettings,
+        memo: MutableMapping[str, tuple[bytes, str | None]] | None = None,
+    ) -> tuple[bytes, str | None]:
+        """(body, Content-Encoding or None) for a run body given as a dict or its JSON bytes.
+
+        Variants without a field projection are kept in `memo` (the run cache entry).
+        """
+        key = self._key(self.encoding)
+        if memo is not None and self.fields is None and key in memo:
+            return memo[key]
+        body = self._encode(payload)
+        encoding = self.encoding if len(body) >= settings.compress_min_bytes else None
+        if encoding == "br":
+            import brotli
+
+            body = brotli.compress(body, quality=settings.brotli_quality)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=settings.gzip_level, mtime=0)
+        if memo is not None and self.fields is None:
+            memo[key] = (body, encoding)
+        return body, encoding
+
+
+def negotiate(
+    accept: str | None, accept_encoding: str | None, fields: tuple[str, ...] | None = None
+) -> Representation:
+    """Pick media type and compression from request headers.
+
+    msgpack and brotli are optional extras; without them clients that ask for
+    them get JSON and gzip (or identity) instead.
+    """
+    media = _qvalues(accept)
+    msgpack_q = max(media.get(t, 0.0) for t in _MSGPACK_TYPES)
+    json_q = max(media.get(JSON_MEDIA_TYPE, 0.0), media.get("*/*", 0.0), media.get("application/*", 0.0))
+    use_msgpack = msgpack_q > 0 and msgpack_q >= json_q and _available("msgpack")
+
+    codings = _qvalues(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    encoding = None
+    if codings.get("br", wildcard) > 0 and _available("brotli"):
+        encoding = "br"
+    elif codings.get("gzip", wildcard) > 0:
+        encoding = "gzip"
+    return Representation(
+        media_type=MSGPACK_MEDIA_TYPE if use_msgpack else JSON_MEDIA_TYPE,
+        fields=fields,
+        encoding=encoding,
+    )
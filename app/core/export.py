@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import csv
+import importlib.util
+import io
+from collections.abc import AsyncIterator, Callable, Iterable
+from typing import Any
+
+from app.core.encoding import dumps
+
+__all__ = [
+    "EXPORT_FORMATS",
+    "ExportFormatUnavailable",
+    "check_export_format",
+    "encode_export",
+]
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+Batches = AsyncIterator[list[dict[str, Any]]]
+
+
+class ExportFormatUnavailable(RuntimeError):
+    """The format needs an optional dependency that is not installed."""
+
+
+def check_export_format(fmt: str) -> None:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ExportFormatUnavailable("parquet export requires pyarrow (poetry install -E parquet)")
+
+
+def _flat(row: dict[str, Any]) -> dict[str, Any]:
+    # Text-friendly values shared by NDJSON and CSV
+    return {
+        **row,
+        "run_timestamp": row["run_timestamp"].isoformat(),
+        "dedupe_hash": bytes(row["dedupe_hash"]).hex(),
+    }
+
+
+async def _ndjson(batches: Batches, columns: Iterable[str]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(dumps(_flat(r)) + b"\n" for r in rows)
+
+
+async def _csv(batches: Batches, columns: Iterable[str]) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=list(columns), lineterminator="\n")
+    writer.writeheader()
+    async for rows in batches:
+        for r in rows:
+            flat = _flat(r)
+            flat["providers"] = ";".join(flat["providers"])
+            writer.writerow(flat)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _Drain:
+    """Write-only file that hands out what was written since the last drain.
+
+    `tell()` keeps counting across drains so Parquet footer offsets stay right.
+    """
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+
+async def _parquet(batches: Batches, columns: Iterable[str]) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("run_id", pa.int64()),
+            ("run_timestamp", pa.timestamp("us")),
+            ("query", pa.string()),
+            ("url", pa.string()),
+            ("providers", pa.list_(pa.string())),
+            ("confidence", pa.int32()),
+            ("score", pa.float64()),
+            ("dedupe_hash", pa.binary(8)),
+        ]
+    )
+    sink = _Drain()
+    # One row group per batch, flushed to the client as soon as it is written
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        async for rows in batches:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+_ENCODERS: dict[str, Callable[[Batches, Iterable[str]], AsyncIterator[bytes]]] = {
+    "ndjson": _ndjson,
+    "csv": _csv,
+    "parquet": _parquet,
+}
+
+
+def encode_export(fmt: str, batches: Batches, columns: Iterable[str]) -> AsyncIterator[bytes]:
+    """Encode row batches (app.db.export) as `fmt`, yielding about one chunk per batch."""
+    check_export_format(fmt)
+    return _ENCODERS[fmt](batches, columns)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from app.core.encoding import dumps
+
+__all__ = ["FeedNotifier", "sse_feed"]
+
+
+class FeedNotifier:
+    """Wakes feed waiters in this process when new processed rows may exist.
+
+    `notify()` is called after a run commits (directly, or from the Postgres
+    LISTEN task for runs written by other workers); waiters then re-read the DB.
+    """
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        # Release everyone waiting now and arm a fresh event for the next round
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def arm(self) -> asyncio.Event:
+        """Event set by the next `notify()`; take it *before* reading so no wake-up is missed."""
+        return self._event
+
+    async def wait(self, timeout: float, armed: asyncio.Event | None = None) -> bool:
+        """True if notified (since `armed` was taken) within `timeout` seconds."""
+        try:
+            await asyncio.wait_for((armed or self._event).wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+async def sse_feed(
+    read: Callable[[int], Awaitable[list[dict[str, Any]]]],
+    notifier: FeedNotifier,
+    after: int,
+    *,
+    keepalive: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """Server-Sent Events for rows returned by `read(after)`, one event per row.
+
+    Rows carry their feed sequence (`seq`, shared by the rows of one run); only
+    the last row of each sequence gets an `id:`, so a client reconnecting with
+    `Last-Event-ID` resumes after whole runs and never skips part of one. Sends
+    a comment line every `keepalive` idle seconds.
+    """
+    while True:
+        armed = notifier.arm()
+        rows = await read(after)
+        if rows:
+            events = []
+            for i, r in enumerate(rows):
+                if i + 1 == len(rows) or rows[i + 1]["seq"] != r["seq"]:
+                    events.append(b"id: %d\n" % r["seq"])
+                events.append(b"event: processed\ndata: " + dumps(r) + b"\n\n")
+            yield b"".join(events)
+            after = rows[-1]["seq"]
+            continue
+        if not await notifier.wait(keepalive, armed):
+            yield b": keepalive\n\n"
@@ -1,8 +1,71 @@
 from __future__ import annotations
 
 import hashlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class HashStrategy:
+    """A named URL digest with a fixed width in bytes."""
+
+    name: str
+    algorithm: str
+    digest_size: int
+
+    def digest(self, url: str) -> bytes:
+        data = url.encode("utf-8")
+        if self.algorithm == "blake2b":
+            return hashlib.blake2b(data, digest_size=self.digest_size).digest()
+        return hashlib.new(self.algorithm, data).digest()
+
+    def hexdigest(self, url: str) -> str:
+        return self.digest(url).hex()
+
+
+HASH_STRATEGIES: dict[str, HashStrategy] = {
+    s.name: s
+    for s in (
+        HashStrategy("blake2b-8", "blake2b", 8),
+        HashStrategy("blake2b-16", "blake2b", 16),
+        HashStrategy("sha1", "sha1", 20),  # legacy text dedupe_hash
+    )
+}
+
+# `urls.url_hash` is unique across all runs; 128 bits keeps collisions out of reach
+URL_KEY_STRATEGY = HASH_STRATEGIES["blake2b-16"]
+# Per-run dedupe only has to be unique within one run, so the first 64 bits of url_key do
+DEDUPE_BYTES = 8
+# `search_runs.query_hash` only narrows the index scan; the text is still compared
+QUERY_KEY_STRATEGY = HASH_STRATEGIES["blake2b-8"]
+
+
+def get_hash_strategy(name: str) -> HashStrategy:
+    try:
+        return HASH_STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"unknown hash strategy: {name}") from None
 
 
 def url_hash(url: str) -> str:  # Phase H
+    """SHA-1 hex; the API's `legacy_dedupe_hash`."""
     return hashlib.sha1(url.encode("utf-8")).hexdigest()
 
+
+def dedupe_key(url: str) -> bytes:
+    """Binary `search_results_processed.dedupe_hash`: the first 8 bytes of `url_key`.
+
+    A caller that already holds a URL's url_key slices it instead of hashing again.
+    `.hex()` gives the API form.
+    """
+    return url_key(url)[:DEDUPE_BYTES]
+
+
+def url_key(url: str) -> bytes:
+    """Compact binary key for the `urls` dimension table (URL_KEY_STRATEGY)."""
+    # Called per URL on every write; skips HashStrategy's dispatch
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+
+
+def query_key(query: str) -> bytes:
+    """Indexed stand-in for `search_runs.query` (unbounded text)."""
+    return QUERY_KEY_STRATEGY.digest(query)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from operator import attrgetter
+
+from app.core.hashing import DEDUPE_BYTES, url_key
+from app.core.providers import PROVIDER_BITS
+
+__all__ = ["STORED_PROVIDERS_MASK", "MergedResult", "ProviderBits", "RankMerger"]
+
+# Bits url_stats.provider_mask can hold; names outside PROVIDER_BITS get merge-local bits above
+STORED_PROVIDERS_MASK = sum(PROVIDER_BITS.values())
+
+
+class ProviderBits:
+    """Provider name <-> bit for one merge.
+
+    Known providers keep their stored PROVIDER_BITS; other names (tests, new adapters)
+    are numbered above them. Decoded name lists are cached per mask, so records with
+    the same providers share one list: treat `providers` as read-only.
+    """
+
+    __slots__ = ("_bits", "_next", "_names")
+
+    def __init__(self) -> None:
+        self._bits = dict(PROVIDER_BITS)
+        self._next = STORED_PROVIDERS_MASK.bit_length()
+        self._names: dict[int, list[str]] = {}
+
+    def bit(self, name: str) -> int:
+        b = self._bits.get(name)
+        if b is None:
+            b = self._bits[name] = 1 << self._next
+            self._next += 1
+        return b
+
+    def names(self, mask: int) -> list[str]:
+        names = self._names.get(mask)
+        if names is None:
+            names = self._names[mask] = sorted(n for n, b in self._bits.items() if mask & b)
+        return names
+
+
+class MergedResult:
+    """One merged URL, shared by persistence, the snapshot and the API response.
+
+    `canonical_url` is only the dedupe key; `url` is the best-ranked URL a provider
+    actually returned for it, the one that is stored and served.
+    """
+
+    __slots__ = (
+        "url",
+        "canonical_url",
+        "mask",
+        "score",
+        "url_key",
+        "canonical_key",
+        "dedupe_hash",
+        "novel",
+        "_rank",
+        "_bits",
+    )
+
+    def __init__(self, url: str, canonical_url: str, rank: int, bits: ProviderBits) -> None:
+        self.url = url
+        self.canonical_url = canonical_url
+        self.mask = 0
+        # Reciprocal rank fusion over per-provider ranks
+        self.score = 0.0
+        # hashing.url_key of `url` and of `canonical_url`; dedupe_hash is a prefix
+        # of the latter (hashing.dedupe_key)
+        self.url_key = b""
+        self.canonical_key = b""
+        self.dedupe_hash = b""
+        # No earlier run of the same normalized query returned this URL
+        self.novel = False
+        # Rank `url` was returned at; a strictly better rank of another original replaces it
+        self._rank = rank
+        self._bits = bits
+
+    @property
+    def providers(self) -> list[str]:
+        return self._bits.names(self.mask)
+
+    @property
+    def confidence(self) -> int:
+        return self.mask.bit_count()
+
+    @property
+    def stored_mask(self) -> int:
+        """Provider bits as kept in url_stats.provider_mask."""
+        return self.mask & STORED_PROVIDERS_MASK
+
+    def __repr__(self) -> str:
+        return f"MergedResult(url={self.url!r}, providers={self.providers!r}, score={self.score:.6f})"
+
+
+_score = attrgetter("score")
+_confidence = attrgetter("confidence")
+
+
+class RankMerger:
+    """Fold ranked provider results into one MergedResult per canonical URL.
+
+    Keeps a record per canonical URL (in first-seen order) and a best-rank dict per
+    provider; scores are summed and URL keys computed once in `results`, the latter
+    only for the rows that are kept. Without a canonical form each URL is its own key.
+    """
+
+    def __init__(self, *, rrf_k: int = 60) -> None:
+        self.rrf_k = rrf_k
+        self.bits = ProviderBits()
+        self._records: dict[str, MergedResult] = {}
+        self._best: dict[str, dict[str, int]] = {}
+
+    def _ranks(self, provider: str) -> dict[str, int]:
+        best = self._best.get(provider)
+        if best is None:
+            self.bits.bit(provider)
+            best = self._best[provider] = {}
+        return best
+
+    def add(self, provider: str, url: str, rank: int, canonical: str | None = None) -> None:
+        best = self._ranks(provider)
+        key = url if canonical is None else canonical
+        rec = self._records.get(key)
+        if rec is None:
+            self._records[key] = MergedResult(url, key, rank, self.bits)
+        elif rank < rec._rank:
+            rec.url, rec._rank = url, rank
+        prev = best.get(key)
+        if prev is None or rank < prev:
+            best[key] = rank
+
+    def add_ranked(
+        self, provider: str, urls: Iterable[str], canonical: Mapping[str, str] | None = None
+    ) -> None:
+        """Add one result list of `provider`; ranks are 1-based positions in `urls`.
+
+        `canonical` maps each URL to its canonical form, under which URLs are merged.
+        """
+        best = self._ranks(provider)
+        records, bits = self._records, self.bits
+        for rank, url in enumerate(urls, start=1):
+            key = url if canonical is None else canonical[url]
+            rec = records.get(key)
+            if rec is None:
+                records[key] = MergedResult(url, key, rank, bits)
+            elif rank < rec._rank:
+                rec.url, rec._rank = url, rank
+            prev = best.get(key)
+            if prev is None or rank < prev:
+                best[key] = rank
+
+    def results(self, limit: int | None = None) -> list[MergedResult]:
+        """Records best first (score, then provider count, then first seen), cut to `limit`.
+
+        Call once, after every result list was added.
+        """
+        records, k = self._records, self.rrf_k
+        for provider, best in self._best.items():
+            bit = self.bits.bit(provider)
+            for key, rank in best.items():
+                rec = records[key]
+                rec.mask |= bit
+                rec.score += 1.0 / (k + rank)
+        out = list(records.values())
+        # Two stable passes instead of a tuple key per record
+        out.sort(key=_confidence, reverse=True)
+        out.sort(key=_score, reverse=True)
+        if limit is not None:
+            del out[limit:]
+        for rec in out:
+            rec.canonical_key = key = url_key(rec.canonical_url)
+            rec.url_key = key if rec.url == rec.canonical_url else url_key(rec.url)
+            rec.dedupe_hash = key[:DEDUPE_BYTES]
+        return out
@@ -1,20 +1,41 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Mapping
+import asyncio
+import logging
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.adapters.base import ProviderResult, SearchProviderAdapter
-from app.config import AppConfig
-from app.core.hashing import url_hash
-from app.core.schema import ProviderNeutralQuery
+from app.adapters.base import (
+    DEFAULT_QUERY_LIMITS,
+    ProviderResult,
+    SearchProviderAdapter,
+    shard_sites,
+    with_sites,
+)
+from app.config import AppConfig, SearchSettings
+from app.core.canonical import get_canonicalizer
+from app.core.merge import MergedResult, RankMerger
+from app.core.schema import Locale, ProviderNeutralQuery
+from app.core.snapshot import encode_run_body, pack_snapshot, run_payload
 from app.db.queries import (
-    bulk_insert_processed,
-    bulk_insert_raw,
     insert_search_run,
+    set_run_snapshot,
+    stamp_run_committed,
+    write_processed_records,
+    write_raw_records,
 )
+from app.db.feed import notify_feed
+from app.db.novelty import mark_novel, novelty_key
+from app.db.payloads import PayloadCall, archive_payloads
+from app.db.url_stats import upsert_url_stats
+from app.db.urls import upsert_urls
+from app.http.ratelimit import get_provider_limiter
+from app.observability.timing import StageTimer
 
+logger = logging.getLogger("app.orchestrator")
 
 class OrchestratorError(Exception):
     pass
@@ -24,20 +45,125 @@ class AllProvidersFailed(OrchestratorError):
     pass
 
 
-@dataclass
-class ProcessedResult:
-    url: str
-    providers: list[str]
-    confidence: int
-    dedupe_hash: str
-
-
 @dataclass
 class OrchestratorOutput:
-    processed: list[ProcessedResult]
+    processed: list[MergedResult]
     providers_used: list[str]
+    # First query sent per provider; every sub-query is in per_provider_queries_used
     per_provider_query_used: dict[str, str]
+    per_provider_queries_used: dict[str, list[str]]
     run_id: int
+    # Serialized GET /search-runs/{id} body; stored compressed in search_runs.snapshot
+    snapshot: bytes = b""
+    # Site OR-groups whose sub-query failed; also kept in the run config
+    failed_shards: list[dict[str, Any]] = field(default_factory=list)
+
+
+async def _search_provider(
+    name: str,
+    adapter: SearchProviderAdapter,
+    schema: ProviderNeutralQuery,
+    settings: SearchSettings,
+) -> tuple[list[ProviderResult], list[tuple[int, list[str]]]]:
+    """Call one provider, fanning out site OR-groups concurrently when sharding is on.
+
+    Returns one result per executed sub-query, tagged with its group index, and the
+    (index, sites) of groups that failed. Failed shards are logged and dropped as long
+    as at least one shard succeeded; otherwise the first error is re-raised.
+    """
+    limiter = get_provider_limiter(name, settings)
+    groups: list[list[str]] = []
+    if settings.site_sharding and len(schema.filters.sites) > 1:
+        groups = shard_sites(schema, getattr(adapter, "query_limits", DEFAULT_QUERY_LIMITS))
+
+    if not groups:
+        async with limiter:
+            return [await adapter.search(schema, options=None)], []
+
+    async def run_shard(index: int, sites: list[str]) -> ProviderResult:
+        async with limiter:
+            res = await adapter.search(with_sites(schema, sites), options={"site_join": "OR"})
+        return replace(res, shard=index)
+
+    outcomes = await asyncio.gather(
+        *(run_shard(i, g) for i, g in enumerate(groups)), return_exceptions=True
+    )
+    results = [o for o in outcomes if isinstance(o, ProviderResult)]
+    if not results:
+        err = next(o for o in outcomes if isinstance(o, BaseException))
+        raise err
+    failed: list[tuple[int, list[str]]] = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
+            logger.warning(
+                "%s shard %d/%d failed: %s", name, i, len(groups), outcome, exc_info=outcome
+            )
+            failed.append((i, groups[i]))
+    return results, failed
+
+
+def _stage(timer: StageTimer | None, name: str) -> AbstractContextManager[None]:
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def _raw_records(
+    succeeded: Iterable[tuple[str, Locale | None, list[ProviderResult]]],
+    schema: ProviderNeutralQuery,
+    url_ids: Mapping[str, int],
+    canonical_of: Mapping[str, str],
+) -> Iterator[tuple[str, int, int, dict[str, Any]]]:
+    """(provider, url_id, rank, meta) per returned URL; rank is relative to its sub-query."""
+    for name, loc, results in succeeded:
+        locale = None
+        if loc is not None:
+            locale = _locale_sent(schema, loc)
+        for res in results:
+            for rank, url in enumerate(res.urls, start=1):
+                meta: dict[str, Any] = {"queryUsed": res.query_used}
+                if rank <= len(res.details):
+                    meta.update({k: v for k, v in res.details[rank - 1].items() if v})
+                if res.shard is not None:
+                    meta["shard"] = res.shard
+                if locale is not None:
+                    meta["locale"] = locale
+                if (canonical := canonical_of[url]) != url:
+                    meta["canonicalUrl"] = canonical
+                yield name, url_ids[url], rank, meta
+
+
+def _locale_sent(schema: ProviderNeutralQuery, locale: Locale) -> dict[str, str | None]:
+    # The lang/geo actually sent: the locale merged over the schema's filters
+    filters = localize(schema, locale).filters
+    return {"lang": filters.lang, "geo": filters.geo}
+
+
+def _payload_calls(
+    succeeded: Iterable[tuple[str, Locale | None, list[ProviderResult]]],
+    schema: ProviderNeutralQuery,
+) -> Iterator[PayloadCall]:
+    """Archivable calls, tagged with the lang/geo they were made with (the replay key)."""
+    for name, loc, results in succeeded:
+        filters = (localize(schema, loc) if loc else schema).filters
+        for res in results:
+            if res.payload is not None:
+                yield PayloadCall(name, res.query_used, filters.lang, filters.geo, res.payload)
+
+
+def localize(schema: ProviderNeutralQuery, locale: Locale) -> ProviderNeutralQuery:
+    """Copy of `schema` with lang/geo overridden by the locale's non-null fields."""
+    update = {k: v for k, v in (("lang", locale.lang), ("geo", locale.geo)) if v is not None}
+    return schema.model_copy(update={"filters": schema.filters.model_copy(update=update)})
+
+
+def cap_max_results(schema: ProviderNeutralQuery, requested: int | None) -> ProviderNeutralQuery:
+    """Copy of `schema` keeping at most `requested` results; a caller can only narrow the limit."""
+    if requested is None or requested >= schema.filters.max_results:
+        return schema
+    return schema.model_copy(
+        update={"filters": schema.filters.model_copy(update={"max_results": requested})}
+    )
 
 
 async def orchestrate(
@@ -49,6 +175,8 @@ async def orchestrate(
     adapters: Mapping[str, SearchProviderAdapter],
     session: AsyncSession,
     run_config: dict | None = None,
+    locales: Sequence[Locale] | None = None,
+    timer: StageTimer | None = None,
 ) -> OrchestratorOutput:
     # Determine providers to call
     if config.search.provider != "auto":
@@ -62,75 +190,133 @@ async def orchestrate(
         raise AllProvidersFailed("No available providers to call")
 
     providers_used: list[str] = []
-    per_provider_query_used: dict[str, str] = {}
-    raw_rows: list[dict[str, Any]] = []
-    results_by_url: dict[str, set[str]] = {}
-
-    # Insert run row early to obtain run_id
-    run_id = await insert_search_run(
-        session,
-        query=original_query,
-        rewritten_template=rewritten_template,
-        config=run_config or {},
-        providers_used=to_call,
-    )
 
-    for name in to_call:
-        adapter = adapters[name]
-        try:
-            res: ProviderResult = await adapter.search(schema, options=None)
-        except Exception:
+    # Fan out the provider x locale matrix concurrently; limiters bound each provider
+    locale_list: list[Locale | None] = list(locales) if locales else [None]
+    calls = [(name, loc) for name in to_call for loc in locale_list]
+    with _stage(timer, "providers"):
+        outcomes = await asyncio.gather(
+            *(
+                _search_provider(
+                    name, adapters[name], localize(schema, loc) if loc else schema, config.search
+                )
+                for name, loc in calls
+            ),
+            return_exceptions=True,
+        )
+
+    queries_by_provider: dict[str, list[str]] = {}
+    succeeded: list[tuple[str, Locale | None, list[ProviderResult]]] = []
+    failed_shards: list[dict[str, Any]] = []
+    for (name, loc), outcome in zip(calls, outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
             continue
-        providers_used.append(name)
-        per_provider_query_used[name] = res.query_used
-        # raw rows
-        for rank, url in enumerate(res.urls, start=1):
-            raw_rows.append({
-                "provider": name,
-                "url": url,
-                "rank": rank,
-                "meta": {"queryUsed": res.query_used},
-            })
-            results_by_url.setdefault(url, set()).add(name)
+        results, failed = outcome
+        if name not in providers_used:
+            providers_used.append(name)
+        succeeded.append((name, loc, results))
+        for shard, sites in failed:
+            entry: dict[str, Any] = {"provider": name, "shard": shard, "sites": sites}
+            if loc is not None:
+                entry["locale"] = _locale_sent(schema, loc)
+            failed_shards.append(entry)
+        queries = queries_by_provider.setdefault(name, [])
+        for res in results:
+            if res.query_used not in queries:
+                queries.append(res.query_used)
+    per_provider_query_used = {n: q[0] for n, q in queries_by_provider.items()}
 
     if not providers_used:
         raise AllProvidersFailed("All providers failed or returned no data")
 
-    # Persist raw rows
-    await bulk_insert_raw(session, run_id, raw_rows)
-
-    # Merge/dedupe processed rows
-    processed: list[ProcessedResult] = []
-    for url, provs in results_by_url.items():
-        prov_list = sorted(provs)
-        processed.append(
-            ProcessedResult(
-                url=url,
-                providers=prov_list,
-                confidence=len(provs),
-                dedupe_hash=url_hash(url),
-            )
+    # Dedupe on canonical URLs, but keep a returned URL per row: the canonical form is
+    # synthesized and may not be fetchable
+    with _stage(timer, "merge"):
+        canonical_of = get_canonicalizer(config.search.canonicalization).canonicalize_many(
+            url for _, _, results in succeeded for res in results for url in res.urls
         )
+        # Best rank per provider across sub-queries and locales
+        merger = RankMerger(rrf_k=config.search.rrf_k)
+        for name, _, results in succeeded:
+            for res in results:
+                merger.add_ranked(name, res.urls, canonical_of)
+        # Only the top max_results are persisted and returned; raw rows keep everything
+        processed = merger.results(schema.filters.max_results)
 
-    # Persist processed rows
-    await bulk_insert_processed(
-        session,
-        run_id,
-        [
-            {
-                "url": pr.url,
-                "providers": pr.providers,
-                "confidence": pr.confidence,
-                "dedupe_hash": pr.dedupe_hash,
-            }
-            for pr in processed
-        ],
-    )
+    # A run that lost site groups is partial; the marker tells it apart from a complete one
+    stored_config = dict(run_config or {})
+    if failed_shards:
+        stored_config["failed_shards"] = failed_shards
+
+    # Persist run, raw and processed rows in a single transaction once providers are done
+    with _stage(timer, "persist"):
+        run_id = await insert_search_run(
+            session,
+            query=original_query,
+            rewritten_template=rewritten_template,
+            config=stored_config,
+            providers_used=to_call,
+            commit=False,
+        )
+        # Stats and novelty are kept per canonical URL, so those get a urls row too
+        keys = {pr.canonical_url: pr.canonical_key for pr in processed}
+        keys.update((pr.url, pr.url_key) for pr in processed)
+        url_ids = await upsert_urls(session, {**canonical_of, **keys}, keys=keys)
+        await write_raw_records(
+            session, run_id, _raw_records(succeeded, schema, url_ids, canonical_of), commit=False
+        )
+        await write_processed_records(
+            session,
+            run_id,
+            (
+                (url_ids[pr.url], pr.providers, pr.confidence, pr.dedupe_hash, pr.score)
+                for pr in processed
+            ),
+            commit=False,
+        )
+        if config.payload_archive.enabled:
+            await archive_payloads(
+                session, run_id, _payload_calls(succeeded, schema), config.payload_archive
+            )
+        await upsert_url_stats(
+            session, run_id, ((url_ids[pr.canonical_url], pr.stored_mask) for pr in processed)
+        )
+        novel = await mark_novel(
+            session,
+            novelty_key(original_query),
+            run_id,
+            [url_ids[pr.canonical_url] for pr in processed],
+        )
+        for pr in processed:
+            pr.novel = url_ids[pr.canonical_url] in novel
+        # Denormalized response for O(1) reads; the normalized rows stay for analytics
+        snapshot = encode_run_body(
+            run_payload(
+                {
+                    "id": run_id,
+                    "query": original_query,
+                    "rewritten_template": rewritten_template,
+                    "providers_used": to_call,
+                },
+                processed,
+            )
+        )
+        await set_run_snapshot(session, run_id, pack_snapshot(snapshot))
+        # Last write before commit: the local index consumes runs in commit order
+        await stamp_run_committed(session, run_id)
+        # Delivered to feed listeners on commit (Postgres only; callers notify in-process)
+        await notify_feed(session, run_id)
+        await session.commit()
 
     return OrchestratorOutput(
         processed=processed,
         providers_used=providers_used,
         per_provider_query_used=per_provider_query_used,
+        per_provider_queries_used=queries_by_provider,
         run_id=run_id,
+        snapshot=snapshot,
+        failed_shards=failed_shards,
     )
 
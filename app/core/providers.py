@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+__all__ = ["PROVIDER_BITS", "provider_mask", "providers_from_mask"]
+
+# Stored in url_stats.provider_mask: never renumber, only append
+PROVIDER_BITS: dict[str, int] = {
+    "serper": 1 << 0,
+    "google": 1 << 1,
+    "brave": 1 << 2,
+    "local": 1 << 3,
+}
+
+
+def provider_mask(providers: Iterable[str]) -> int:
+    """Bitmask of known provider names; unknown names are ignored."""
+    mask = 0
+    for p in providers:
+        mask |= PROVIDER_BITS.get(p, 0)
+    return mask
+
+
+def providers_from_mask(mask: int) -> list[str]:
+    return [name for name, bit in PROVIDER_BITS.items() if mask & bit]
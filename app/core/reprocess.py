@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.adapters.replay import replay_adapters
+from app.config import AppConfig, SearchSettings
+from app.core.canonical import get_canonicalizer
+from app.core.merge import RankMerger
+from app.core.orchestrator import OrchestratorOutput, cap_max_results, orchestrate
+from app.core.schema import Locale, ProviderNeutralQuery
+from app.core.snapshot import encode_run_body, pack_snapshot, run_payload
+from app.core.providers import provider_mask
+from app.db.feed import notify_runs_changed
+from app.db.novelty import novelty_key, rebase_novel
+from app.db.payloads import load_run_payloads
+from app.db.queries import (
+    get_processed_keys,
+    get_raw_urls,
+    get_run,
+    rewrite_processed_records,
+    set_run_snapshot,
+)
+from app.db.retention import load_raw_archive
+from app.db.url_stats import rebase_url_stats
+from app.db.urls import ids_by_dedupe_hash, upsert_urls
+from app.models import search_runs as t_runs
+
+__all__ = ["ReprocessReport", "replay_run", "reprocess_run", "reprocess_runs"]
+
+
+@dataclass
+class ReprocessReport:
+    runs_reprocessed: int = 0
+    # Runs with neither raw rows nor a raw archive left (purged), so nothing to rebuild from
+    runs_skipped: int = 0
+
+
+_RUN_COLUMNS = (
+    t_runs.c.id,
+    t_runs.c.query,
+    t_runs.c.rewritten_template,
+    t_runs.c.providers_used,
+    t_runs.c.run_timestamp,
+    t_runs.c.config,
+)
+
+
+def _requested_max_results(config: dict[str, Any] | None) -> int | None:
+    """`options.maxResults` the run was requested with (POST /search-runs), if any."""
+    return ((config or {}).get("options") or {}).get("maxResults")
+
+
+def _max_results(run: dict[str, Any]) -> int | None:
+    requested = _requested_max_results(run["config"])
+    try:
+        schema = ProviderNeutralQuery.model_validate_json(run["rewritten_template"])
+    except ValidationError:
+        return requested  # not a stored schema; only the caller's limit applies
+    return cap_max_results(schema, requested).filters.max_results
+
+
+async def _rebuild_batch(
+    session: AsyncSession, runs: list[dict[str, Any]], search: SearchSettings
+) -> dict[int, bytes]:
+    """Rebuild processed rows and snapshots of `runs` from their raw rows; caller commits.
+
+    Rows whose dedupe_hash survives are updated in place and keep their id; the
+    run keeps its feed sequence, so feed consumers are not sent it again (the run
+    ids go out on `search_runs_changed` instead). The run's share of `url_stats`
+    and `query_urls` moves to its new canonical URLs. Returns the new
+    GET /search-runs/{id} body per rebuilt run.
+    """
+    raw = await get_raw_urls(session, [r["id"] for r in runs])
+    for run in runs:
+        if run["id"] not in raw:
+            archived = await load_raw_archive(session, run["id"])
+            if archived:
+                raw[run["id"]] = [(r["provider"], r["url"], r["rank"]) for r in archived]
+    if not raw:
+        return {}
+
+    # Same merge the orchestrator runs, with today's canonicalization and scoring
+    canonical_of = get_canonicalizer(search.canonicalization).canonicalize_many(
+        url for rows in raw.values() for _, url, _ in rows
+    )
+    merged = {}
+    for run in runs:
+        rows = raw.get(run["id"])
+        if rows is None:
+            continue
+        merger = RankMerger(rrf_k=search.rrf_k)
+        seen: dict[str, int] = {}
+        for provider, url, rank in rows:
+            # Rows written without a rank count in the order they were stored
+            seen[provider] = seen.get(provider, 0) + 1
+            merger.add(provider, url, seen[provider] if rank is None else rank, canonical_of[url])
+        merged[run["id"]] = merger.results(_max_results(run))
+    keys: dict[str, bytes] = {}
+    for prs in merged.values():
+        for pr in prs:
+            keys[pr.canonical_url] = pr.canonical_key
+            keys[pr.url] = pr.url_key
+    url_ids = await upsert_urls(session, keys, keys=keys)
+    old = await get_processed_keys(session, list(merged))
+    # Canonical URLs of the rows being replaced: dedupe_hash is a prefix of their url_key
+    old_ids = await ids_by_dedupe_hash(session, (h for rows in old.values() for h in rows))
+
+    bodies: dict[int, bytes] = {}
+    for run in runs:
+        processed = merged.get(run["id"])
+        if processed is None:
+            continue
+        before = old.get(run["id"], {})
+        await rewrite_processed_records(
+            session,
+            run["id"],
+            (
+                (url_ids[pr.url], pr.providers, pr.confidence, pr.dedupe_hash, pr.score)
+                for pr in processed
+            ),
+            {h: row_id for h, (row_id, _) in before.items()},
+        )
+        canonical_ids = {url_ids[pr.canonical_url]: pr.stored_mask for pr in processed}
+        old_masks = {old_ids[h]: provider_mask(p) for h, (_, p) in before.items() if h in old_ids}
+        await rebase_url_stats(session, run["id"], run["run_timestamp"], old_masks, canonical_ids)
+        await rebase_novel(session, novelty_key(run["query"]), run["id"], old_masks, canonical_ids)
+        body = encode_run_body(run_payload(run, processed))
+        await set_run_snapshot(session, run["id"], pack_snapshot(body))
+        bodies[run["id"]] = body
+    await notify_runs_changed(session, list(bodies))
+    return bodies
+
+
+async def reprocess_run(session: AsyncSession, run_id: int, search: SearchSettings) -> bytes | None:
+    """Rebuild one run's processed rows from its stored raw rows; no provider calls.
+
+    Returns the new response body, or None if the run is missing or has no raw data.
+    """
+    run = (await session.execute(select(*_RUN_COLUMNS).where(t_runs.c.id == run_id))).mappings().first()
+    if run is None:
+        return None
+    bodies = await _rebuild_batch(session, [dict(run)], search)
+    await session.commit()
+    return bodies.get(run_id)
+
+
+async def reprocess_runs(
+    session: AsyncSession,
+    search: SearchSettings,
+    *,
+    run_min: int | None = None,
+    run_max: int | None = None,
+    batch_size: int = 100,
+) -> ReprocessReport:
+    """Rebuild every run in the inclusive id range, `batch_size` runs per transaction."""
+    report = ReprocessReport()
+    after = (run_min - 1) if run_min is not None else 0
+    while True:
+        q = select(*_RUN_COLUMNS).where(t_runs.c.id > after).order_by(t_runs.c.id).limit(batch_size)
+        if run_max is not None:
+            q = q.where(t_runs.c.id <= run_max)
+        runs = [dict(r) for r in (await session.execute(q)).mappings()]
+        if not runs:
+            break
+        bodies = await _rebuild_batch(session, runs, search)
+        await session.commit()
+        report.runs_reprocessed += len(bodies)
+        report.runs_skipped += len(runs) - len(bodies)
+        after = runs[-1]["id"]
+        if len(runs) < batch_size:
+            break
+    return report
+
+
+async def replay_run(session: AsyncSession, run_id: int, config: AppConfig) -> OrchestratorOutput | None:
+    """Orchestrate a stored run again against its archived provider payloads.
+
+    Adapters parse the archived bodies instead of calling providers, so parser or
+    merge changes can be evaluated (and benchmarked) offline. The result is
+    persisted as a new run; None when the run is missing or kept no payloads.
+    """
+    data = await get_run(session, run_id)
+    if data is None:
+        return None
+    adapters = replay_adapters(await load_run_payloads(session, run_id))
+    if not adapters:
+        return None
+    run = data["run"]
+    run_config = dict(run["config"] or {})
+    locales = (run_config.get("options") or {}).get("locales") or []
+    run_config["replay_of"] = run_id
+    # The replay records its own shard failures, if any
+    run_config.pop("failed_shards", None)
+    schema = ProviderNeutralQuery.model_validate_json(run["rewritten_template"])
+    return await orchestrate(
+        original_query=run["query"],
+        rewritten_template=run["rewritten_template"],
+        schema=cap_max_results(schema, _requested_max_results(run_config)),
+        config=config,
+        adapters=adapters,
+        session=session,
+        run_config=run_config,
+        locales=[Locale.model_validate(loc) for loc in locales] or None,
+    )
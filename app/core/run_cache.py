@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+__all__ = ["CachedRun", "RunCache", "etag_matches", "strong_etag"]
+
+
+@dataclass(frozen=True)
+class CachedRun:
+    body: bytes  # serialized GET /search-runs/{id} response (app.core.snapshot)
+    etag: str
+    # Encoded/compressed variants of `body` (app.core.encoding.Representation.render)
+    variants: dict[str, tuple[bytes, str | None]] = field(default_factory=dict, compare=False)
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check (RFC 9110 weak comparison, so `W/` prefixes are ignored)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+
+class RunCache:
+    """Bounded in-process LRU of serialized runs, keyed by run id.
+
+    Runs change only when reprocessed, so entries are written through at POST
+    and reprocess time and are discarded when a run is purged or rewritten
+    elsewhere; `max_entries=0` disables caching (entries are still built).
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, CachedRun] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, run_id: int) -> CachedRun | None:
+        entry = self._entries.get(run_id)
+        if entry is not None:
+            self._entries.move_to_end(run_id)
+        return entry
+
+    def put(self, run_id: int, body: bytes) -> CachedRun:
+        entry = CachedRun(body=body, etag=strong_etag(body))
+        if self.max_entries > 0:
+            self._entries[run_id] = entry
+            self._entries.move_to_end(run_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, run_id: int) -> None:
+        self._entries.pop(run_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -48,6 +48,13 @@ class Filters(BaseModel):
         return v
 
 
+class Locale(BaseModel):
+    lang: str | None = None
+    geo: str | None = None
+
+    model_config = ConfigDict(extra="forbid")
+
+
 class ProviderNeutralQuery(BaseModel):
     keywords: list[str] = Field(default_factory=list)
     boolean: BooleanOp = "AND"
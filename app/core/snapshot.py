@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, Iterable, Mapping
+
+from app.core.encoding import dumps
+from app.core.hashing import url_hash
+from app.core.merge import MergedResult
+
+__all__ = ["encode_run_body", "pack_snapshot", "processed_item", "run_payload", "unpack_snapshot"]
+
+_LEVEL = 6
+
+
+def processed_item(r: Mapping[str, Any] | MergedResult) -> dict[str, Any]:
+    """One processed item of a run body (encoding.RUN_FIELDS)."""
+    if isinstance(r, MergedResult):
+        return {
+            "url": r.url,
+            "providers": r.providers,
+            "confidence": r.confidence,
+            "score": r.score,
+            "dedupe_hash": r.dedupe_hash.hex(),
+            # SHA-1 hex of the URL, the dedupe_hash format before binary digests
+            "legacy_dedupe_hash": url_hash(r.url),
+        }
+    return {
+        "url": r["url"],
+        "providers": r["providers"],
+        "confidence": r["confidence"],
+        "score": r.get("score"),
+        "dedupe_hash": r["dedupe_hash"].hex(),
+        "legacy_dedupe_hash": url_hash(r["url"]),
+    }
+
+
+def run_payload(
+    run: Mapping[str, Any], processed: Iterable[Mapping[str, Any] | MergedResult]
+) -> dict[str, Any]:
+    """Body of GET /search-runs/{id}, from stored rows or fresh merge records."""
+    return {
+        "id": run["id"],
+        "query": run["query"],
+        "rewritten_template": run["rewritten_template"],
+        "providers_used": run["providers_used"],
+        "processed": [processed_item(r) for r in processed],
+    }
+
+
+def encode_run_body(payload: dict[str, Any]) -> bytes:
+    # Same encoder as the app's ORJSONResponse, so stored and rebuilt bodies match
+    return dumps(payload)
+
+
+def pack_snapshot(body: bytes) -> bytes:
+    """zlib-compressed body for `search_runs.snapshot`."""
+    return zlib.compress(body, _LEVEL)
+
+
+def unpack_snapshot(blob: bytes) -> bytes:
+    return zlib.decompress(blob)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import JSON, Table, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+__all__ = ["bulk_write"]
+
+# Rows per executemany call on SQLite; bounds memory when the input is a generator
+SQLITE_CHUNK = 5000
+
+
+def _json_encoder(table: Table, columns: Sequence[str]) -> Any:
+    """Row mapper that serializes JSON columns to text, as the JSON type would."""
+    json_idx = [i for i, c in enumerate(columns) if isinstance(table.c[c].type, JSON)]
+    if not json_idx:
+        return None
+
+    def encode(row: Sequence[Any]) -> tuple[Any, ...]:
+        out = list(row)
+        for i in json_idx:
+            out[i] = json.dumps(out[i])
+        return tuple(out)
+
+    return encode
+
+
+def _chunks(rows: Iterable[tuple[Any, ...]], size: int) -> Iterator[list[tuple[Any, ...]]]:
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+async def _copy_asyncpg(conn: AsyncConnection, table: Table, columns: Sequence[str], rows: Iterable[tuple[Any, ...]]) -> int:
+    raw = await conn.get_raw_connection()
+    apg = raw.driver_connection
+    import asyncpg  # present whenever the asyncpg dialect is in use
+
+    try:
+        status = await apg.copy_records_to_table(table.name, records=rows, columns=list(columns))
+    except asyncpg.IntegrityConstraintViolationError as e:
+        # Keep the repository contract: constraint violations surface as SQLAlchemy errors
+        raise IntegrityError(f"COPY {table.name}", None, e) from e
+    # status is "COPY <n>"
+    return int(status.split()[-1])
+
+
+async def _executemany_sqlite(
+    conn: AsyncConnection, table: Table, columns: Sequence[str], rows: Iterable[tuple[Any, ...]]
+) -> int:
+    sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    n = 0
+    for chunk in _chunks(rows, SQLITE_CHUNK):
+        await conn.exec_driver_sql(sql, chunk)
+        n += len(chunk)
+    return n
+
+
+async def bulk_write(
+    session: AsyncSession, table: Table, columns: Sequence[str], rows: Iterable[Sequence[Any]]
+) -> int:
+    """Insert positional `rows` into `table` inside the session's transaction.
+
+    Postgres/asyncpg uses binary COPY (`copy_records_to_table`); SQLite runs a
+    driver-level executemany over plain tuples; other backends fall back to a Core
+    executemany. `rows` may be a generator and is consumed once. Returns rows written.
+    """
+    conn = await session.connection()
+    encode = _json_encoder(table, columns)
+    dialect = conn.dialect
+    if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        records = (encode(r) for r in rows) if encode else (tuple(r) for r in rows)
+        return await _copy_asyncpg(conn, table, columns, records)
+    if dialect.name == "sqlite":
+        records = (encode(r) for r in rows) if encode else (tuple(r) for r in rows)
+        return await _executemany_sqlite(conn, table, columns, records)
+    payload = [dict(zip(columns, r)) for r in rows]
+    if payload:
+        await conn.execute(insert(table), payload)
+    return len(payload)
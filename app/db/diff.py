@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from typing import Any, Literal
+
+from sqlalchemy import Select, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    search_results_processed as t_processed,
+    search_runs as t_runs,
+    urls as t_urls,
+)
+
+__all__ = ["DiffKind", "iter_run_diff", "missing_runs"]
+
+DiffKind = Literal["added", "removed", "changed"]
+
+
+def _only_in(run_id: int, other_id: int) -> Select:
+    """Processed rows of `run_id` with no (run_id, dedupe_hash) match in `other_id`."""
+    p, o = t_processed.alias("p"), t_processed.alias("o")
+    return (
+        select(t_urls.c.url, p.c.providers, p.c.confidence)
+        .join(t_urls, t_urls.c.id == p.c.url_id)
+        .where(
+            p.c.run_id == run_id,
+            ~exists().where(o.c.run_id == other_id, o.c.dedupe_hash == p.c.dedupe_hash),
+        )
+        .order_by(p.c.id)
+    )
+
+
+def _changed(a: int, b: int) -> Select:
+    pa, pb = t_processed.alias("pa"), t_processed.alias("pb")
+    return (
+        select(
+            t_urls.c.url,
+            pa.c.confidence.label("confidence_a"),
+            pb.c.confidence.label("confidence_b"),
+            pa.c.providers.label("providers_a"),
+            pb.c.providers.label("providers_b"),
+        )
+        .select_from(pb)
+        .join(pa, (pa.c.run_id == a) & (pa.c.dedupe_hash == pb.c.dedupe_hash))
+        .join(t_urls, t_urls.c.id == pb.c.url_id)
+        .where(pb.c.run_id == b, pa.c.confidence != pb.c.confidence)
+        .order_by(pb.c.id)
+    )
+
+
+async def missing_runs(session: AsyncSession, *run_ids: int) -> list[int]:
+    res = await session.execute(select(t_runs.c.id).where(t_runs.c.id.in_(run_ids)))
+    found = set(res.scalars())
+    return [r for r in run_ids if r not in found]
+
+
+async def iter_run_diff(
+    session: AsyncSession, a: int, b: int, *, batch_size: int = 500
+) -> AsyncIterator[tuple[DiffKind, list[dict[str, Any]]]]:
+    """What changed from run `a` to run `b`, matched on dedupe_hash inside the database.
+
+    Yields (kind, batch) in kind order added, removed, changed; each kind is one
+    streamed anti-join/join over the (run_id, dedupe_hash) unique index, so
+    neither run is loaded in full.
+    """
+    queries: tuple[tuple[DiffKind, Select], ...] = (
+        ("added", _only_in(b, a)),
+        ("removed", _only_in(a, b)),
+        ("changed", _changed(a, b)),
+    )
+    for kind, stmt in queries:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for part in result.mappings().partitions():
+            yield kind, [dict(r) for r in part]
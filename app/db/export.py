@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    search_results_processed as t_processed,
+    search_runs as t_runs,
+    urls as t_urls,
+)
+
+__all__ = ["EXPORT_COLUMNS", "iter_export_batches"]
+
+# Row shape shared by every export format (app.core.export)
+EXPORT_COLUMNS = (
+    "run_id",
+    "run_timestamp",
+    "query",
+    "url",
+    "providers",
+    "confidence",
+    "score",
+    "dedupe_hash",
+)
+
+
+async def iter_export_batches(
+    session: AsyncSession,
+    *,
+    from_: datetime | None = None,
+    to: datetime | None = None,
+    run_min: int | None = None,
+    run_max: int | None = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Stream processed rows joined with their run, `batch_size` rows at a time.
+
+    All bounds are inclusive, as in run listing. Rows come in processed
+    primary-key order, so the scan needs no sort and the server-side cursor
+    holds at most one batch in memory.
+    """
+    q = (
+        select(
+            t_processed.c.run_id,
+            t_runs.c.run_timestamp,
+            t_runs.c.query,
+            t_urls.c.url,
+            t_processed.c.providers,
+            t_processed.c.confidence,
+            t_processed.c.score,
+            t_processed.c.dedupe_hash,
+        )
+        .join(t_runs, t_runs.c.id == t_processed.c.run_id)
+        .join(t_urls, t_urls.c.id == t_processed.c.url_id)
+        .order_by(t_processed.c.id)
+    )
+    if from_ is not None:
+        q = q.where(t_runs.c.run_timestamp >= from_)
+    if to is not None:
+        q = q.where(t_runs.c.run_timestamp <= to)
+    if run_min is not None:
+        q = q.where(t_processed.c.run_id >= run_min)
+    if run_max is not None:
+        q = q.where(t_processed.c.run_id <= run_max)
+    result = await session.stream(q.execution_options(yield_per=batch_size))
+    async for part in result.mappings().partitions():
+        yield [dict(r) for r in part]
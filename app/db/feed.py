@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models import (
+    search_results_processed as t_processed,
+    search_runs as t_runs,
+    urls as t_urls,
+)
+
+__all__ = [
+    "FEED_CHANNEL",
+    "RUNS_CHANGED_CHANNEL",
+    "listen_feed",
+    "notify_feed",
+    "notify_runs_changed",
+    "read_feed",
+]
+
+logger = logging.getLogger("app.feed")
+
+# Postgres NOTIFY channels; payloads are run ids (comma-separated for runs changed)
+FEED_CHANNEL = "search_feed"
+RUNS_CHANGED_CHANNEL = "search_runs_changed"
+# Stays well under the 8000-byte NOTIFY payload limit
+_IDS_PER_NOTIFY = 500
+
+
+_FEED_COLUMNS = (
+    t_runs.c.commit_seq.label("seq"),
+    t_processed.c.id,
+    t_processed.c.run_id,
+    t_urls.c.url,
+    t_processed.c.providers,
+    t_processed.c.confidence,
+    t_processed.c.score,
+    t_processed.c.dedupe_hash,
+)
+
+
+async def read_feed(session: AsyncSession, after: int, limit: int) -> list[dict[str, Any]]:
+    """Processed rows of runs committed after feed sequence `after`, in commit order.
+
+    The cursor is the run's `commit_seq` (queries.stamp_run_committed), not the
+    row id: ids are taken when rows are written and concurrent runs commit in any
+    order, so a reader past id N could still miss a lower id committed later.
+    Sequence values become visible in order. Runs are never split: `limit` is
+    exceeded to finish the last run, so every item's `seq` is a safe cursor.
+    """
+    q = (
+        select(*_FEED_COLUMNS)
+        .join(t_runs, t_runs.c.id == t_processed.c.run_id)
+        .join(t_urls, t_urls.c.id == t_processed.c.url_id)
+    )
+    rows = list(
+        (
+            await session.execute(
+                q.where(t_runs.c.commit_seq > after)
+                .order_by(t_runs.c.commit_seq, t_processed.c.id)
+                .limit(limit)
+            )
+        ).mappings()
+    )
+    if len(rows) == limit:
+        last = rows[-1]
+        rest = await session.execute(
+            q.where(t_runs.c.commit_seq == last["seq"], t_processed.c.id > last["id"]).order_by(
+                t_processed.c.id
+            )
+        )
+        rows.extend(rest.mappings())
+    return [{**r, "dedupe_hash": bytes(r["dedupe_hash"]).hex()} for r in rows]
+
+
+async def notify_feed(session: AsyncSession, run_id: int) -> None:
+    """Queue a feed wake-up for `run_id`; Postgres delivers it when the transaction commits."""
+    if session.get_bind().dialect.name == "postgresql":
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": FEED_CHANNEL, "payload": str(run_id)},
+        )
+
+
+async def notify_runs_changed(session: AsyncSession, run_ids: list[int]) -> None:
+    """Tell every worker that stored runs were rewritten or deleted (reprocess, purge), on commit."""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for i in range(0, len(run_ids), _IDS_PER_NOTIFY):
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {
+                "channel": RUNS_CHANGED_CHANNEL,
+                "payload": ",".join(map(str, run_ids[i : i + _IDS_PER_NOTIFY])),
+            },
+        )
+
+
+async def listen_feed(
+    engine: AsyncEngine,
+    on_notify: Callable[[], None],
+    *,
+    on_runs_changed: Callable[[list[int]], None] | None = None,
+    retry_seconds: float = 5.0,
+) -> None:
+    """LISTEN for feed (and runs-changed) notifications until cancelled.
+
+    Wakes this process for runs committed by any worker; reconnects after errors.
+    """
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = (await conn.get_raw_connection()).driver_connection
+                lost = asyncio.Event()
+
+                def wake(*_: Any) -> None:
+                    on_notify()
+
+                def changed(_conn: Any, _pid: int, _channel: str, payload: str) -> None:
+                    if on_runs_changed is not None:
+                        on_runs_changed([int(x) for x in payload.split(",") if x])
+
+                await raw.add_listener(FEED_CHANNEL, wake)
+                await raw.add_listener(RUNS_CHANGED_CHANNEL, changed)
+                raw.add_termination_listener(lambda *_: lost.set())
+                try:
+                    # asyncpg dispatches notifications while the connection stays checked out
+                    await lost.wait()
+                finally:
+                    if not raw.is_closed():
+                        await raw.remove_listener(FEED_CHANNEL, wake)
+                        await raw.remove_listener(RUNS_CHANGED_CHANNEL, changed)
+            logger.warning("feed listener connection lost; reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("feed listener failed; retrying")
+            await asyncio.sleep(retry_seconds)
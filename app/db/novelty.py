@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from collections.abc import Collection
+from typing import Any
+
+from sqlalchemy import Insert, and_, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.hashing import DEDUPE_BYTES, query_key
+from app.models import (
+    query_urls as t_query_urls,
+    search_results_processed as t_processed,
+    search_runs as t_runs,
+    urls as t_urls,
+)
+
+__all__ = ["get_novel_results", "mark_novel", "normalize_query", "novelty_key", "rebase_novel"]
+
+_CHUNK = 500
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form under which runs count as repeats."""
+    return " ".join(query.casefold().split())
+
+
+def novelty_key(query: str) -> bytes:
+    return query_key(normalize_query(query))
+
+
+def _insert_ignore(dialect: str) -> Insert | None:
+    if dialect == "postgresql":
+        return postgresql.insert(t_query_urls).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(t_query_urls).on_conflict_do_nothing()
+    return None
+
+
+async def mark_novel(session: AsyncSession, key: bytes, run_id: int, url_ids: Collection[int]) -> set[int]:
+    """Record `url_ids` as seen for `key`; returns those no earlier run had returned.
+
+    Ids are of canonical URLs (MergedResult.canonical_url), so variants of one page
+    count as the same URL.
+
+    Per chunk, a primary-key probe drops ids already seen, then one insert-or-ignore
+    inside the caller's transaction takes the rest; only ids it actually inserted
+    come back (RETURNING), so of two concurrent runs of a query exactly one sees a
+    URL as novel. Repeat runs, which mostly return seen URLs, thus read instead of
+    attempting conflicting inserts. Ids are inserted in sorted order, so two runs
+    of one query take overlapping keys in the same order and cannot deadlock.
+    """
+    ids = sorted(set(url_ids))
+    dialect = session.get_bind().dialect
+    stmt = _insert_ignore(dialect.name)
+    novel: set[int] = set()
+    for i in range(0, len(ids), _CHUNK):
+        chunk = ids[i : i + _CHUNK]
+        seen = set(
+            (
+                await session.execute(
+                    select(t_query_urls.c.url_id).where(
+                        t_query_urls.c.query_hash == key, t_query_urls.c.url_id.in_(chunk)
+                    )
+                )
+            ).scalars()
+        )
+        fresh = [
+            {"query_hash": key, "url_id": u, "first_run_id": run_id} for u in chunk if u not in seen
+        ]
+        if not fresh:
+            continue
+        if stmt is not None and dialect.insert_executemany_returning:
+            res = await session.execute(stmt.returning(t_query_urls.c.url_id), fresh)
+            novel.update(res.scalars())
+            continue
+        # No insert-or-ignore with RETURNING: the probe decides
+        await session.execute(stmt if stmt is not None else insert(t_query_urls), fresh)
+        novel.update(r["url_id"] for r in fresh)
+    return novel
+
+
+async def rebase_novel(
+    session: AsyncSession, key: bytes, run_id: int, old: Collection[int], new: Collection[int]
+) -> set[int]:
+    """Re-mark a rebuilt run whose URL ids went from `old` to `new`; caller commits.
+
+    First sightings the run no longer returns are forgotten, so a later run can be
+    first for them. The new ids are then marked as in `mark_novel`, whose result
+    is returned.
+    """
+    keep = set(new)
+    dropped = sorted(set(old) - keep)
+    for i in range(0, len(dropped), _CHUNK):
+        await session.execute(
+            delete(t_query_urls).where(
+                t_query_urls.c.query_hash == key,
+                t_query_urls.c.first_run_id == run_id,
+                t_query_urls.c.url_id.in_(dropped[i : i + _CHUNK]),
+            )
+        )
+    return await mark_novel(session, key, run_id, new)
+
+
+async def get_novel_results(session: AsyncSession, run_id: int) -> list[dict[str, Any]] | None:
+    """Processed rows of a run whose URL no earlier run of the same query returned.
+
+    None when the run does not exist. Rows store a returned URL while novelty is kept
+    per canonical URL; the two meet on dedupe_hash, a prefix of the canonical url_key.
+    """
+    if (await session.execute(select(t_runs.c.id).where(t_runs.c.id == run_id))).first() is None:
+        return None
+    canonical = t_urls.alias("canonical")
+    res = await session.execute(
+        select(t_urls.c.url, t_processed.c.providers, t_processed.c.confidence, t_processed.c.dedupe_hash)
+        .join(t_query_urls, t_query_urls.c.first_run_id == t_processed.c.run_id)
+        .join(
+            canonical,
+            and_(
+                canonical.c.id == t_query_urls.c.url_id,
+                func.substr(canonical.c.url_hash, 1, DEDUPE_BYTES) == t_processed.c.dedupe_hash,
+            ),
+        )
+        .join(t_urls, t_urls.c.id == t_processed.c.url_id)
+        .where(t_processed.c.run_id == run_id)
+        .order_by(t_processed.c.id)
+    )
+    return [dict(r._mapping) for r in res]
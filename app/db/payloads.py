@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+from collections.abc import Iterable
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any
+
+from sqlalchemy import Insert, delete, exists, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PayloadArchiveSettings
+from app.models import provider_payloads as t_payloads, run_payloads as t_run_payloads
+
+__all__ = [
+    "PayloadCall",
+    "archive_payloads",
+    "compress_payload",
+    "decompress_payload",
+    "encode_payload",
+    "load_run_payloads",
+    "payload_hash",
+    "prune_payloads",
+]
+
+# Hashes per lookup; stays under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+@dataclass(frozen=True)
+class PayloadCall:
+    """One provider call of a run and the body it returned."""
+
+    provider: str
+    query_used: str
+    lang: str | None
+    geo: str | None
+    payload: dict[str, Any]
+
+
+def _zstd() -> ModuleType | None:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def encode_payload(payload: dict[str, Any]) -> bytes:
+    # Sorted keys so equal bodies hash equal whatever order the provider used
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def payload_hash(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=32).digest()
+
+
+def compress_payload(body: bytes, codec: str = "zstd", level: int | None = None) -> tuple[str, bytes]:
+    """(codec actually used, compressed body); zstd falls back to zlib without `zstandard`."""
+    zstd = _zstd() if codec == "zstd" else None
+    if zstd is not None:
+        return "zstd", zstd.ZstdCompressor(level=3 if level is None else level).compress(body)
+    return "zlib", zlib.compress(body, 6 if level is None else min(level, 9))
+
+
+def decompress_payload(codec: str, blob: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    zstd = _zstd()
+    if codec != "zstd" or zstd is None:
+        raise RuntimeError(f"cannot decode {codec!r} payload (zstd needs the zstandard package)")
+    return zstd.ZstdDecompressor().decompress(blob)
+
+
+def _insert_ignore(dialect: str) -> Insert | None:
+    if dialect == "postgresql":
+        return postgresql.insert(t_payloads).on_conflict_do_nothing(index_elements=["hash"])
+    if dialect == "sqlite":
+        return sqlite.insert(t_payloads).on_conflict_do_nothing(index_elements=["hash"])
+    return None
+
+
+async def archive_payloads(
+    session: AsyncSession,
+    run_id: int,
+    calls: Iterable[PayloadCall],
+    settings: PayloadArchiveSettings,
+) -> int:
+    """Store each call's body once (content-addressed) and link it to the run; caller commits.
+
+    Bodies already in the archive are neither recompressed nor rewritten; they are
+    held with FOR KEY SHARE (Postgres) until commit, so a concurrent `prune_payloads`
+    skips them rather than deleting a body this run is about to link. Returns the
+    number of new bodies stored.
+    """
+    links: list[dict[str, Any]] = []
+    bodies: dict[bytes, bytes] = {}
+    for seq, call in enumerate(calls):
+        body = encode_payload(call.payload)
+        h = payload_hash(body)
+        bodies.setdefault(h, body)
+        links.append(
+            {
+                "run_id": run_id,
+                "seq": seq,
+                "provider": call.provider,
+                "query_used": call.query_used,
+                "lang": call.lang,
+                "geo": call.geo,
+                "payload_hash": h,
+            }
+        )
+    if not links:
+        return 0
+    hashes = list(bodies)
+    known: set[bytes] = set()
+    for i in range(0, len(hashes), _CHUNK):
+        res = await session.execute(
+            select(t_payloads.c.hash)
+            .where(t_payloads.c.hash.in_(hashes[i : i + _CHUNK]))
+            .with_for_update(read=True, key_share=True)
+        )
+        known.update(bytes(h) for h in res.scalars())
+    rows = []
+    for h in hashes:
+        if h in known:
+            continue
+        codec, blob = compress_payload(bodies[h], settings.codec, settings.level)
+        rows.append({"hash": h, "codec": codec, "size": len(bodies[h]), "body": blob})
+    if rows:
+        # Insert-or-ignore covers a concurrent run storing the same body first
+        stmt = _insert_ignore(session.get_bind().dialect.name)
+        await session.execute(stmt if stmt is not None else insert(t_payloads), rows)
+    await session.execute(insert(t_run_payloads), links)
+    return len(rows)
+
+
+async def load_run_payloads(session: AsyncSession, run_id: int) -> list[PayloadCall]:
+    """Archived calls of a run in the order they were stored; empty if none were kept."""
+    res = await session.execute(
+        select(
+            t_run_payloads.c.provider,
+            t_run_payloads.c.query_used,
+            t_run_payloads.c.lang,
+            t_run_payloads.c.geo,
+            t_payloads.c.codec,
+            t_payloads.c.body,
+        )
+        .join(t_payloads, t_payloads.c.hash == t_run_payloads.c.payload_hash)
+        .where(t_run_payloads.c.run_id == run_id)
+        .order_by(t_run_payloads.c.seq)
+    )
+    return [
+        PayloadCall(
+            provider=r.provider,
+            query_used=r.query_used,
+            lang=r.lang,
+            geo=r.geo,
+            payload=json.loads(decompress_payload(r.codec, r.body)),
+        )
+        for r in res
+    ]
+
+
+async def prune_payloads(session: AsyncSession) -> int:
+    """Delete bodies no run links to any more (after runs were purged); caller commits.
+
+    Bodies an uncommitted `archive_payloads` holds are skipped (SKIP LOCKED on
+    Postgres; SQLite has one writer at a time), so they are never deleted under it.
+    """
+    orphans = (
+        select(t_payloads.c.hash)
+        .where(~exists().where(t_run_payloads.c.payload_hash == t_payloads.c.hash))
+        .with_for_update(skip_locked=True)
+    )
+    res = await session.execute(delete(t_payloads).where(t_payloads.c.hash.in_(orphans)))
+    return res.rowcount or 0
@@ -1,17 +1,30 @@
 from __future__ import annotations
 
-from typing import Any, Iterable
+import base64
+import json
+import weakref
+from collections.abc import Mapping, Sequence
+from datetime import UTC, datetime
+from typing import Any, AsyncIterator, Iterable
 
-from sqlalchemy import insert, select
+from sqlalchemy import Select, and_, bindparam, delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
+from app.core.hashing import query_key
+from app.core.snapshot import unpack_snapshot
+from app.db.bulk import bulk_write
+from app.db.search_index import create_search_index_ddl
+from app.db.urls import upsert_urls
 from app.models import (
+    commit_sequence as t_commit_seq,
     metadata,
     queries as t_queries,
     search_results_processed as t_processed,
     search_results_raw as t_raw,
     search_runs as t_runs,
+    urls as t_urls,
 )
 
 __all__ = [
@@ -19,17 +32,41 @@ __all__ = [
     "get_cached_rewritten_template",
     "insert_query_cache",
     "insert_search_run",
+    "next_commit_seq",
+    "stamp_run_committed",
     "bulk_insert_raw",
     "bulk_insert_processed",
+    "write_raw_records",
+    "write_processed_records",
+    "get_processed_keys",
+    "rewrite_processed_records",
+    "get_raw_urls",
     "get_run",
+    "set_run_snapshot",
+    "get_run_snapshot",
     "list_runs",
+    "iter_runs",
+    "encode_run_cursor",
+    "decode_run_cursor",
 ]
 
 
+# Engines whose schema init_models has already ensured in this process
+_initialized_engines: weakref.WeakSet[AsyncEngine] = weakref.WeakSet()
+
+
 async def init_models(session: AsyncSession) -> None:
-    """Create all tables for the current engine (used for tests)."""
-    async with session.bind.begin() as conn:  # type: ignore[arg-type]
+    """Create all tables for the current engine (used for tests).
+
+    Runs once per engine; later calls return without touching the database.
+    """
+    engine = session.bind
+    if engine in _initialized_engines:
+        return
+    async with engine.begin() as conn:  # type: ignore[union-attr]
         await conn.run_sync(metadata.create_all)
+        await conn.run_sync(create_search_index_ddl)
+    _initialized_engines.add(engine)  # type: ignore[arg-type]
 
 
 async def get_cached_rewritten_template(session: AsyncSession, original_query: str) -> str | None:
@@ -57,73 +94,292 @@ async def insert_search_run(
     rewritten_template: str,
     config: dict,
     providers_used: list[str],
+    *,
+    commit: bool = True,
 ) -> int:
     stmt = insert(t_runs).values(
         query=query,
+        query_hash=query_key(query),
+        # Set client-side so every row has microsecond precision for keyset paging
+        run_timestamp=datetime.now(UTC).replace(tzinfo=None),
         rewritten_template=rewritten_template,
         config=config,
         providers_used=providers_used,
     )
     res = await session.execute(stmt)
-    await session.commit()
+    if commit:
+        await session.commit()
     run_id = int(res.inserted_primary_key[0])
     return run_id
 
 
-async def bulk_insert_raw(session: AsyncSession, run_id: int, rows: Iterable[dict[str, Any]]) -> None:
-    payload = []
-    for r in rows:
-        payload.append(
-            {
-                "run_id": run_id,
-                "provider": r.get("provider"),
-                "url": r.get("url"),
-                "rank": r.get("rank"),
-                "meta": r.get("meta"),
-            }
-        )
-    if payload:
-        await session.execute(insert(t_raw), payload)
+_COMMIT_SEQ = "commit"
+
+
+async def next_commit_seq(session: AsyncSession) -> int:
+    """Next value of the commit-ordered sequence; call last, just before commit.
+
+    Bumping the counter row locks it until this transaction ends (a row lock on
+    Postgres, the database write lock on SQLite), so values become visible in the
+    order they were handed out. A reader that has seen value N has seen everything
+    below it, which serial ids do not guarantee with concurrent writers.
+    """
+    bump = update(t_commit_seq).where(t_commit_seq.c.name == _COMMIT_SEQ).values(value=t_commit_seq.c.value + 1)
+    if (await session.execute(bump)).rowcount == 0:
+        # First use on a database created by create_all; concurrent firsts insert once
+        dialect = session.get_bind().dialect.name
+        row = {"name": _COMMIT_SEQ, "value": 0}
+        if dialect == "postgresql":
+            await session.execute(postgresql.insert(t_commit_seq).values(row).on_conflict_do_nothing())
+        elif dialect == "sqlite":
+            await session.execute(sqlite.insert(t_commit_seq).values(row).on_conflict_do_nothing())
+        else:
+            await session.execute(insert(t_commit_seq).values(row))
+        await session.execute(bump)
+    res = await session.execute(select(t_commit_seq.c.value).where(t_commit_seq.c.name == _COMMIT_SEQ))
+    return int(res.scalar_one())
+
+
+async def stamp_run_committed(session: AsyncSession, run_id: int) -> int:
+    """Give `run_id` the next commit sequence value; caller commits right after."""
+    seq = await next_commit_seq(session)
+    await session.execute(update(t_runs).where(t_runs.c.id == run_id).values(commit_seq=seq))
+    return seq
+
+
+# Positional layouts for the streaming writers below (run_id is prepended)
+RAW_COLUMNS = ("run_id", "provider", "url_id", "rank", "meta")
+PROCESSED_COLUMNS = ("run_id", "url_id", "providers", "confidence", "dedupe_hash", "score")
+
+
+async def write_raw_records(
+    session: AsyncSession,
+    run_id: int,
+    records: Iterable[tuple[str, int, int | None, dict[str, Any] | None]],
+    *,
+    commit: bool = True,
+) -> int:
+    """Stream (provider, url_id, rank, meta) tuples through the backend's bulk path.
+
+    URL ids come from `app.db.urls.upsert_urls`.
+    """
+    n = await bulk_write(session, t_raw, RAW_COLUMNS, ((run_id, *r) for r in records))
+    if n and commit:
+        await session.commit()
+    return n
+
+
+async def write_processed_records(
+    session: AsyncSession,
+    run_id: int,
+    records: Iterable[tuple[int, list[str], int, bytes, float | None]],
+    *,
+    commit: bool = True,
+) -> int:
+    """Stream (url_id, providers, confidence, dedupe_hash, score) tuples through the backend's bulk path."""
+    n = await bulk_write(session, t_processed, PROCESSED_COLUMNS, ((run_id, *r) for r in records))
+    if n and commit:
         await session.commit()
+    return n
+
+
+async def get_processed_keys(
+    session: AsyncSession, run_ids: Sequence[int]
+) -> dict[int, dict[bytes, tuple[int, list[str]]]]:
+    """{run_id: {dedupe_hash: (row id, providers)}} of the processed rows of `run_ids`."""
+    p = t_processed.c
+    res = await session.execute(
+        select(p.run_id, p.dedupe_hash, p.id, p.providers).where(p.run_id.in_(run_ids))
+    )
+    out: dict[int, dict[bytes, tuple[int, list[str]]]] = {}
+    for run_id, dedupe_hash, row_id, providers in res:
+        out.setdefault(run_id, {})[bytes(dedupe_hash)] = (row_id, providers)
+    return out
 
 
-async def bulk_insert_processed(session: AsyncSession, run_id: int, rows: Iterable[dict[str, Any]]) -> None:
-    payload = []
-    for r in rows:
-        payload.append(
+async def rewrite_processed_records(
+    session: AsyncSession,
+    run_id: int,
+    records: Iterable[tuple[int, list[str], int, bytes, float | None]],
+    existing: Mapping[bytes, int],
+) -> None:
+    """Replace a run's processed rows with (url_id, providers, confidence, dedupe_hash, score)
+    tuples; caller commits.
+
+    `existing` maps the run's current dedupe_hash values to row ids
+    (`get_processed_keys`). Rows whose dedupe_hash survives are updated in place
+    and keep their id; the rest are deleted or inserted.
+    """
+    updates, inserts = [], []
+    for url_id, providers, confidence, dedupe_hash, score in records:
+        row_id = existing.get(dedupe_hash)
+        if row_id is None:
+            inserts.append((url_id, providers, confidence, dedupe_hash, score))
+            continue
+        # Bind names must differ from the SET columns
+        updates.append(
             {
-                "run_id": run_id,
-                "url": r.get("url"),
-                "providers": r.get("providers"),
-                "confidence": r.get("confidence"),
-                "dedupe_hash": r.get("dedupe_hash"),
+                "row_id": row_id,
+                "b_url": url_id,
+                "b_providers": providers,
+                "b_confidence": confidence,
+                "b_score": score,
             }
         )
-    if payload:
-        await session.execute(insert(t_processed), payload)
-        await session.commit()
+    gone = set(existing.values()) - {u["row_id"] for u in updates}
+    if gone:
+        await session.execute(delete(t_processed).where(t_processed.c.id.in_(gone)))
+    if updates:
+        await session.execute(
+            update(t_processed)
+            .where(t_processed.c.id == bindparam("row_id"))
+            .values(
+                url_id=bindparam("b_url"),
+                providers=bindparam("b_providers"),
+                confidence=bindparam("b_confidence"),
+                score=bindparam("b_score"),
+            ),
+            updates,
+        )
+    await write_processed_records(session, run_id, inserts, commit=False)
+
+
+async def get_raw_urls(
+    session: AsyncSession, run_ids: Sequence[int]
+) -> dict[int, list[tuple[str, str, int | None]]]:
+    """(provider, url as returned, rank) per raw row, in write order, keyed by run id.
+
+    Runs without raw rows (none stored, or compacted into the archive) are absent.
+    """
+    res = await session.execute(
+        select(t_raw.c.run_id, t_raw.c.provider, t_urls.c.url, t_raw.c.rank)
+        .join(t_urls, t_urls.c.id == t_raw.c.url_id)
+        .where(t_raw.c.run_id.in_(run_ids))
+        .order_by(t_raw.c.run_id, t_raw.c.id)
+    )
+    out: dict[int, list[tuple[str, str, int | None]]] = {}
+    for run_id, provider, url, rank in res:
+        out.setdefault(run_id, []).append((provider, url, rank))
+    return out
+
+
+async def bulk_insert_raw(
+    session: AsyncSession, run_id: int, rows: Iterable[dict[str, Any]], *, commit: bool = True
+) -> None:
+    rows = list(rows)
+    ids = await upsert_urls(session, (r["url"] for r in rows))
+    await write_raw_records(
+        session,
+        run_id,
+        ((r.get("provider"), ids[r["url"]], r.get("rank"), r.get("meta")) for r in rows),
+        commit=commit,
+    )
+
+
+async def bulk_insert_processed(
+    session: AsyncSession, run_id: int, rows: Iterable[dict[str, Any]], *, commit: bool = True
+) -> None:
+    rows = list(rows)
+    ids = await upsert_urls(session, (r["url"] for r in rows))
+    await write_processed_records(
+        session,
+        run_id,
+        (
+            (ids[r["url"]], r.get("providers"), r.get("confidence"), r.get("dedupe_hash"), r.get("score"))
+            for r in rows
+        ),
+        commit=commit,
+    )
+
+
+# Everything but the snapshot blob, which only the GET-by-id path reads
+_RUN_COLUMNS = [c for c in t_runs.c if c.name != "snapshot"]
+
+
+async def set_run_snapshot(session: AsyncSession, run_id: int, snapshot: bytes) -> None:
+    """Store the packed response body (app.core.snapshot.pack_snapshot); caller commits."""
+    await session.execute(update(t_runs).where(t_runs.c.id == run_id).values(snapshot=snapshot))
+
+
+async def get_run_snapshot(session: AsyncSession, run_id: int) -> bytes | None:
+    """Serialized GET /search-runs/{id} body via one primary-key lookup.
+
+    None when the run does not exist or predates snapshots; use `get_run` then.
+    """
+    blob = (await session.execute(select(t_runs.c.snapshot).where(t_runs.c.id == run_id))).scalar()
+    return unpack_snapshot(blob) if blob is not None else None
 
 
 async def get_run(session: AsyncSession, run_id: int) -> dict[str, Any] | None:
     # Fetch run
-    run_res = await session.execute(select(t_runs).where(t_runs.c.id == run_id))
+    run_res = await session.execute(select(*_RUN_COLUMNS).where(t_runs.c.id == run_id))
     run_row = run_res.mappings().first()
     if not run_row:
         return None
     # Fetch processed results
-    proc_res = await session.execute(select(t_processed).where(t_processed.c.run_id == run_id))
+    proc_res = await session.execute(
+        select(t_processed, t_urls.c.url)
+        .join(t_urls, t_urls.c.id == t_processed.c.url_id)
+        .where(t_processed.c.run_id == run_id)
+        .order_by(t_processed.c.id)
+    )
     processed = [dict(r._mapping) for r in proc_res]
     return {"run": dict(run_row), "processed": processed}
 
 
+def encode_run_cursor(run_timestamp: datetime, run_id: int) -> str:
+    """Opaque keyset cursor for the run listing: the last row's (run_timestamp, id)."""
+    raw = json.dumps([run_timestamp.isoformat(), run_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_run_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of `encode_run_cursor`; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, run_id = json.loads(raw)
+        return datetime.fromisoformat(ts), int(run_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _filter_runs(q: Select, filters: dict[str, Any]) -> Select:
+    if filters.get("query") is not None:
+        # Hash narrows via ix_runs_query_hash_timestamp_id; text compare rules out collisions
+        q = q.where(t_runs.c.query_hash == query_key(filters["query"]), t_runs.c.query == filters["query"])
+    if filters.get("from") is not None:
+        q = q.where(t_runs.c.run_timestamp >= filters["from"])  # expects naive UTC datetime
+    if filters.get("to") is not None:
+        q = q.where(t_runs.c.run_timestamp <= filters["to"])
+    return q
+
+
+async def iter_runs(
+    session: AsyncSession,
+    filters: dict | None = None,
+    *,
+    after: tuple[datetime, int] | None = None,
+    limit: int | None = None,
+    batch_size: int = 500,
+) -> AsyncIterator[dict[str, Any]]:
+    """Stream runs newest first, ordered by (run_timestamp, id) descending.
+
+    `after` is the (run_timestamp, id) of the last row already seen (keyset
+    pagination). Rows are fetched `batch_size` at a time rather than all at once.
+    """
+    q = _filter_runs(select(*_RUN_COLUMNS), filters or {})
+    if after is not None:
+        ts, run_id = after
+        q = q.where(
+            or_(t_runs.c.run_timestamp < ts, and_(t_runs.c.run_timestamp == ts, t_runs.c.id < run_id))
+        )
+    q = q.order_by(t_runs.c.run_timestamp.desc(), t_runs.c.id.desc())
+    if limit is not None:
+        q = q.limit(limit)
+    result = await session.stream(q.execution_options(yield_per=batch_size))
+    async for row in result.mappings():
+        yield dict(row)
+
+
 async def list_runs(session: AsyncSession, filters: dict | None = None) -> list[dict[str, Any]]:
-    filters = filters or {}
-    q = select(t_runs)
-    if "query" in filters:
-        q = q.where(t_runs.c.query == filters["query"])  # simple exact match for now
-    if "from" in filters:
-        q = q.where(t_runs.c.run_timestamp >= filters["from"])  # expects datetime
-    if "to" in filters:
-        q = q.where(t_runs.c.run_timestamp <= filters["to"])  # expects datetime
-    res = await session.execute(q)
-    return [dict(r._mapping) for r in res]
+    return [r async for r in iter_runs(session, filters)]
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import zlib
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from itertools import groupby
+from typing import Any
+
+from sqlalchemy import delete, exists, func, insert, select, text, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import RetentionSettings
+from app.db.feed import notify_runs_changed
+from app.db.payloads import prune_payloads
+from app.models import (
+    query_urls as t_query_urls,
+    run_payloads as t_run_payloads,
+    search_raw_archive as t_archive,
+    search_results_processed as t_processed,
+    search_results_raw as t_raw,
+    search_runs as t_runs,
+    url_index as t_index,
+    url_stats as t_stats,
+    urls as t_urls,
+)
+
+__all__ = [
+    "RetentionReport",
+    "compact_raw",
+    "drop_raw_partitions",
+    "ensure_raw_partitions",
+    "exclusive_retention",
+    "load_raw_archive",
+    "purge_runs",
+    "raw_partition_ddl",
+    "raw_partition_months",
+    "retention_loop",
+    "run_retention",
+]
+
+logger = logging.getLogger("app.retention")
+
+# Postgres advisory lock key held for one retention pass, so one process runs at a time
+_LOCK_KEY = 0x7E7E_4E71
+
+_RAW = "search_results_raw"
+_PARTITION_RE = re.compile(rf"^{_RAW}_p(\d{{4}})(\d{{2}})$")
+
+
+@dataclass
+class RetentionReport:
+    runs_purged: int = 0
+    runs_compacted: int = 0
+    raw_rows_archived: int = 0
+    payloads_pruned: int = 0
+    partitions_created: list[str] = field(default_factory=list)
+    partitions_dropped: list[str] = field(default_factory=list)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+# ----- Postgres monthly partitions of search_results_raw -----
+
+
+def _month_start(d: datetime) -> datetime:
+    return d.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(d: datetime) -> datetime:
+    return _month_start(d.replace(day=28) + timedelta(days=4))
+
+
+def raw_partition_months(first: datetime, now: datetime, months_ahead: int) -> Iterator[datetime]:
+    """Month starts from `first`'s month through `months_ahead` months past `now`."""
+    last = _month_start(now)
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    m = _month_start(first)
+    while m <= last:
+        yield m
+        m = _next_month(m)
+
+
+def raw_partition_ddl(month: datetime) -> tuple[str, str]:
+    """(partition name, CREATE statement) for the month starting at `month`."""
+    name = f"{_RAW}_p{month:%Y%m}"
+    ddl = (
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {_RAW} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+    )
+    return name, ddl
+
+
+async def _raw_is_partitioned(session: AsyncSession) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    kind = (await session.execute(text(f"SELECT relkind FROM pg_class WHERE relname = '{_RAW}'"))).scalar()
+    return kind == "p"
+
+
+async def ensure_raw_partitions(session: AsyncSession, months_ahead: int, *, now: datetime | None = None) -> list[str]:
+    """Create this month's and the next `months_ahead` raw partitions; returns those created."""
+    if not await _raw_is_partitioned(session):
+        return []
+    now = now or _utcnow()
+    existing = set(await _raw_partitions(session))
+    created: list[str] = []
+    for month in raw_partition_months(now, now, months_ahead):
+        name, ddl = raw_partition_ddl(month)
+        if name in existing:
+            continue
+        try:
+            async with session.begin_nested():
+                await session.execute(text(ddl))
+            created.append(name)
+        except DBAPIError:
+            # Rows for that month already sit in the default partition; leave them there
+            logger.warning("could not create raw partition %s", name, exc_info=True)
+    await session.commit()
+    return created
+
+
+async def _raw_partitions(session: AsyncSession) -> list[str]:
+    res = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            f"JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = '{_RAW}'"
+        )
+    )
+    return list(res.scalars())
+
+
+async def drop_raw_partitions(session: AsyncSession, older_than: datetime) -> list[str]:
+    """Drop monthly raw partitions that end on or before `older_than` (metadata-only)."""
+    if not await _raw_is_partitioned(session):
+        return []
+    dropped: list[str] = []
+    for name in sorted(await _raw_partitions(session)):
+        m = _PARTITION_RE.match(name)
+        if not m or _next_month(datetime(int(m.group(1)), int(m.group(2)), 1)) > older_than:
+            continue
+        await session.execute(text(f"ALTER TABLE {_RAW} DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    await session.commit()
+    return dropped
+
+
+# ----- Run purge and raw compaction -----
+
+
+# Run ids without a foreign key, nulled when their run is purged
+_RUN_REFS = (t_stats.c.last_run_id, t_query_urls.c.first_run_id, t_index.c.last_run_id)
+
+
+async def _cascades(session: AsyncSession) -> bool:
+    # SQLite only honours ON DELETE CASCADE with PRAGMA foreign_keys=ON
+    if session.get_bind().dialect.name == "sqlite":
+        return bool((await session.execute(text("PRAGMA foreign_keys"))).scalar())
+    return True
+
+
+async def purge_runs(
+    session: AsyncSession,
+    older_than: datetime,
+    *,
+    batch_size: int = 500,
+    on_purged: Callable[[list[int]], None] | None = None,
+) -> int:
+    """Delete runs older than `older_than`, oldest first, `batch_size` per transaction.
+
+    Child rows go with them through ON DELETE CASCADE (emulated where SQLite has
+    foreign keys off). Run ids kept without a foreign key (`url_stats.last_run_id`,
+    `query_urls.first_run_id`, `url_index.last_run_id`) are set to NULL in the same
+    batch, so they never point at a purged run or at a later run that reuses its id;
+    the rows themselves stay, as aggregates and first sightings outlive runs. Each
+    batch's ids go out through `notify_runs_changed` in its transaction, so every
+    worker's run cache drops them (Postgres); `on_purged` sees each committed batch
+    in this process.
+    """
+    cascades = await _cascades(session)
+    total = 0
+    while True:
+        ids = list(
+            (
+                await session.execute(
+                    select(t_runs.c.id)
+                    .where(t_runs.c.run_timestamp < older_than)
+                    .order_by(t_runs.c.run_timestamp, t_runs.c.id)
+                    .limit(batch_size)
+                )
+            ).scalars()
+        )
+        if not ids:
+            break
+        if not cascades:
+            for child in (t_raw, t_processed, t_archive, t_run_payloads):
+                await session.execute(delete(child).where(child.c.run_id.in_(ids)))
+        for column in _RUN_REFS:
+            await session.execute(update(column.table).where(column.in_(ids)).values({column: None}))
+        await session.execute(delete(t_runs).where(t_runs.c.id.in_(ids)))
+        await notify_runs_changed(session, ids)
+        await session.commit()
+        total += len(ids)
+        if on_purged is not None:
+            on_purged(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def _pack(rows: list[dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"), 6)
+
+
+async def compact_raw(session: AsyncSession, older_than: datetime, *, batch_size: int = 500) -> tuple[int, int]:
+    """Move raw rows of runs older than `older_than` into one archive blob per run.
+
+    Returns (runs compacted, raw rows archived). Archive and delete commit together.
+    """
+    runs_done = rows_done = 0
+    has_raw = exists().where(t_raw.c.run_id == t_runs.c.id)
+    while True:
+        ids = list(
+            (
+                await session.execute(
+                    select(t_runs.c.id)
+                    .where(t_runs.c.run_timestamp < older_than, has_raw)
+                    .order_by(t_runs.c.run_timestamp, t_runs.c.id)
+                    .limit(batch_size)
+                )
+            ).scalars()
+        )
+        if not ids:
+            break
+        res = await session.execute(
+            select(t_raw.c.run_id, t_raw.c.provider, t_urls.c.url, t_raw.c.rank, t_raw.c.meta)
+            .join(t_urls, t_urls.c.id == t_raw.c.url_id)
+            .where(t_raw.c.run_id.in_(ids))
+            .order_by(t_raw.c.run_id, t_raw.c.id)
+        )
+        archives = []
+        for run_id, group in groupby(res, key=lambda r: r.run_id):
+            rows = [{"provider": r.provider, "url": r.url, "rank": r.rank, "meta": r.meta} for r in group]
+            archives.append({"run_id": run_id, "row_count": len(rows), "payload": _pack(rows)})
+            rows_done += len(rows)
+        await session.execute(insert(t_archive), archives)
+        await session.execute(delete(t_raw).where(t_raw.c.run_id.in_(ids)))
+        await session.commit()
+        runs_done += len(ids)
+        if len(ids) < batch_size:
+            break
+    return runs_done, rows_done
+
+
+async def load_raw_archive(session: AsyncSession, run_id: int) -> list[dict[str, Any]] | None:
+    """Archived raw rows of a run as {provider, url, rank, meta} dicts; None if not compacted."""
+    blob = (
+        await session.execute(select(t_archive.c.payload).where(t_archive.c.run_id == run_id))
+    ).scalar()
+    return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+
+async def run_retention(
+    session: AsyncSession,
+    settings: RetentionSettings,
+    *,
+    now: datetime | None = None,
+    on_purged: Callable[[list[int]], None] | None = None,
+) -> RetentionReport:
+    """One pass of the configured policy: partitions, compaction, then purge."""
+    now = now or _utcnow()
+    report = RetentionReport()
+    report.partitions_created = await ensure_raw_partitions(
+        session, settings.partition_months_ahead, now=now
+    )
+    if settings.raw_compact_after_days:
+        report.runs_compacted, report.raw_rows_archived = await compact_raw(
+            session, now - timedelta(days=settings.raw_compact_after_days), batch_size=settings.batch_size
+        )
+    if settings.run_max_age_days:
+        cutoff = now - timedelta(days=settings.run_max_age_days)
+        # Whole months of raw rows go first so the cascade below has little left to delete
+        report.partitions_dropped = await drop_raw_partitions(session, cutoff)
+        report.runs_purged = await purge_runs(
+            session, cutoff, batch_size=settings.batch_size, on_purged=on_purged
+        )
+        if report.runs_purged:
+            # Bodies shared with surviving runs stay
+            report.payloads_pruned = await prune_payloads(session)
+            await session.commit()
+    return report
+
+
+async def exclusive_retention(
+    settings: RetentionSettings,
+    session_factory: async_sessionmaker[AsyncSession],
+    *,
+    on_purged: Callable[[list[int]], None] | None = None,
+) -> RetentionReport | None:
+    """One `run_retention` pass; None when another process is running one.
+
+    On Postgres the pass holds `pg_try_advisory_lock` on its own connection (a pass
+    commits per batch, and a pooled session could switch connections in between),
+    so workers and cron jobs never purge or compact the same rows concurrently.
+    """
+    engine = session_factory.kw["bind"]
+    if engine.dialect.name != "postgresql":
+        async with session_factory() as session:
+            return await run_retention(session, settings, on_purged=on_purged)
+    async with engine.connect() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_lock(_LOCK_KEY))):
+            return None
+        # Session-level lock: it outlives this transaction and every batch commit
+        await conn.commit()
+        try:
+            async with session_factory(bind=conn) as session:
+                return await run_retention(session, settings, on_purged=on_purged)
+        finally:
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(_LOCK_KEY)))
+            await conn.commit()
+
+
+async def retention_loop(
+    settings: RetentionSettings,
+    session_factory: async_sessionmaker[AsyncSession],
+    *,
+    on_purged: Callable[[list[int]], None] | None = None,
+) -> None:
+    """Run `exclusive_retention` now and then every `interval_seconds` until cancelled."""
+    while True:
+        try:
+            report = await exclusive_retention(settings, session_factory, on_purged=on_purged)
+            if report is None:
+                logger.info("retention pass skipped: another process holds the lock")
+            else:
+                logger.info("retention pass: %s", report)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("retention pass failed")
+        await asyncio.sleep(settings.interval_seconds)
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import Any
+
+from sqlalchemy import and_, bindparam, func, insert, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import LocalIndexSettings
+from app.core.schema import ProviderNeutralQuery
+from app.models import (
+    search_results_raw as t_raw,
+    search_runs as t_runs,
+    url_index as t_index,
+    url_index_state as t_state,
+    urls as t_urls,
+)
+
+__all__ = [
+    "create_search_index_ddl",
+    "rebuild_search_documents",
+    "refresh_loop",
+    "refresh_search_index",
+    "search_index",
+]
+
+logger = logging.getLogger("app.search_index")
+
+# url_index_state.last_id of this source is the last search_runs.commit_seq folded in
+_RUNS_SOURCE = "runs"
+# Results the local index served are already indexed; re-reading them would loop
+_LOCAL_PROVIDER = "local"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Postgres: `url_index.document` is this tsvector, kept by the refresh (the URL text is
+# in `urls`, so an expression index over url_index alone cannot cover it)
+_PG_DOC = (
+    "to_tsvector('simple', coalesce(i.title, '') || ' ' || coalesce(i.snippet, '') || ' ' || u.url)"
+)
+_PG_SET_DOCUMENT = f"UPDATE url_index i SET document = {_PG_DOC} FROM urls u WHERE u.id = i.url_id"
+# SQLite: FTS5 rows are keyed by url_id
+_FTS_INSERT = (
+    "INSERT INTO url_index_fts(rowid, title, snippet, url) "
+    "SELECT i.url_id, coalesce(i.title, ''), coalesce(i.snippet, ''), u.url "
+    "FROM url_index i JOIN urls u ON u.id = i.url_id"
+)
+
+
+def create_search_index_ddl(conn: Connection) -> None:
+    """Create the dialect-specific full-text structures over `url_index` (idempotent)."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        try:
+            conn.execute(
+                text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS url_index_fts "
+                    "USING fts5(title, snippet, url, tokenize='unicode61')"
+                )
+            )
+        except DBAPIError:
+            # SQLite built without FTS5; search_index falls back to LIKE scans
+            pass
+    elif dialect == "postgresql":
+        conn.execute(text("ALTER TABLE url_index ADD COLUMN IF NOT EXISTS document tsvector"))
+        conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_url_index_document ON url_index USING GIN (document)")
+        )
+
+
+def rebuild_search_documents(conn: Connection) -> None:
+    """Re-derive every full-text document from `url_index` and `urls` (migrations)."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'url_index_fts'")
+        ).first()
+        if exists is not None:
+            conn.execute(text("DELETE FROM url_index_fts"))
+            conn.execute(text(_FTS_INSERT))
+    elif dialect == "postgresql":
+        conn.execute(text(_PG_SET_DOCUMENT))
+
+
+async def _has_fts5(session: AsyncSession) -> bool:
+    res = await session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'url_index_fts'")
+    )
+    return res.first() is not None
+
+
+def _keyword_tokens(schema: ProviderNeutralQuery) -> list[list[str]]:
+    out: list[list[str]] = []
+    for kw in schema.keywords:
+        toks = [t.lower() for t in _TOKEN_RE.findall(kw)]
+        if toks:
+            out.append(toks)
+    return out
+
+
+def _host_matches(url: str, sites: list[str]) -> bool:
+    host = url.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0].lower()
+    for site in sites:
+        s = site.lower().lstrip(".")
+        if host == s or host.endswith("." + s):
+            return True
+    return False
+
+
+async def _claim_watermark(session: AsyncSession) -> int:
+    """Lock this refresher's state row and return the last consumed commit_seq.
+
+    Concurrent refreshers queue on the row lock (the write lock on SQLite) and
+    read the watermark the previous one committed, so batches never overlap.
+    """
+    dialect = session.get_bind().dialect.name
+    row = {"source": _RUNS_SOURCE, "last_id": 0}
+    if dialect == "postgresql":
+        await session.execute(postgresql.insert(t_state).values(row).on_conflict_do_nothing())
+    elif dialect == "sqlite":
+        await session.execute(sqlite.insert(t_state).values(row).on_conflict_do_nothing())
+    else:
+        exists = await session.execute(select(t_state.c.source).where(t_state.c.source == _RUNS_SOURCE))
+        if exists.first() is None:
+            await session.execute(insert(t_state).values(row))
+    await session.execute(
+        update(t_state).where(t_state.c.source == _RUNS_SOURCE).values(last_id=t_state.c.last_id)
+    )
+    res = await session.execute(select(t_state.c.last_id).where(t_state.c.source == _RUNS_SOURCE))
+    return int(res.scalar_one())
+
+
+async def refresh_search_index(session: AsyncSession, batch_size: int = 100) -> int:
+    """Fold the raw rows of runs committed since the last refresh into `url_index`.
+
+    Runs are consumed in `commit_seq` order, `batch_size` runs per transaction, so
+    a run that commits late is never skipped. Rows the local index itself returned
+    are left out. Titles/snippets come from raw-row meta; the first non-empty value
+    wins. Returns the number of raw rows consumed.
+    """
+    bind = session.get_bind()
+    sqlite_fts = bind.dialect.name == "sqlite" and await _has_fts5(session)
+    consumed = 0
+    while True:
+        last_seq = await _claim_watermark(session)
+        runs = (
+            await session.execute(
+                select(t_runs.c.id, t_runs.c.commit_seq)
+                .where(t_runs.c.commit_seq > last_seq)
+                .order_by(t_runs.c.commit_seq)
+                .limit(batch_size)
+            )
+        ).all()
+        if not runs:
+            await session.commit()
+            return consumed
+        rows = (
+            await session.execute(
+                select(t_raw.c.id, t_raw.c.run_id, t_raw.c.url_id, t_raw.c.meta)
+                .where(t_raw.c.run_id.in_([r.id for r in runs]), t_raw.c.provider != _LOCAL_PROVIDER)
+                .order_by(t_raw.c.id)
+            )
+        ).all()
+
+        batch: dict[int, dict[str, Any]] = {}
+        for r in rows:
+            meta = r.meta or {}
+            entry = batch.setdefault(
+                r.url_id, {"title": None, "snippet": None, "count": 0, "run_id": r.run_id}
+            )
+            entry["count"] += 1
+            entry["run_id"] = max(entry["run_id"], r.run_id)
+            entry["title"] = entry["title"] or meta.get("title")
+            entry["snippet"] = entry["snippet"] or meta.get("snippet")
+
+        existing = {
+            e.url_id: e
+            for e in (
+                await session.execute(
+                    select(t_index.c.url_id, t_index.c.title, t_index.c.snippet).where(
+                        t_index.c.url_id.in_(list(batch))
+                    )
+                )
+            ).all()
+        }
+        new_rows = [
+            {
+                "url_id": u,
+                "title": e["title"],
+                "snippet": e["snippet"],
+                "seen_count": e["count"],
+                "last_run_id": e["run_id"],
+            }
+            for u, e in batch.items()
+            if u not in existing
+        ]
+        if new_rows:
+            await session.execute(insert(t_index), new_rows)
+        changed: list[int] = [r["url_id"] for r in new_rows]
+        updates = []
+        for u, row in existing.items():
+            e = batch[u]
+            title = row.title or e["title"]
+            snippet = row.snippet or e["snippet"]
+            if (title, snippet) != (row.title, row.snippet):
+                changed.append(u)
+            updates.append(
+                {"b_id": u, "b_title": title, "b_snippet": snippet, "b_count": e["count"], "b_run": e["run_id"]}
+            )
+        if updates:
+            await session.execute(
+                update(t_index)
+                .where(t_index.c.url_id == bindparam("b_id"))
+                .values(
+                    title=bindparam("b_title"),
+                    snippet=bindparam("b_snippet"),
+                    seen_count=t_index.c.seen_count + bindparam("b_count"),
+                    last_run_id=bindparam("b_run"),
+                    updated_at=func.now(),
+                ),
+                updates,
+            )
+
+        ids = bindparam("ids", expanding=True)
+        if sqlite_fts and changed:
+            await session.execute(
+                text("DELETE FROM url_index_fts WHERE rowid = :rid"), [{"rid": u} for u in changed]
+            )
+            await session.execute(
+                text(_FTS_INSERT + " WHERE i.url_id IN :ids").bindparams(ids), {"ids": changed}
+            )
+        elif bind.dialect.name == "postgresql" and changed:
+            await session.execute(
+                text(_PG_SET_DOCUMENT + " AND i.url_id IN :ids").bindparams(ids), {"ids": changed}
+            )
+
+        await session.execute(
+            update(t_state).where(t_state.c.source == _RUNS_SOURCE).values(last_id=runs[-1].commit_seq)
+        )
+        await session.commit()
+        consumed += len(rows)
+        if len(runs) < batch_size:
+            return consumed
+
+
+async def refresh_loop(
+    settings: LocalIndexSettings,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    """Run `refresh_search_index` now and then every `refresh_interval_seconds` until cancelled."""
+    while True:
+        try:
+            async with session_factory() as session:
+                consumed = await refresh_search_index(session, batch_size=settings.batch_size)
+            if consumed:
+                logger.info("local index refresh: %d raw rows", consumed)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("local index refresh failed")
+        await asyncio.sleep(settings.refresh_interval_seconds)
+
+
+async def search_index(session: AsyncSession, schema: ProviderNeutralQuery, limit: int = 50) -> list[str]:
+    """Return indexed URLs matching the schema keywords, best match first.
+
+    `boolean` decides whether keywords must all match (AND) or any (OR); each keyword
+    is matched as a phrase. `filters.sites` restricts results by host.
+    """
+    phrases = _keyword_tokens(schema)
+    if not phrases:
+        return []
+    sites = list(schema.filters.sites)
+    # Over-fetch when post-filtering by host
+    fetch = limit * 5 if sites else limit
+    dialect = session.get_bind().dialect.name
+    joiner = " OR " if schema.boolean == "OR" else " AND "
+
+    if dialect == "sqlite" and await _has_fts5(session):
+        match = joiner.join('"' + " ".join(p) + '"' for p in phrases)
+        res = await session.execute(
+            text(
+                "SELECT u.url FROM url_index_fts f JOIN url_index i ON i.url_id = f.rowid "
+                "JOIN urls u ON u.id = i.url_id "
+                "WHERE url_index_fts MATCH :q ORDER BY bm25(url_index_fts), i.seen_count DESC "
+                "LIMIT :n"
+            ),
+            {"q": match, "n": fetch},
+        )
+    elif dialect == "postgresql":
+        tsq = (" | " if schema.boolean == "OR" else " & ").join(
+            "(" + " <-> ".join(p) + ")" for p in phrases
+        )
+        res = await session.execute(
+            text(
+                "SELECT u.url FROM url_index i JOIN urls u ON u.id = i.url_id "
+                "WHERE i.document @@ to_tsquery('simple', :q) "
+                "ORDER BY ts_rank(i.document, to_tsquery('simple', :q)) DESC, i.seen_count DESC "
+                "LIMIT :n"
+            ),
+            {"q": tsq, "n": fetch},
+        )
+    else:
+        doc = func.lower(
+            func.coalesce(t_index.c.title, "") + " " + func.coalesce(t_index.c.snippet, "") + " " + t_urls.c.url
+        )
+        conds = [doc.like("%" + " ".join(p) + "%") for p in phrases]
+        where = or_(*conds) if schema.boolean == "OR" else and_(*conds)
+        res = await session.execute(
+            select(t_urls.c.url)
+            .join(t_index, t_index.c.url_id == t_urls.c.id)
+            .where(where)
+            .order_by(t_index.c.seen_count.desc())
+            .limit(fetch)
+        )
+
+    urls = [r[0] for r in res]
+    if sites:
+        urls = [u for u in urls if _host_matches(u, sites)]
+    return urls[:limit]
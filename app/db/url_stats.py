@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import Insert, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.hashing import url_key
+from app.core.providers import providers_from_mask
+from app.models import url_stats as t_stats, urls as t_urls
+
+__all__ = ["get_url_stats", "rebase_url_stats", "upsert_url_stats"]
+
+# Rows per statement (6 bound parameters each)
+_CHUNK = 500
+
+
+def _upsert(dialect: str) -> Insert | None:
+    if dialect == "postgresql":
+        stmt, earlier, later = postgresql.insert(t_stats), func.least, func.greatest
+    elif dialect == "sqlite":
+        # Two-argument min()/max() are scalar functions in SQLite
+        stmt, earlier, later = sqlite.insert(t_stats), func.min, func.max
+    else:
+        return None
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["url_id"],
+        set_={
+            "first_seen": earlier(t_stats.c.first_seen, ex.first_seen),
+            "last_seen": later(t_stats.c.last_seen, ex.last_seen),
+            "run_count": t_stats.c.run_count + 1,
+            "provider_mask": t_stats.c.provider_mask.op("|")(ex.provider_mask),
+            "last_run_id": ex.last_run_id,
+        },
+    )
+
+
+async def upsert_url_stats(
+    session: AsyncSession,
+    run_id: int,
+    rows: Iterable[tuple[int, int]],
+    *,
+    seen_at: datetime | None = None,
+) -> None:
+    """Fold one run's (url_id, provider_mask) pairs into `url_stats`; caller commits.
+
+    Each url_id must appear once per run (processed rows are already deduped).
+    Rows are written in url_id order, so concurrent runs lock shared rows in the
+    same order instead of deadlocking.
+    """
+    seen_at = seen_at or datetime.now(UTC).replace(tzinfo=None)
+    values = [
+        {
+            "url_id": url_id,
+            "first_seen": seen_at,
+            "last_seen": seen_at,
+            "run_count": 1,
+            "provider_mask": mask,
+            "last_run_id": run_id,
+        }
+        for url_id, mask in sorted(rows)
+    ]
+    if not values:
+        return
+    stmt = _upsert(session.get_bind().dialect.name)
+    for i in range(0, len(values), _CHUNK):
+        chunk = values[i : i + _CHUNK]
+        if stmt is not None:
+            await session.execute(stmt, chunk)
+            continue
+        # Generic backends: update what exists, insert the rest
+        ids = [v["url_id"] for v in chunk]
+        found = {
+            r.url_id: r
+            for r in await session.execute(select(t_stats).where(t_stats.c.url_id.in_(ids)))
+        }
+        for v in chunk:
+            cur = found.get(v["url_id"])
+            if cur is None:
+                await session.execute(insert(t_stats), v)
+                continue
+            await session.execute(
+                update(t_stats)
+                .where(t_stats.c.url_id == v["url_id"])
+                .values(
+                    first_seen=min(cur.first_seen, seen_at),
+                    last_seen=max(cur.last_seen, seen_at),
+                    run_count=cur.run_count + 1,
+                    provider_mask=cur.provider_mask | v["provider_mask"],
+                    last_run_id=run_id,
+                )
+            )
+
+
+async def rebase_url_stats(
+    session: AsyncSession,
+    run_id: int,
+    seen_at: datetime,
+    old: Mapping[int, int],
+    new: Mapping[int, int],
+) -> None:
+    """Move a rebuilt run's share from `old` to `new` {url_id: provider_mask}; caller commits.
+
+    URLs the run now returns are folded in at `seen_at` (the run's timestamp),
+    and the run no longer counts towards URLs it dropped. Run counts stay exact.
+    A dropped URL keeps its first/last seen and provider bits, because other runs
+    share those aggregates and they cannot be taken back.
+    """
+    await upsert_url_stats(
+        session, run_id, ((u, m) for u, m in new.items() if u not in old), seen_at=seen_at
+    )
+    for url_id, mask in sorted(new.items()):
+        if url_id in old and mask & ~old[url_id]:
+            await session.execute(
+                update(t_stats)
+                .where(t_stats.c.url_id == url_id)
+                .values(provider_mask=t_stats.c.provider_mask.op("|")(mask))
+            )
+    dropped = sorted(u for u in old if u not in new)
+    for i in range(0, len(dropped), _CHUNK):
+        in_chunk = t_stats.c.url_id.in_(dropped[i : i + _CHUNK])
+        count = t_stats.c.run_count
+        await session.execute(update(t_stats).where(in_chunk).values(run_count=count - 1))
+        await session.execute(delete(t_stats).where(in_chunk, t_stats.c.run_count <= 0))
+
+
+async def get_url_stats(
+    session: AsyncSession, *, url: str | None = None, url_hash: bytes | None = None
+) -> dict[str, Any] | None:
+    """Stats for one URL, looked up by text or by `urls.url_hash` (hashing.url_key)."""
+    if url_hash is None:
+        if url is None:
+            raise ValueError("url or url_hash is required")
+        url_hash = url_key(url)
+    row = (
+        await session.execute(
+            select(t_urls.c.url, t_urls.c.url_hash, t_stats)
+            .join(t_stats, t_stats.c.url_id == t_urls.c.id)
+            .where(t_urls.c.url_hash == url_hash)
+        )
+    ).first()
+    if row is None:
+        return None
+    return {
+        "url": row.url,
+        "url_hash": bytes(row.url_hash).hex(),
+        "first_seen": row.first_seen,
+        "last_seen": row.last_seen,
+        "run_count": row.run_count,
+        "providers": providers_from_mask(row.provider_mask),
+        "last_run_id": row.last_run_id,
+    }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+
+from sqlalchemy import Insert, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.hashing import DEDUPE_BYTES, URL_KEY_STRATEGY, url_key
+from app.models import urls as t_urls
+
+__all__ = ["ids_by_dedupe_hash", "upsert_urls"]
+
+# Keys per statement; stays under SQLite's bound-parameter limit
+_CHUNK = 500
+# url_hash bytes after a dedupe_hash prefix
+_TAIL = URL_KEY_STRATEGY.digest_size - DEDUPE_BYTES
+
+
+def _insert_ignore(dialect: str) -> Insert | None:
+    if dialect == "postgresql":
+        return postgresql.insert(t_urls).on_conflict_do_nothing(index_elements=["url_hash"])
+    if dialect == "sqlite":
+        return sqlite.insert(t_urls).on_conflict_do_nothing(index_elements=["url_hash"])
+    return None
+
+
+async def _lookup(session: AsyncSession, keys: list[bytes]) -> dict[bytes, int]:
+    res = await session.execute(select(t_urls.c.id, t_urls.c.url_hash).where(t_urls.c.url_hash.in_(keys)))
+    return {bytes(h): i for i, h in res}
+
+
+async def upsert_urls(
+    session: AsyncSession, urls: Iterable[str], *, keys: Mapping[str, bytes] | None = None
+) -> dict[str, int]:
+    """Ensure every URL has a `urls` row; returns {url: id}.
+
+    `keys` holds url_keys the caller already computed (e.g. MergedResult.url_key);
+    other URLs are hashed here.
+
+    Per chunk: one lookup, then an insert of only the missing keys that returns
+    their ids (RETURNING on Postgres and SQLite >= 3.35). Known URLs, the common
+    case for repeat queries, cost no write at all. Runs in the caller's transaction.
+    Keys are written in sorted order, so concurrent runs inserting the same new
+    URLs wait on each other's unique-index entries in one order and cannot deadlock.
+    """
+    known = keys or {}
+    by_key: dict[bytes, str] = {}
+    for u in urls:
+        k = known.get(u)
+        by_key.setdefault(k if k is not None else url_key(u), u)
+    if not by_key:
+        return {}
+    dialect = session.get_bind().dialect
+    stmt = _insert_ignore(dialect.name)
+    keys = sorted(by_key)
+    ids: dict[str, int] = {}
+    for i in range(0, len(keys), _CHUNK):
+        chunk = keys[i : i + _CHUNK]
+        found = await _lookup(session, chunk)
+        missing = [{"url_hash": k, "url": by_key[k]} for k in chunk if k not in found]
+        if missing:
+            if stmt is not None and dialect.insert_executemany_returning:
+                res = await session.execute(stmt.returning(t_urls.c.id, t_urls.c.url_hash), missing)
+                found.update((bytes(r.url_hash), r.id) for r in res)
+            else:
+                await session.execute(stmt if stmt is not None else insert(t_urls), missing)
+            # Keys another transaction inserted first (skipped by the ignore) or no RETURNING
+            if len(found) < len(chunk):
+                found.update(await _lookup(session, [k for k in chunk if k not in found]))
+        ids.update({by_key[k]: v for k, v in found.items()})
+    return ids
+
+
+async def ids_by_dedupe_hash(session: AsyncSession, hashes: Iterable[bytes]) -> dict[bytes, int]:
+    """{dedupe_hash: urls.id} for the URLs whose url_hash starts with each hash.
+
+    dedupe_hash is a url_key prefix (hashing.dedupe_key), so each is a range probe
+    of the url_hash index. Hashes with no URL are left out.
+    """
+    keys = list(dict.fromkeys(hashes))
+    out: dict[bytes, int] = {}
+    for i in range(0, len(keys), _CHUNK):
+        chunk = keys[i : i + _CHUNK]
+        col = t_urls.c.url_hash
+        ranges = [col.between(h + b"\x00" * _TAIL, h + b"\xff" * _TAIL) for h in chunk]
+        res = await session.execute(select(t_urls.c.id, t_urls.c.url_hash).where(or_(*ranges)))
+        for url_id, h in res:
+            out.setdefault(bytes(h)[:DEDUPE_BYTES], url_id)
+    return out
@@ -82,6 +82,9 @@ class RetryPolicy:
     retry_on_status: tuple[int, ...] = field(
         default_factory=lambda: tuple([429] + list(range(500, 600)))
     )
+    # Honour a server-sent Retry-After up to this many seconds; 0 ignores it. Opt-in:
+    # keep it well below the caller's request budget (searches answer within ~3 s)
+    max_retry_after_s: float = 0.0
 
 
 def build_async_client(
@@ -89,15 +92,29 @@ def build_async_client(
     timeout_s: float = 4.0,
     headers: dict[str, str] | None = None,
     telemetry: Iterable[TelemetryHook] | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
 ) -> httpx.AsyncClient:
     merged_headers = _default_headers()
     if headers:
         merged_headers.update(headers)
     return httpx.AsyncClient(
-        timeout=timeout_s, headers=merged_headers, event_hooks=_event_hooks(telemetry)
+        timeout=timeout_s,
+        headers=merged_headers,
+        event_hooks=_event_hooks(telemetry),
+        transport=transport,
     )
 
 
+def _retry_after_s(response: httpx.Response, cap: float) -> float | None:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return min(max(float(value), 0.0), cap)
+    except ValueError:
+        return None  # HTTP-date form is not used by our providers
+
+
 async def request_with_retries(  # noqa: PLR0913 - takes many parameters by design
     client: httpx.AsyncClient,
     method: str,
@@ -134,6 +151,11 @@ async def request_with_retries(  # noqa: PLR0913 - takes many parameters by desi
                 delay = policy.backoff_base_s * (2 ** (attempt - 1)) + random.uniform(
                     0, policy.jitter_s
                 )
+                retry_after = (
+                    _retry_after_s(response, policy.max_retry_after_s) if policy.max_retry_after_s > 0 else None
+                )
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
                 await asyncio.sleep(delay)
                 continue
             return response
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass, field
+from types import TracebackType
+
+from app.config import ProviderRateLimit, SearchSettings
+
+
+@dataclass
+class RateLimiter:
+    """Async limiter bounding in-flight requests and pacing request starts.
+
+    `max_concurrency` caps simultaneous requests; `requests_per_second` (when > 0)
+    spaces request starts evenly so bursts of sub-queries stay under provider quotas.
+    """
+
+    max_concurrency: int = 4
+    requests_per_second: float = 0.0
+    _sem: asyncio.Semaphore = field(init=False, repr=False)
+    _lock: asyncio.Lock = field(init=False, repr=False)
+    _next_start: float = field(init=False, default=0.0, repr=False)
+
+    def __post_init__(self) -> None:
+        self._sem = asyncio.Semaphore(max(1, self.max_concurrency))
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> RateLimiter:
+        await self._sem.acquire()
+        try:
+            if self.requests_per_second > 0:
+                async with self._lock:
+                    now = time.monotonic()
+                    start = max(now, self._next_start)
+                    self._next_start = start + 1.0 / self.requests_per_second
+                if start > now:
+                    await asyncio.sleep(start - now)
+        except BaseException:
+            # Cancelled while pacing: __aexit__ won't run, so give the slot back here
+            self._sem.release()
+            raise
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self._sem.release()
+
+
+# asyncio primitives bind to the loop they first wait on, so limiters are kept per loop.
+_limiters: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, RateLimiter]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_provider_limiter(provider: str, settings: SearchSettings) -> RateLimiter:
+    """Return the shared limiter for `provider` on the running event loop."""
+    loop = asyncio.get_running_loop()
+    per_loop = _limiters.setdefault(loop, {})
+    limiter = per_loop.get(provider)
+    if limiter is None:
+        cfg = settings.rate_limits.get(provider) or ProviderRateLimit()  # type: ignore[call-overload]
+        limiter = RateLimiter(
+            max_concurrency=cfg.max_concurrency, requests_per_second=cfg.requests_per_second
+        )
+        per_loop[provider] = limiter
+    return limiter
+
+
+def reset_limiters() -> None:
+    """Drop all cached limiters (used by tests and config reloads)."""
+    _limiters.clear()
@@ -1,21 +1,59 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+from datetime import UTC, datetime
 from typing import Any, AsyncIterator
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Header, HTTPException, Depends
+from fastapi import FastAPI, Header, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from app.config import load_runtime_config
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.schema import ProviderNeutralQuery
-from app.core.orchestrator import orchestrate, AllProvidersFailed
-from app.db.session import get_session_factory
+from app.core.schema import Locale, ProviderNeutralQuery
+from app.core.canonical import get_canonicalizer
+from app.core.encoding import (
+    PROCESSED_FIELDS,
+    RUN_FIELDS,
+    Representation,
+    dumps,
+    negotiate,
+    parse_fields,
+)
+from app.core.feed import FeedNotifier, sse_feed
+from app.core.export import EXPORT_FORMATS, ExportFormatUnavailable, check_export_format, encode_export
+from app.core.orchestrator import cap_max_results, orchestrate, AllProvidersFailed
+from app.core.reprocess import reprocess_run
+from app.core.run_cache import RunCache, etag_matches
+from app.core.snapshot import encode_run_body, processed_item, run_payload
+from app.db.session import get_engine, get_session_factory
 from app.db import queries as repo
+from app.db.diff import iter_run_diff, missing_runs
+from app.db.export import EXPORT_COLUMNS, iter_export_batches
+from app.db.feed import listen_feed, read_feed
+from app.db.novelty import get_novel_results
+from app.db.url_stats import get_url_stats as get_stats
 from app.llm.client import LLMClient, LLMServiceError, LLMValidationError
 from app.observability.logging import configure_logging
 from app.observability.health import db_ping, http_probe
+from app.observability.timing import StageTimer
+
+
+def _simulator_client() -> Any:
+    """Shared provider simulator client when SH_PROVIDER_SIMULATOR_URL is set, else None.
+
+    The simulator (a FastAPI app of its own) is imported only then, never in production.
+    """
+    import os
+
+    if not os.getenv("SH_PROVIDER_SIMULATOR_URL"):
+        return None
+    from app.simulator.transport import simulator_client_from_env
+
+    return simulator_client_from_env()
 
 
 def build_adapters() -> dict[str, Any]:
@@ -24,8 +62,19 @@ def build_adapters() -> dict[str, Any]:
     from app.adapters.serper import SerperAdapter
     from app.adapters.google import GoogleCSEAdapter
     from app.adapters.brave import BraveAdapter
+    from app.adapters.local_index import LocalIndexAdapter
 
     adapters: dict[str, Any] = {}
+    sim = _simulator_client()
+    if sim is not None:
+        # Offline load/chaos testing: every external provider hits the simulator
+        adapters["serper"] = SerperAdapter(api_key=os.getenv("SH_SERPER_KEY", "sim"), client=sim)
+        adapters["google"] = GoogleCSEAdapter(
+            api_key=os.getenv("SH_GOOGLE_API_KEY", "sim"), cse_id=os.getenv("SH_GOOGLE_CSE_ID", "sim"), client=sim
+        )
+        adapters["brave"] = BraveAdapter(api_key=os.getenv("SH_BRAVE_KEY", "sim"), client=sim)
+        adapters["local"] = LocalIndexAdapter()
+        return adapters
     if (k := os.getenv("SH_SERPER_KEY")):
         adapters["serper"] = SerperAdapter(api_key=k)
     gk = os.getenv("SH_GOOGLE_API_KEY")
@@ -34,6 +83,8 @@ def build_adapters() -> dict[str, Any]:
         adapters["google"] = GoogleCSEAdapter(api_key=gk, cse_id=gcx)
     if (bk := os.getenv("SH_BRAVE_KEY")):
         adapters["brave"] = BraveAdapter(api_key=bk)
+    # Keyless; only called when "local" is listed in search.cascade_order
+    adapters["local"] = LocalIndexAdapter()
     return adapters
 
 
@@ -41,6 +92,8 @@ class SearchOptions(BaseModel):
     lang: str | None = None
     geo: str | None = None
     maxResults: int | None = Field(default=None, ge=1, le=100)
+    # Fan the same rewritten query out across several lang/geo pairs in one run
+    locales: list[Locale] | None = Field(default=None, min_length=1, max_length=10)
 
 
 class SearchRunRequest(BaseModel):
@@ -52,15 +105,53 @@ class ProcessedOut(BaseModel):
     url: str
     providers: list[str]
     confidence: int
+    # Reciprocal rank fusion score; results come best first
+    score: float | None = None
+    # First 8 bytes of the canonical URL's key, hex; unique within a run
+    dedupe_hash: str | None = None
+    # SHA-1 hex of the URL, the dedupe_hash format before binary digests
+    legacy_dedupe_hash: str | None = None
+    # Not returned by any earlier run of the same (normalized) query
+    novel: bool = False
 
 
 class SearchRunResponse(BaseModel):
     id: int
     providers_used: list[str]
+    # First query sent to each provider
     per_provider_query_used: dict[str, str]
+    # Every distinct query sent per provider (site shards, locales), in send order
+    per_provider_queries_used: dict[str, list[str]]
     processed: list[ProcessedOut]
 
 
+class RunSummaryOut(BaseModel):
+    id: int
+    query: str
+    rewritten_template: str
+    run_timestamp: datetime
+    providers_used: list[str]
+
+
+class FeedResponse(BaseModel):
+    items: list[dict[str, Any]]
+    # Feed sequence (`seq`) of the last item; pass back as ?after=
+    next_cursor: int
+
+
+class RunListResponse(BaseModel):
+    items: list[RunSummaryOut]
+    # Pass back as ?cursor= for the next (older) page; null on the last page
+    next_cursor: str | None
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    # run_timestamp is stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     app.state.runtime_config = load_runtime_config()
@@ -68,15 +159,52 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # Load API bearer token from env for security
     import os
     app.state.api_bearer_token = os.getenv("SH_API_BEARER_TOKEN")
+    app.state.run_cache = RunCache(app.state.runtime_config.settings.run_cache.max_entries)
+    app.state.feed_notifier = FeedNotifier()
+
+    def forget(run_ids: list[int]) -> None:
+        for rid in run_ids:
+            app.state.run_cache.discard(rid)
+
+    feed_task = None
+    if get_engine().dialect.name == "postgresql":
+        # Other workers' new runs wake feed waiters; runs rewritten elsewhere
+        # or purged (e.g. `app.cli reprocess`, `app.cli retention`) leave the cache
+        feed_task = asyncio.create_task(
+            listen_feed(get_engine(), app.state.feed_notifier.notify, on_runs_changed=forget)
+        )
+    retention_task = None
+    retention = app.state.runtime_config.settings.retention
+    if retention.run_in_process:
+        from app.db.retention import retention_loop
+
+        retention_task = asyncio.create_task(
+            retention_loop(retention, get_session_factory(), on_purged=forget)
+        )
+    index_task = None
+    local_index = app.state.runtime_config.settings.local_index
+    if local_index.enabled:
+        from app.db.search_index import refresh_loop
+
+        index_task = asyncio.create_task(refresh_loop(local_index, get_session_factory()))
     try:
         yield
     finally:
         # Place shutdown hooks here when added (DB close, etc.)
-        pass
+        for task in (index_task, retention_task, feed_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Source Harvester", version="0.1.0", lifespan=lifespan)
+    app = FastAPI(
+        title="Source Harvester",
+        version="0.1.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
 
     @app.get("/healthz")
     async def healthz() -> dict[str, Any]:
@@ -112,18 +240,27 @@ def create_app() -> FastAPI:
         _check_bearer(authorization)
 
     @app.post("/search-runs", status_code=201, response_model=SearchRunResponse)
-    async def create_search_run(payload: SearchRunRequest, _: None = Depends(require_bearer)) -> SearchRunResponse:
+    async def create_search_run(
+        payload: SearchRunRequest,
+        request: Request,
+        fields: str | None = Query(None, description="comma-separated processed keys to return"),
+        _: None = Depends(require_bearer),
+    ) -> Response:
         rc = app.state.runtime_config
+        rep = _representation(request, fields, PROCESSED_FIELDS)
+        timer = StageTimer()
         # Prepare DB session
         Session = get_session_factory()
         async with Session() as session:  # type: AsyncSession
             # Ensure schema exists (tests/dev). In production, rely on Alembic.
-            await repo.init_models(session)
+            with timer.stage("schema"):
+                await repo.init_models(session)
             # Enforce raw query length limit
             if len(payload.query) > 512:
                 raise HTTPException(status_code=400, detail="query length exceeds 512 characters")
             # Cache lookup
-            cached = await repo.get_cached_rewritten_template(session, payload.query)
+            with timer.stage("cache"):
+                cached = await repo.get_cached_rewritten_template(session, payload.query)
             if cached:
                 data = __import__("json").loads(cached)
                 schema = ProviderNeutralQuery.model_validate(data)
@@ -131,65 +268,312 @@ def create_app() -> FastAPI:
             else:
                 # Call LLM
                 try:
-                    llm = LLMClient.from_runtime_config()
-                    schema, template = await llm.rewrite_query(payload.query)
+                    with timer.stage("llm"):
+                        llm = LLMClient.from_runtime_config(http=_simulator_client())
+                        schema, template = await llm.rewrite_query(payload.query)
                 except LLMValidationError as e:
                     raise HTTPException(status_code=400, detail=str(e))
                 except LLMServiceError as e:
                     raise HTTPException(status_code=502, detail=str(e))
                 # Insert cache
-                await repo.insert_query_cache(session, payload.query, template)
+                with timer.stage("cache"):
+                    await repo.insert_query_cache(session, payload.query, template)
 
             # Orchestrate providers
             adapters = build_adapters()
+            options = payload.options or SearchOptions()
             try:
                 out = await orchestrate(
                     original_query=payload.query,
                     rewritten_template=template,
-                    schema=schema,
+                    schema=cap_max_results(schema, options.maxResults),
                     config=rc.settings,
                     adapters=adapters,
                     session=session,
                     run_config={"options": payload.options.model_dump() if payload.options else {}},
+                    locales=options.locales,
+                    timer=timer,
                 )
             except AllProvidersFailed as e:
                 raise HTTPException(status_code=502, detail=str(e))
 
-            return SearchRunResponse(
-                id=out.run_id,
-                providers_used=out.providers_used,
-                per_provider_query_used=out.per_provider_query_used,
-                processed=[
-                    ProcessedOut(url=p.url, providers=p.providers, confidence=p.confidence)
-                    for p in out.processed
-                ],
+            # Write-through: only a reprocess rewrites the run, and it replaces the entry
+            app.state.run_cache.put(out.run_id, out.snapshot)
+            app.state.feed_notifier.notify()
+
+            # Encoded straight from the merge records; SearchRunResponse documents the shape
+            with timer.stage("encode"):
+                body, encoding = rep.render(
+                    {
+                        "id": out.run_id,
+                        "providers_used": out.providers_used,
+                        "per_provider_query_used": out.per_provider_query_used,
+                        "per_provider_queries_used": out.per_provider_queries_used,
+                        "processed": [{**processed_item(p), "novel": p.novel} for p in out.processed],
+                    },
+                    rc.settings.responses,
+                )
+            # Per-stage breakdown for load tests and browser devtools
+            return Response(
+                content=body,
+                status_code=201,
+                media_type=rep.media_type,
+                headers={**_variant_headers(encoding), "Server-Timing": timer.server_timing()},
             )
 
-    @app.get("/search-runs/{run_id}")
-    async def get_search_run(run_id: int, authorization: str | None = Header(None)) -> Any:
-        Session = get_session_factory()
+    def _representation(request: Request, fields: str | None, allowed: tuple[str, ...]) -> Representation:
+        try:
+            projected = parse_fields(fields, allowed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return negotiate(request.headers.get("accept"), request.headers.get("accept-encoding"), projected)
+
+    def _variant_headers(encoding: str | None) -> dict[str, str]:
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return headers
+
+    def _check_read_bearer(authorization: str | None) -> None:
         # In prod, enforce bearer for GET as well
         import os as _os
         env_val = app.state.runtime_config.settings.environment
         if env_val == "prod" or _os.getenv("SH_ENVIRONMENT") == "prod":
             _check_bearer(authorization)
+
+    @app.get("/search-runs", response_model=RunListResponse)
+    async def list_search_runs(
+        query: str | None = None,
+        from_: datetime | None = Query(None, alias="from"),
+        to: datetime | None = None,
+        limit: int = Query(50, ge=1, le=500),
+        cursor: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> RunListResponse:
+        _check_read_bearer(authorization)
+        after = None
+        if cursor:
+            try:
+                after = repo.decode_run_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="invalid cursor")
+        filters = {"query": query, "from": _naive_utc(from_), "to": _naive_utc(to)}
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+            # One extra row tells us whether another page exists
+            rows = [r async for r in repo.iter_runs(session, filters, after=after, limit=limit + 1)]
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = repo.encode_run_cursor(page[-1]["run_timestamp"], page[-1]["id"])
+        return RunListResponse(
+            items=[RunSummaryOut.model_validate(r) for r in page], next_cursor=next_cursor
+        )
+
+    @app.get("/search-runs/{run_id}")
+    async def get_search_run(
+        run_id: int,
+        request: Request,
+        fields: str | None = Query(None, description="comma-separated processed keys to return"),
+        authorization: str | None = Header(None),
+        if_none_match: str | None = Header(None),
+    ) -> Response:
+        _check_read_bearer(authorization)
+        rep = _representation(request, fields, RUN_FIELDS)
+        cache: RunCache = app.state.run_cache
+        cached = cache.get(run_id)
+        if cached is None:
+            Session = get_session_factory()
+            async with Session() as session:
+                # Ensure schema exists for dev/test
+                await repo.init_models(session)
+                body = await repo.get_run_snapshot(session, run_id)
+                if body is None:
+                    # Missing, or persisted before snapshots existed: rebuild from rows
+                    data = await repo.get_run(session, run_id)
+                    if not data:
+                        raise HTTPException(status_code=404, detail="run not found")
+                    body = encode_run_body(run_payload(data["run"], data["processed"]))
+            cached = cache.put(run_id, body)
+        # Plain JSON is the stored body as-is; other variants are memoized on the entry
+        body, encoding = rep.render(cached.body, app.state.runtime_config.settings.responses, cached.variants)
+        headers = {**_variant_headers(encoding), "ETag": rep.etag(cached.etag, encoding)}
+        if etag_matches(if_none_match, headers["ETag"]):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=rep.media_type, headers=headers)
+
+    @app.post("/search-runs/{run_id}/reprocess")
+    async def reprocess_search_run(
+        run_id: int,
+        request: Request,
+        fields: str | None = Query(None, description="comma-separated processed keys to return"),
+        _: None = Depends(require_bearer),
+    ) -> Response:
+        """Rebuild processed results from stored raw rows with the current merge logic."""
+        rep = _representation(request, fields, RUN_FIELDS)
+        Session = get_session_factory()
         async with Session() as session:
-            # Ensure schema exists for dev/test
             await repo.init_models(session)
-            data = await repo.get_run(session, run_id)
-            if not data:
+            if await missing_runs(session, run_id):
                 raise HTTPException(status_code=404, detail="run not found")
-            run = data["run"]
-            return {
-                "id": run["id"],
-                "query": run["query"],
-                "rewritten_template": run["rewritten_template"],
-                "providers_used": run["providers_used"],
-                "processed": [
-                    {"url": r["url"], "providers": r["providers"], "confidence": r["confidence"]}
-                    for r in data["processed"]
-                ],
-            }
+            body = await reprocess_run(session, run_id, app.state.runtime_config.settings.search)
+        if body is None:
+            raise HTTPException(status_code=409, detail="no raw results left to reprocess")
+        cached = app.state.run_cache.put(run_id, body)
+        app.state.feed_notifier.notify()
+        body, encoding = rep.render(cached.body, app.state.runtime_config.settings.responses, cached.variants)
+        headers = {**_variant_headers(encoding), "ETag": rep.etag(cached.etag, encoding)}
+        return Response(content=body, media_type=rep.media_type, headers=headers)
+
+    @app.get("/search-runs/{run_id}/new")
+    async def get_search_run_new(run_id: int, authorization: str | None = Header(None)) -> dict[str, Any]:
+        _check_read_bearer(authorization)
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+            rows = await get_novel_results(session, run_id)
+        if rows is None:
+            raise HTTPException(status_code=404, detail="run not found")
+        return {
+            "id": run_id,
+            "processed": [
+                {
+                    "url": r["url"],
+                    "providers": r["providers"],
+                    "confidence": r["confidence"],
+                    "dedupe_hash": r["dedupe_hash"].hex(),
+                }
+                for r in rows
+            ],
+        }
+
+    @app.get("/search-runs/{run_id}/diff/{other_id}")
+    async def diff_search_runs(
+        run_id: int, other_id: int, authorization: str | None = Header(None)
+    ) -> StreamingResponse:
+        _check_read_bearer(authorization)
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+            missing = await missing_runs(session, run_id, other_id)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"run {missing[0]} not found")
+
+        async def body() -> AsyncIterator[bytes]:
+            # {"a", "b", "added": [...], "removed": [...], "changed": [...]}, a batch per chunk
+            yield f'{{"a":{run_id},"b":{other_id}'.encode()
+            kinds = iter(("added", "removed", "changed"))
+            current = None
+            async with Session() as session:
+                async for kind, rows in iter_run_diff(session, run_id, other_id):
+                    out = "," if kind == current else ""
+                    while kind != current:
+                        out += "]" if current else ""
+                        current = next(kinds)
+                        out += f',"{current}":['
+                    yield out.encode() + b",".join(dumps(r) for r in rows)
+            tail = "]" if current else ""
+            yield (tail + "".join(f',"{k}":[]' for k in kinds) + "}").encode()
+
+        return StreamingResponse(body(), media_type="application/json")
+
+    @app.get("/exports/processed")
+    async def export_processed(
+        format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+        from_: datetime | None = Query(None, alias="from"),
+        to: datetime | None = None,
+        run_from: int | None = Query(None, ge=1),
+        run_to: int | None = Query(None, ge=1),
+        authorization: str | None = Header(None),
+    ) -> StreamingResponse:
+        _check_read_bearer(authorization)
+        try:
+            check_export_format(format)
+        except ExportFormatUnavailable as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+
+        async def body() -> AsyncIterator[bytes]:
+            async with Session() as session:
+                batches = iter_export_batches(
+                    session, from_=_naive_utc(from_), to=_naive_utc(to), run_min=run_from, run_max=run_to
+                )
+                async for chunk in encode_export(format, batches, EXPORT_COLUMNS):
+                    yield chunk
+
+        media_type, ext = EXPORT_FORMATS[format]
+        return StreamingResponse(
+            body(),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="processed.{ext}"'},
+        )
+
+    @app.get("/feed", response_model=FeedResponse)
+    async def feed(
+        request: Request,
+        after: int = Query(0, ge=0, description="last feed sequence (item `seq`) already seen"),
+        limit: int = Query(100, ge=1, le=1000),
+        wait: float = Query(0, ge=0, le=60, description="long-poll seconds when nothing is new"),
+        authorization: str | None = Header(None),
+        last_event_id: int | None = Header(None),
+    ) -> Any:
+        """Processed rows of runs in commit order; `Accept: text/event-stream` switches to SSE."""
+        _check_read_bearer(authorization)
+        notifier: FeedNotifier = app.state.feed_notifier
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+
+        async def read(cursor: int) -> list[dict[str, Any]]:
+            async with Session() as session:
+                return await read_feed(session, cursor, limit)
+
+        if "text/event-stream" in request.headers.get("accept", ""):
+            start = last_event_id if last_event_id is not None else after
+            return StreamingResponse(
+                sse_feed(read, notifier, start),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        deadline = asyncio.get_running_loop().time() + wait
+        while True:
+            armed = notifier.arm()
+            items = await read(after)
+            remaining = deadline - asyncio.get_running_loop().time()
+            if items or remaining <= 0 or not await notifier.wait(remaining, armed):
+                break
+        return FeedResponse(items=items, next_cursor=items[-1]["seq"] if items else after)
+
+    @app.get("/urls/stats")
+    async def get_url_stats(
+        url: str | None = None,
+        hash: str | None = Query(None, description="hex urls.url_hash (16-byte BLAKE2b)"),
+        authorization: str | None = Header(None),
+    ) -> dict[str, Any]:
+        _check_read_bearer(authorization)
+        if (url is None) == (hash is None):
+            raise HTTPException(status_code=400, detail="pass exactly one of url or hash")
+        key = None
+        if hash is not None:
+            try:
+                key = bytes.fromhex(hash)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="hash must be hex")
+        else:
+            # Stats are kept per canonical URL, the same form processed rows use
+            canonical = app.state.runtime_config.settings.search.canonicalization
+            url = get_canonicalizer(canonical).canonicalize(url)  # type: ignore[arg-type]
+        Session = get_session_factory()
+        async with Session() as session:
+            await repo.init_models(session)
+            stats = await get_stats(session, url=url, url_hash=key)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="url not seen")
+        return stats
 
     return app
 
@@ -6,8 +6,10 @@ from sqlalchemy import (
     JSON,
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Integer,
+    LargeBinary,
     MetaData,
     String,
     Table,
@@ -36,10 +38,29 @@ search_runs = Table(
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("query", Text, nullable=False),
+    Column("query_hash", LargeBinary(8), nullable=False),  # hashing.query_key
     Column("rewritten_template", Text, nullable=False),
     Column("run_timestamp", DateTime(timezone=False), server_default=func.now(), nullable=False),
     Column("config", JSON, nullable=False),
     Column("providers_used", JSON, nullable=False),  # list[str]
+    # zlib-compressed GET /search-runs/{id} body, written with the run (app/core/snapshot.py)
+    Column("snapshot", LargeBinary, nullable=True),
+    # Commit order of the run's write (queries.next_commit_seq); null until committed by the orchestrator
+    Column("commit_seq", Integer, nullable=True),
+    # Keyset listing, newest first (see queries.iter_runs)
+    Index("ix_runs_timestamp_id", "run_timestamp", "id"),
+    Index("ix_runs_query_hash_timestamp_id", "query_hash", "run_timestamp", "id"),
+    Index("ix_runs_commit_seq", "commit_seq"),
+)
+
+
+# One row per distinct URL; result rows reference it by id (see app/db/urls.py)
+urls = Table(
+    "urls",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("url_hash", LargeBinary(16), nullable=False, unique=True),  # hashing.url_key
+    Column("url", Text, nullable=False),
 )
 
 
@@ -49,11 +70,77 @@ search_results_raw = Table(
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("run_id", Integer, ForeignKey("search_runs.id", ondelete="CASCADE"), nullable=False),
     Column("provider", String(50), nullable=False),
-    Column("url", Text, nullable=False),
+    Column("url_id", Integer, ForeignKey("urls.id"), nullable=False),
     Column("rank", Integer, nullable=True),
     Column("meta", JSON, nullable=True),
     Column("inserted_at", DateTime(timezone=False), server_default=func.now(), nullable=False),
     Index("ix_raw_run_provider", "run_id", "provider"),
+    Index("ix_raw_url_id", "url_id"),
+)
+
+
+# Per-URL aggregate over processed rows, upserted in each run's transaction (app/db/url_stats.py)
+url_stats = Table(
+    "url_stats",
+    metadata,
+    Column("url_id", Integer, ForeignKey("urls.id"), primary_key=True),
+    Column("first_seen", DateTime(timezone=False), nullable=False),
+    Column("last_seen", DateTime(timezone=False), nullable=False),
+    Column("run_count", Integer, nullable=False),
+    Column("provider_mask", Integer, nullable=False),  # app.core.providers.PROVIDER_BITS
+    Column("last_run_id", Integer, nullable=True),  # NULL once that run is purged
+    Index("ix_url_stats_last_run_id", "last_run_id"),
+)
+
+
+# First run (per normalized query) in which each URL was returned (app/db/novelty.py)
+query_urls = Table(
+    "query_urls",
+    metadata,
+    Column("query_hash", LargeBinary(8), primary_key=True),  # novelty.novelty_key
+    Column("url_id", Integer, ForeignKey("urls.id"), primary_key=True),
+    # NULL once that run is purged; the row still marks the URL as seen for the query
+    Column("first_run_id", Integer, nullable=True),
+    Index("ix_query_urls_first_run_id", "first_run_id"),
+)
+
+
+# Compacted raw rows of old runs: zlib JSON list, one blob per run (see app/db/retention.py).
+# On Postgres, migration 0007 range-partitions search_results_raw by month on inserted_at.
+search_raw_archive = Table(
+    "search_raw_archive",
+    metadata,
+    Column("run_id", Integer, ForeignKey("search_runs.id", ondelete="CASCADE"), primary_key=True),
+    Column("row_count", Integer, nullable=False),
+    Column("payload", LargeBinary, nullable=False),
+    Column("archived_at", DateTime(timezone=False), server_default=func.now(), nullable=False),
+)
+
+
+# Full provider response bodies, stored once per distinct body (app/db/payloads.py)
+provider_payloads = Table(
+    "provider_payloads",
+    metadata,
+    Column("hash", LargeBinary(32), primary_key=True),  # BLAKE2b-256 of the uncompressed body
+    Column("codec", String(8), nullable=False),  # "zstd" | "zlib"
+    Column("size", Integer, nullable=False),  # uncompressed bytes
+    Column("body", LargeBinary, nullable=False),
+    Column("created_at", DateTime(timezone=False), server_default=func.now(), nullable=False),
+)
+
+
+# Which payload answered each provider call of a run; replay keys on (provider, query_used, lang, geo)
+run_payloads = Table(
+    "run_payloads",
+    metadata,
+    Column("run_id", Integer, ForeignKey("search_runs.id", ondelete="CASCADE"), primary_key=True),
+    Column("seq", Integer, primary_key=True),
+    Column("provider", String(50), nullable=False),
+    Column("query_used", Text, nullable=False),
+    Column("lang", String(16), nullable=True),
+    Column("geo", String(16), nullable=True),
+    Column("payload_hash", LargeBinary(32), ForeignKey("provider_payloads.hash"), nullable=False),
+    Index("ix_run_payloads_payload_hash", "payload_hash"),
 )
 
 
@@ -62,11 +149,46 @@ search_results_processed = Table(
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("run_id", Integer, ForeignKey("search_runs.id", ondelete="CASCADE"), nullable=False),
-    Column("url", Text, nullable=False),
+    Column("url_id", Integer, ForeignKey("urls.id"), nullable=False),
     Column("providers", JSON, nullable=False),  # list[str], portable across DBs
     Column("confidence", Integer, nullable=False),
-    Column("dedupe_hash", Text, nullable=False),
+    Column("dedupe_hash", LargeBinary(8), nullable=False),  # hashing.dedupe_key
+    # Reciprocal rank fusion score (app.core.merge); null for rows written before it
+    Column("score", Float, nullable=True),
     Column("inserted_at", DateTime(timezone=False), server_default=func.now(), nullable=False),
     UniqueConstraint("run_id", "dedupe_hash", name="uq_processed_run_dedupe"),
+    Index("ix_processed_url_id", "url_id"),
 )
 
+
+
+# Local full-text index over previously harvested URLs (see app/db/search_index.py);
+# one row per `urls` row, whose text it reads rather than copies
+url_index = Table(
+    "url_index",
+    metadata,
+    Column("url_id", Integer, ForeignKey("urls.id"), primary_key=True, autoincrement=False),
+    Column("title", Text, nullable=True),
+    Column("snippet", Text, nullable=True),
+    Column("seen_count", Integer, nullable=False, server_default="0"),
+    Column("last_run_id", Integer, nullable=True),  # NULL once that run is purged
+    Column("updated_at", DateTime(timezone=False), server_default=func.now(), nullable=False),
+    Index("ix_url_index_last_run_id", "last_run_id"),
+)
+
+
+url_index_state = Table(
+    "url_index_state",
+    metadata,
+    Column("source", String(50), primary_key=True),
+    Column("last_id", Integer, nullable=False),
+)
+
+
+# Counters bumped inside write transactions; the row lock orders them by commit (queries.next_commit_seq)
+commit_sequence = Table(
+    "commit_sequence",
+    metadata,
+    Column("name", String(50), primary_key=True),
+    Column("value", Integer, nullable=False),
+)
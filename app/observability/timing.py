@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from app.observability.metrics import observe
+
+
+@dataclass
+class StageTimer:
+    """Per-request stage durations, exported as metrics and a `Server-Timing` header."""
+
+    metric: str = "search_run.stage_ms"
+    stages: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dur_ms = (time.perf_counter() - t0) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + dur_ms
+            observe(self.metric, dur_ms, {"stage": name})
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def parse_server_timing(value: str) -> dict[str, float]:
+    """Parse `name;dur=1.2, other;dur=3` into {name: ms}; entries without dur are skipped."""
+    out: dict[str, float] = {}
+    for entry in value.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    out[name] = float(val)
+                except ValueError:
+                    pass
+    return out
@@ -0,0 +1,19 @@
+"""Local stand-in for the search providers and the LLM (offline load and chaos testing)."""
+
+from app.simulator.profiles import EndpointProfile, LatencyProfile, SimulatorProfile
+from app.simulator.server import create_simulator_app
+from app.simulator.transport import (
+    RedirectTransport,
+    simulator_client,
+    simulator_client_from_env,
+)
+
+__all__ = [
+    "EndpointProfile",
+    "LatencyProfile",
+    "RedirectTransport",
+    "SimulatorProfile",
+    "create_simulator_app",
+    "simulator_client",
+    "simulator_client_from_env",
+]
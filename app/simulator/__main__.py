@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import argparse
+
+import uvicorn
+
+from app.simulator.profiles import SimulatorProfile
+from app.simulator.server import create_simulator_app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the provider/LLM simulator server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--profile", help="YAML SimulatorProfile (latency, error/429 rates, sizes)")
+    args = parser.parse_args(argv)
+
+    profile = SimulatorProfile.from_yaml(args.profile) if args.profile else SimulatorProfile()
+    uvicorn.run(create_simulator_app(profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    main()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Literal
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class LatencyProfile(BaseModel):
+    """Response delay distribution, in milliseconds."""
+
+    distribution: Literal["fixed", "uniform", "lognormal"] = "fixed"
+    ms: float = Field(default=0.0, ge=0.0)  # fixed value, or median for lognormal
+    min_ms: float = Field(default=0.0, ge=0.0)  # uniform bounds
+    max_ms: float = Field(default=0.0, ge=0.0)
+    sigma: float = Field(default=0.5, ge=0.0)  # lognormal shape; larger = fatter tail
+
+    model_config = ConfigDict(extra="forbid")
+
+    def sample_s(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            ms = rng.uniform(self.min_ms, max(self.min_ms, self.max_ms))
+        elif self.distribution == "lognormal":
+            ms = rng.lognormvariate(0.0, self.sigma) * self.ms if self.ms > 0 else 0.0
+        else:
+            ms = self.ms
+        return ms / 1000.0
+
+
+class EndpointProfile(BaseModel):
+    latency: LatencyProfile = Field(default_factory=LatencyProfile)
+    error_rate: float = Field(default=0.0, ge=0.0, le=1.0)  # share of 500 responses
+    rate_429: float = Field(default=0.0, ge=0.0, le=1.0)  # share of 429 responses
+    retry_after_s: float | None = Field(default=None, ge=0.0)  # Retry-After sent with 429s
+    results: int = Field(default=10, ge=0)  # result-set size before provider caps
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class SimulatorProfile(BaseModel):
+    seed: int | None = None
+    # Distinct URLs results are drawn from; smaller pools mean more cross-provider overlap
+    url_pool: int = Field(default=500, ge=1)
+    serper: EndpointProfile = Field(default_factory=EndpointProfile)
+    google: EndpointProfile = Field(default_factory=EndpointProfile)
+    brave: EndpointProfile = Field(default_factory=EndpointProfile)
+    openai: EndpointProfile = Field(default_factory=EndpointProfile)
+    # Content returned by the chat-completions stub
+    llm_schema: dict = Field(
+        default_factory=lambda: {"keywords": ["simulated"], "filters": {"max_results": 10}}
+    )
+
+    model_config = ConfigDict(extra="forbid")
+
+    @classmethod
+    def from_yaml(cls, path: str | Path) -> SimulatorProfile:
+        with Path(path).open("r", encoding="utf-8") as f:
+            return cls.model_validate(yaml.safe_load(f) or {})
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter, defaultdict
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.simulator.profiles import EndpointProfile, SimulatorProfile
+
+# Providers take overlapping windows of the same per-query permutation
+_WINDOW_OFFSET = {"serper": 0, "google": 2, "brave": 4}
+
+
+def _result_urls(profile: SimulatorProfile, provider: str, query: str, n: int) -> list[str]:
+    seed = int.from_bytes(hashlib.sha1(query.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    offset = _WINDOW_OFFSET.get(provider, 0)
+    picks = rng.sample(range(profile.url_pool), min(profile.url_pool, n + offset))
+    return [f"https://site{i % 97}.example.com/article/{i}" for i in picks[offset : offset + n]]
+
+
+def _items(urls: list[str], query: str) -> list[dict[str, Any]]:
+    return [
+        {"position": pos, "title": f"{query} — result {pos}", "snippet": f"Simulated snippet for {url}"}
+        for pos, url in enumerate(urls, start=1)
+    ]
+
+
+def create_simulator_app(profile: SimulatorProfile | None = None) -> FastAPI:
+    """ASGI app speaking the Serper, Google CSE, Brave and OpenAI chat wire formats.
+
+    Serve it with uvicorn (`python -m app.simulator`) or mount it in-process through
+    `httpx.ASGITransport`. `PUT /_sim/profile` swaps the profile at runtime so a test
+    can start a brownout mid-run; `GET /_sim/stats` reports per-endpoint outcomes.
+    """
+    app = FastAPI(title="Source Harvester provider simulator")
+    app.state.profile = profile or SimulatorProfile()
+    app.state.rng = random.Random(app.state.profile.seed)
+    app.state.stats = defaultdict(Counter)
+
+    async def simulate(endpoint: str) -> JSONResponse | None:
+        prof: SimulatorProfile = app.state.profile
+        ep: EndpointProfile = getattr(prof, endpoint)
+        rng: random.Random = app.state.rng
+        stats: Counter[str] = app.state.stats[endpoint]
+        stats["requests"] += 1
+        delay = ep.latency.sample_s(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < ep.rate_429:
+            stats["429"] += 1
+            headers = {}
+            if ep.retry_after_s is not None:
+                headers["Retry-After"] = f"{ep.retry_after_s:g}"
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers=headers)
+        if roll < ep.rate_429 + ep.error_rate:
+            stats["5xx"] += 1
+            return JSONResponse({"error": "simulated upstream failure"}, status_code=500)
+        stats["2xx"] += 1
+        return None
+
+    def result_count(ep: EndpointProfile, requested: Any, cap: int) -> int:
+        try:
+            n = int(requested)
+        except (TypeError, ValueError):
+            n = cap
+        return max(0, min(n, cap, ep.results))
+
+    @app.post("/search")
+    async def serper(request: Request) -> Any:
+        if (failure := await simulate("serper")) is not None:
+            return failure
+        body = await request.json()
+        q = str(body.get("q", ""))
+        n = result_count(app.state.profile.serper, body.get("num", 10), 100)
+        urls = _result_urls(app.state.profile, "serper", q, n)
+        organic = [{"link": u, **item} for u, item in zip(urls, _items(urls, q))]
+        return {"searchParameters": {"q": q}, "organic": organic}
+
+    @app.get("/customsearch/v1")
+    async def google(request: Request) -> Any:
+        if (failure := await simulate("google")) is not None:
+            return failure
+        q = request.query_params.get("q", "")
+        n = result_count(app.state.profile.google, request.query_params.get("num", 10), 10)
+        urls = _result_urls(app.state.profile, "google", q, n)
+        items = [{"link": u, **item} for u, item in zip(urls, _items(urls, q))]
+        return {"queries": {"request": [{"searchTerms": q}]}, "items": items}
+
+    @app.get("/res/v1/web/search")
+    async def brave(request: Request) -> Any:
+        if (failure := await simulate("brave")) is not None:
+            return failure
+        q = request.query_params.get("q", "")
+        n = result_count(app.state.profile.brave, request.query_params.get("count", 20), 20)
+        urls = _result_urls(app.state.profile, "brave", q, n)
+        results = [
+            {"url": u, "title": item["title"], "description": item["snippet"]}
+            for u, item in zip(urls, _items(urls, q))
+        ]
+        return {"query": {"original": q}, "web": {"results": results}}
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request) -> Any:
+        if (failure := await simulate("openai")) is not None:
+            return failure
+        content = json.dumps(app.state.profile.llm_schema)
+        return {
+            "id": "chatcmpl-sim",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+        }
+
+    @app.get("/_sim/stats")
+    async def stats() -> dict[str, dict[str, int]]:
+        return {k: dict(v) for k, v in app.state.stats.items()}
+
+    @app.put("/_sim/profile")
+    async def set_profile(new_profile: SimulatorProfile) -> dict[str, bool]:
+        app.state.profile = new_profile
+        if new_profile.seed is not None:
+            app.state.rng = random.Random(new_profile.seed)
+        return {"ok": True}
+
+    return app
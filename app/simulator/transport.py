@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+
+import httpx
+
+from app.http.client import build_async_client
+from app.simulator.profiles import SimulatorProfile
+from app.simulator.server import create_simulator_app
+
+SIMULATOR_URL_ENV = "SH_PROVIDER_SIMULATOR_URL"
+SIMULATOR_PROFILE_ENV = "SH_PROVIDER_SIMULATOR_PROFILE"
+INPROCESS = "inprocess"
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """Send every request to `base_url`, keeping path and query (provider hosts are fixed)."""
+
+    def __init__(self, base_url: str, inner: httpx.AsyncBaseTransport | None = None) -> None:
+        self._target = httpx.URL(base_url)
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self._target.scheme, host=self._target.host, port=self._target.port
+        )
+        request.headers["Host"] = self._target.netloc.decode("ascii")
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def simulator_client(
+    profile: SimulatorProfile | None = None, base_url: str | None = None
+) -> httpx.AsyncClient:
+    """HTTP client whose provider/LLM calls hit the simulator instead of the internet.
+
+    With `base_url` requests go to a standalone simulator server; otherwise a fresh
+    simulator app is mounted in-process via ASGITransport.
+    """
+    transport: httpx.AsyncBaseTransport
+    if base_url:
+        transport = RedirectTransport(base_url)
+    else:
+        transport = httpx.ASGITransport(app=create_simulator_app(profile))
+    return build_async_client(transport=transport)
+
+
+_env_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def simulator_client_from_env() -> httpx.AsyncClient | None:
+    """Shared simulator client when SH_PROVIDER_SIMULATOR_URL is set, else None.
+
+    Use a server URL (e.g. http://127.0.0.1:9100) or `inprocess`; the in-process
+    profile is read from SH_PROVIDER_SIMULATOR_PROFILE when given.
+    """
+    target = os.getenv(SIMULATOR_URL_ENV)
+    if not target:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _env_clients.get(loop)
+    if client is None or client.is_closed:
+        if target == INPROCESS:
+            path = os.getenv(SIMULATOR_PROFILE_ENV)
+            client = simulator_client(SimulatorProfile.from_yaml(path) if path else None)
+        else:
+            client = simulator_client(base_url=target)
+        _env_clients[loop] = client
+    return client
@@ -0,0 +1 @@
+"""Load, micro and database benchmarks (run from the repo root with `python -m benchmarks.<name>`)."""
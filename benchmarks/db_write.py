@@ -0,0 +1,186 @@
+"""Write-throughput benchmark for the repository layer on SQLite and Postgres.
+
+Each writer repeatedly persists one search run the way the orchestrator does:
+`insert_search_run` + `bulk_insert_raw` + `bulk_insert_processed` in a single
+transaction. Run sizes and the number of concurrent writers are swept.
+
+    python -m benchmarks.db_write --sizes 10 100 1000 --concurrency 1 4 16 --out bench/db_write.json
+    python -m benchmarks.db_write --pg-url postgresql+asyncpg://u:p@localhost/scratch
+    python -m benchmarks.db_write --pg-container      # testcontainers, needs Docker
+
+Reported per (backend, size, concurrency): rows/s, commit latency and lock wait.
+Lock wait is the time spent in the transaction's first write: that is where SQLite
+blocks on the database write lock (busy timeout) while another writer commits; on
+Postgres it stays near the uncontended insert cost unless something holds row locks.
+Use a scratch database with --pg-url; benchmark rows are not cleaned up.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from benchmarks._stats import environment, summarize_ms, write_json
+
+
+@dataclass
+class WriterStats:
+    runs: int = 0
+    rows: int = 0
+    errors: int = 0
+    run_ms: list[float] = field(default_factory=list)
+    commit_ms: list[float] = field(default_factory=list)
+    lock_wait_ms: list[float] = field(default_factory=list)
+
+
+def _rows(size: int, salt: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    from app.core.hashing import dedupe_key
+
+    urls = [f"https://bench.example.com/{salt}/{i}" for i in range(size)]
+    raw = [
+        {"provider": "serper", "url": u, "rank": i, "meta": {"queryUsed": "bench", "title": f"t{i}"}}
+        for i, u in enumerate(urls, start=1)
+    ]
+    processed = [
+        {"url": u, "providers": ["serper"], "confidence": 1, "dedupe_hash": dedupe_key(u)} for u in urls
+    ]
+    return raw, processed
+
+
+async def _writer(factory: Any, size: int, runs: int, tag: str, stats: WriterStats) -> None:
+    from app.db.queries import bulk_insert_processed, bulk_insert_raw, insert_search_run
+
+    raw, processed = _rows(size, tag)
+    async with factory() as session:
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            try:
+                run_id = await insert_search_run(
+                    session, "bench", "{}", {"bench": True}, ["serper"], commit=False
+                )
+                t_locked = time.perf_counter()
+                await bulk_insert_raw(session, run_id, raw, commit=False)
+                await bulk_insert_processed(session, run_id, processed, commit=False)
+                t_commit = time.perf_counter()
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                stats.errors += 1
+                continue
+            t1 = time.perf_counter()
+            stats.runs += 1
+            stats.rows += 1 + len(raw) + len(processed)
+            stats.lock_wait_ms.append((t_locked - t0) * 1000)
+            stats.commit_ms.append((t1 - t_commit) * 1000)
+            stats.run_ms.append((t1 - t0) * 1000)
+
+
+async def bench_backend(
+    url: str, *, sizes: list[int], concurrency: list[int], runs: int
+) -> list[dict[str, Any]]:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.db.queries import init_models
+
+    engine = create_async_engine(url, pool_size=max(concurrency), max_overflow=0)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
+    async with factory() as session:
+        await init_models(session)
+
+    out: list[dict[str, Any]] = []
+    try:
+        for size in sizes:
+            for conc in concurrency:
+                stats = WriterStats()
+                t0 = time.perf_counter()
+                await asyncio.gather(
+                    *(_writer(factory, size, runs, f"{size}-{conc}-{w}", stats) for w in range(conc))
+                )
+                wall = time.perf_counter() - t0
+                out.append(
+                    {
+                        "backend": engine.dialect.name,
+                        "rows_per_run": size,
+                        "concurrency": conc,
+                        "runs": stats.runs,
+                        "errors": stats.errors,
+                        "rows": stats.rows,
+                        "rows_per_s": round(stats.rows / wall, 1) if wall > 0 else 0.0,
+                        "run_ms": summarize_ms(stats.run_ms),
+                        "commit_ms": summarize_ms(stats.commit_ms),
+                        "lock_wait_ms": summarize_ms(stats.lock_wait_ms),
+                    }
+                )
+    finally:
+        await engine.dispose()
+    return out
+
+
+@contextlib.contextmanager
+def postgres_container() -> Iterator[str | None]:
+    """Async URL of a throwaway Postgres (testcontainers), or None when Docker is unavailable."""
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except ImportError:
+        yield None
+        return
+    if shutil.which("docker") is None:
+        yield None
+        return
+    with PostgresContainer("postgres:16-alpine") as pg:
+        yield pg.get_connection_url().replace("postgresql://", "postgresql+asyncpg://").replace(
+            "postgresql+psycopg2://", "postgresql+asyncpg://"
+        )
+
+
+async def run_all(
+    *,
+    sizes: list[int],
+    concurrency: list[int],
+    runs: int,
+    pg_url: str | None = None,
+    sqlite_path: Path | None = None,
+) -> dict[str, Any]:
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = sqlite_path or Path(tmp) / "db_write.sqlite3"
+        results += await bench_backend(
+            f"sqlite+aiosqlite:///{path}", sizes=sizes, concurrency=concurrency, runs=runs
+        )
+    if pg_url:
+        results += await bench_backend(pg_url, sizes=sizes, concurrency=concurrency, runs=runs)
+    return {"benchmark": "db_write", "environment": environment(), "results": results}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="rows per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="writers")
+    parser.add_argument("--runs", type=int, default=20, help="runs per writer")
+    parser.add_argument("--pg-url", default=os.getenv("SH_BENCH_PG_URL"), help="scratch Postgres URL")
+    parser.add_argument("--pg-container", action="store_true", help="start Postgres via testcontainers")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with postgres_container() if args.pg_container else contextlib.nullcontext(args.pg_url) as pg:
+        if args.pg_container and pg is None:
+            print("testcontainers/Docker unavailable; running SQLite only", file=sys.stderr)
+        report = asyncio.run(
+            run_all(sizes=args.sizes, concurrency=args.concurrency, runs=args.runs, pg_url=pg)
+        )
+    write_json(report, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
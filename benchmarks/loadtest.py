@@ -0,0 +1,262 @@
+"""Open-loop load test for POST /search-runs with SLO reporting.
+
+Drives the API against the provider/LLM simulator (no network) and reports latency
+percentiles, throughput, error rate and per-stage breakdowns (from the
+`Server-Timing` header) as JSON, for cold-cache and warm-cache scenarios.
+
+    python -m benchmarks.loadtest --rate 20 --duration 15 --out bench/load.json
+    python -m benchmarks.loadtest --spawn-gunicorn --rate 50      # real workers
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000     # existing deployment
+
+Arrivals follow a Poisson process and every request is timed from its scheduled
+start, so a slow server cannot throttle the offered load (no coordinated omission).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks._stats import environment, summarize_ms, write_json
+
+# Spec targets for POST /search-runs (specs/SH_Microservice_Spec.md, acceptance)
+SLO_P95_MS = {"cold": 3000.0, "warm": 1500.0}
+
+
+@dataclass
+class Sample:
+    ok: bool
+    status: int
+    latency_ms: float
+    stages: dict[str, float] = field(default_factory=dict)
+
+
+async def run_open_loop(
+    send: Callable[[int], Awaitable[Sample]],
+    *,
+    rate: float,
+    duration_s: float,
+    rng: random.Random,
+) -> tuple[list[Sample], float]:
+    """Fire `send(i)` at Poisson arrival times; returns samples and wall time."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    offset = 0.0
+    tasks: list[asyncio.Task[Sample]] = []
+    i = 0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset > duration_s:
+            break
+        delay = start + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        scheduled = start + offset
+
+        async def timed(i: int = i, scheduled: float = scheduled) -> Sample:
+            sample = await send(i)
+            sample.latency_ms = (loop.time() - scheduled) * 1000
+            return sample
+
+        tasks.append(asyncio.create_task(timed()))
+        i += 1
+    samples = list(await asyncio.gather(*tasks))
+    return samples, loop.time() - start
+
+
+def build_report(scenario: str, samples: list[Sample], wall_s: float, rate: float) -> dict[str, Any]:
+    ok = [s for s in samples if s.ok]
+    stages: dict[str, list[float]] = defaultdict(list)
+    for s in ok:
+        for name, ms in s.stages.items():
+            stages[name].append(ms)
+    errors: dict[str, int] = defaultdict(int)
+    for s in samples:
+        if not s.ok:
+            errors[str(s.status)] += 1
+    latency = summarize_ms([s.latency_ms for s in ok])
+    target = SLO_P95_MS.get(scenario)
+    return {
+        "scenario": scenario,
+        "offered_rps": rate,
+        "requests": len(samples),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "errors_by_status": dict(errors),
+        "throughput_rps": round(len(ok) / wall_s, 3) if wall_s > 0 else 0.0,
+        "latency_ms": latency,
+        "stages_ms": {name: summarize_ms(vals) for name, vals in sorted(stages.items())},
+        "slo": {
+            "p95_target_ms": target,
+            "p95_ms": latency["p95"],
+            "pass": bool(target is None or (ok and latency["p95"] < target)),
+        },
+    }
+
+
+def _sender(client: httpx.AsyncClient, queries: Callable[[int], str]) -> Callable[[int], Awaitable[Sample]]:
+    from app.observability.timing import parse_server_timing
+
+    async def send(i: int) -> Sample:
+        try:
+            resp = await client.post("/search-runs", json={"query": queries(i)})
+        except httpx.HTTPError:
+            return Sample(ok=False, status=0, latency_ms=0.0)
+        stages = parse_server_timing(resp.headers.get("Server-Timing", ""))
+        return Sample(ok=resp.status_code == 201, status=resp.status_code, latency_ms=0.0, stages=stages)
+
+    return send
+
+
+async def run_scenarios(
+    client: httpx.AsyncClient,
+    *,
+    scenarios: list[str],
+    rate: float,
+    duration_s: float,
+    warm_queries: int = 5,
+    seed: int = 7,
+) -> dict[str, Any]:
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+    results: list[dict[str, Any]] = []
+    # One serial request first so schema creation is not raced by the first burst
+    await client.post("/search-runs", json={"query": f"warmup {tag}"})
+    for scenario in scenarios:
+        if scenario == "cold":
+            # every query is new: LLM rewrite + cache insert on each request
+            queries: Callable[[int], str] = lambda i: f"cold {tag} query {i}"  # noqa: E731
+        elif scenario == "warm":
+            pool = [f"warm {tag} query {k}" for k in range(warm_queries)]
+            for q in pool:  # prime the rewrite cache outside the measured window
+                await client.post("/search-runs", json={"query": q})
+            queries = lambda i: pool[i % len(pool)]  # noqa: E731
+        else:
+            raise ValueError(f"unknown scenario: {scenario}")
+        samples, wall = await run_open_loop(
+            _sender(client, queries), rate=rate, duration_s=duration_s, rng=rng
+        )
+        results.append(build_report(scenario, samples, wall, rate))
+    return {
+        "benchmark": "loadtest.search_runs",
+        "environment": environment(),
+        "scenarios": results,
+        "slo_pass": all(r["slo"]["pass"] for r in results),
+    }
+
+
+def _simulator_env(profile: str | None, db_url: str) -> dict[str, str]:
+    env = {"SH_PROVIDER_SIMULATOR_URL": "inprocess", "SH_DATABASE_URL": db_url}
+    if profile:
+        env["SH_PROVIDER_SIMULATOR_PROFILE"] = str(Path(profile).resolve())
+    return env
+
+
+@asynccontextmanager
+async def inprocess_client(profile: str | None, db_url: str) -> AsyncIterator[httpx.AsyncClient]:
+    """The ASGI app in this process, with simulator providers and a scratch database."""
+    from asgi_lifespan import LifespanManager
+
+    os.environ.update(_simulator_env(profile, db_url))
+    import app.db.session as sess
+
+    sess._engine = None
+    sess._session_factory = None
+    from app.main import create_app
+
+    app = create_app()
+    async with LifespanManager(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as c:
+            yield c
+
+
+@asynccontextmanager
+async def gunicorn_client(profile: str | None, db_url: str, port: int, workers: int) -> AsyncIterator[httpx.AsyncClient]:
+    """Spawn `gunicorn -c gunicorn_conf.py app.main:app` wired to the in-process simulator."""
+    env = {
+        **os.environ,
+        **_simulator_env(profile, db_url),
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_LOGLEVEL": "warning",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "app.main:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=30) as c:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await c.get("/healthz")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("gunicorn did not become healthy")
+                await asyncio.sleep(0.2)
+            yield c
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or f"sqlite+aiosqlite:///{Path(tmp) / 'loadtest.sqlite3'}"
+        if args.url:
+            ctx = httpx.AsyncClient(base_url=args.url, timeout=30)
+        elif args.spawn_gunicorn:
+            ctx = gunicorn_client(args.profile, db_url, args.port, args.workers)
+        else:
+            ctx = inprocess_client(args.profile, db_url)
+        async with ctx as client:
+            report = await run_scenarios(
+                client, scenarios=args.scenario, rate=args.rate, duration_s=args.duration, seed=args.seed
+            )
+    report["target"] = args.url or ("gunicorn" if args.spawn_gunicorn else "asgi-inprocess")
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10.0, help="offered load, requests/second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--scenario", nargs="+", default=["cold", "warm"], choices=["cold", "warm"])
+    parser.add_argument("--profile", default="configs/simulator.yaml", help="simulator profile YAML")
+    parser.add_argument("--db-url", help="database URL (default: scratch SQLite file)")
+    parser.add_argument("--url", help="load an already running deployment instead")
+    parser.add_argument("--spawn-gunicorn", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--fail-on-slo", action="store_true", help="exit 1 if any p95 SLO is missed")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    write_json(report, args.out)
+    return 1 if args.fail_on_slo and not report["slo_pass"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
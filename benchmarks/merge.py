@@ -0,0 +1,167 @@
+"""Merge-to-response pipeline: the previous per-URL objects vs. the compact merge records.
+
+    python -m benchmarks.merge --sizes 1000 10000 100000 --out bench/merge.json
+
+Both pipelines take three providers' ranked URL lists (50% pairwise overlap, as in
+`benchmarks.micro`) through merge, processed-row tuples, the stored snapshot body
+and the POST /search-runs items. `legacy` is the earlier shape: a provider dict and
+a sorted list per URL, a dataclass, `asdict` for the snapshot and a pydantic model
+per response row. `compact` is `app.core.merge.RankMerger`: one slotted record per
+URL with an integer provider mask, reused by every consumer.
+
+Reported per (size, pipeline): median/min time, tracemalloc peak and the memory
+blocks still allocated while the outputs are held (retained objects).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from benchmarks._stats import environment, write_json
+
+_RUN = {"id": 1, "query": "bench", "rewritten_template": "{}", "providers_used": ["serper", "google", "brave"]}
+
+
+def _lists(n: int) -> dict[str, list[str]]:
+    urls = [f"https://site{i % 97}.example.com/article/{i}" for i in range(2 * n)]
+    return {"serper": urls[:n], "google": urls[n // 2 : n // 2 + n], "brave": urls[n : 2 * n]}
+
+
+@dataclass
+class _LegacyResult:
+    url: str
+    providers: list[str]
+    confidence: int
+    dedupe_hash: bytes
+    score: float = 0.0
+    novel: bool = False
+
+
+def legacy(per_provider: dict[str, list[str]], limit: int | None, rrf_k: int = 60) -> Any:
+    from app.core.hashing import dedupe_key, url_hash
+    from app.core.snapshot import run_payload
+    from app.main import ProcessedOut
+
+    ranks_by_url: dict[str, dict[str, int]] = {}
+    for name, urls in per_provider.items():
+        for rank, url in enumerate(urls, start=1):
+            ranks = ranks_by_url.setdefault(url, {})
+            ranks[name] = min(ranks.get(name, rank), rank)
+    processed = []
+    for url, ranks in ranks_by_url.items():
+        prov_list = sorted(ranks)
+        processed.append(
+            _LegacyResult(
+                url=url,
+                providers=prov_list,
+                confidence=len(prov_list),
+                dedupe_hash=dedupe_key(url),
+                score=sum(1.0 / (rrf_k + r) for r in ranks.values()),
+            )
+        )
+    processed.sort(key=lambda pr: (-pr.score, -pr.confidence))
+    processed = processed if limit is None else processed[:limit]
+    records = [(i, pr.providers, pr.confidence, pr.dedupe_hash, pr.score) for i, pr in enumerate(processed)]
+    snapshot = run_payload(_RUN, (asdict(pr) for pr in processed))
+    response = [
+        ProcessedOut(
+            url=pr.url,
+            providers=pr.providers,
+            confidence=pr.confidence,
+            score=pr.score,
+            dedupe_hash=pr.dedupe_hash.hex(),
+            legacy_dedupe_hash=url_hash(pr.url),
+            novel=pr.novel,
+        ).model_dump()
+        for pr in processed
+    ]
+    return processed, records, snapshot, response
+
+
+def compact(per_provider: dict[str, list[str]], limit: int | None, rrf_k: int = 60) -> Any:
+    from app.core.merge import RankMerger
+    from app.core.snapshot import processed_item, run_payload
+
+    merger = RankMerger(rrf_k=rrf_k)
+    for name, urls in per_provider.items():
+        merger.add_ranked(name, urls)
+    processed = merger.results(limit)
+    records = [(i, pr.providers, pr.confidence, pr.dedupe_hash, pr.score) for i, pr in enumerate(processed)]
+    snapshot = run_payload(_RUN, processed)
+    response = [{**processed_item(pr), "novel": pr.novel} for pr in processed]
+    return processed, records, snapshot, response
+
+
+PIPELINES: dict[str, Callable[[dict[str, list[str]], int | None], Any]] = {"legacy": legacy, "compact": compact}
+
+
+def measure(fn: Callable[[], Any], *, repeat: int) -> dict[str, float]:
+    fn()  # warm imports and caches
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    gc.disable()
+    try:
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        out = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        retained = sys.getallocatedblocks() - blocks
+        del out
+    finally:
+        gc.enable()
+    return {
+        "median_ms": round(statistics.median(times) * 1e3, 3),
+        "min_ms": round(min(times) * 1e3, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_blocks": retained,
+    }
+
+
+def run_all(*, sizes: list[int], limit: int | None, repeat: int) -> dict[str, Any]:
+    results: list[dict[str, Any]] = []
+    for n in sizes:
+        per_provider = _lists(n)
+        by_name = {
+            name: measure(lambda fn=fn: fn(per_provider, limit), repeat=repeat) for name, fn in PIPELINES.items()
+        }
+        for name, stats in by_name.items():
+            results.append({"size": n, "pipeline": name, **stats})
+        old, new = by_name["legacy"], by_name["compact"]
+        results.append(
+            {
+                "size": n,
+                "pipeline": "compact/legacy",
+                "time_ratio": round(new["median_ms"] / old["median_ms"], 3) if old["median_ms"] else 1.0,
+                "peak_ratio": round(new["peak_kib"] / old["peak_kib"], 3) if old["peak_kib"] else 1.0,
+            }
+        )
+    return {"benchmark": "merge", "environment": environment(), "limit": limit, "results": results}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="URLs per provider")
+    parser.add_argument("--limit", type=int, default=None, help="max_results cut (default: keep all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+    write_json(run_all(sizes=args.sizes, limit=args.limit, repeat=args.repeat), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,482 @@
+"""Micro-benchmarks for the request hot paths, with baseline comparison.
+
+    python -m benchmarks.micro run --out bench/micro.json
+    python -m benchmarks.micro compare benchmarks/baselines/micro.json bench/micro.json --threshold 0.25
+    python -m benchmarks.micro check benchmarks/baselines/micro.json --out bench/micro.json
+
+Timings run with the garbage collector off (as `timeit` does) and are compared on
+the per-repeat minimum, the least noisy estimate of a benchmark's cost. A benchmark
+regresses when its minimum is slower than the baseline's by more than `--threshold`
+plus its measured noise (median/min spread, capped at the threshold); a benchmark
+missing from the current report fails too. `check` runs the suite and re-runs
+regressed benchmarks up to `--trials` times, so a one-off stall does not fail it.
+
+The baseline is recorded once per runner class and not refreshed along with code
+changes: re-record `benchmarks/baselines/micro.json` only in a commit of its own
+whose message gives the measured delta and why it is accepted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from benchmarks._stats import environment, write_json
+
+MERGE_SIZES = (10, 100, 1_000, 10_000)
+BULK_SIZES = (100, 1_000)
+
+
+@dataclass
+class Benchmark:
+    name: str
+    fn: Callable[[], Any] | Callable[[], Awaitable[Any]]
+
+
+async def measure(fn: Callable[[], Any], *, repeat: int, min_time_s: float) -> dict[str, float]:
+    """Median/min seconds per call; loop count is calibrated so one repeat lasts `min_time_s`."""
+    is_async = inspect.iscoroutinefunction(fn)
+
+    async def timed(loops: int) -> float:
+        # Collection pauses land on whichever repeat crosses a threshold; keep them out
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            if is_async:
+                for _ in range(loops):
+                    await fn()
+            else:
+                for _ in range(loops):
+                    fn()
+            return time.perf_counter() - t0
+        finally:
+            gc.enable()
+
+    loops = 1
+    while await timed(loops) < min_time_s and loops < 1_000_000:
+        loops *= 2
+    per_call = [await timed(loops) / loops for _ in range(repeat)]
+    return {
+        "loops": loops,
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+    }
+
+
+def _urls(n: int, offset: int = 0) -> list[str]:
+    return [f"https://site{i % 97}.example.com/article/{i}?ref=feed" for i in range(offset, offset + n)]
+
+
+def core_benchmarks() -> list[Benchmark]:
+    from datetime import date
+
+    from app.adapters.base import build_query_from_schema
+    from app.core.canonical import Canonicalizer
+    from app.core.hashing import DEDUPE_BYTES, HASH_STRATEGIES, url_hash, url_key
+    from app.core.merge import RankMerger
+    from app.core.placeholders import expand_date_placeholder
+    from app.core.schema import ProviderNeutralQuery
+
+    out: list[Benchmark] = []
+
+    for n in MERGE_SIZES:
+        # three providers with 50% pairwise overlap, as in the orchestrator's dedupe loop
+        per_provider = {
+            "serper": _urls(n),
+            "google": _urls(n, n // 2),
+            "brave": _urls(n, n),
+        }
+
+        def merge(per_provider: dict[str, list[str]] = per_provider) -> Any:
+            merger = RankMerger()
+            for name, urls in per_provider.items():
+                merger.add_ranked(name, urls)
+            return merger.results(50)
+
+        out.append(Benchmark(f"merge_results[{n}]", merge))
+
+    urls = _urls(1_000)
+    out.append(Benchmark("url_hash[x1000]", lambda: [url_hash(u) for u in urls]))
+    for strategy in HASH_STRATEGIES.values():
+        out.append(
+            Benchmark(f"hash.{strategy.name}[x1000]", lambda s=strategy: [s.digest(u) for u in urls])
+        )
+    # Per merged URL: urls.url_hash plus the dedupe hash, as two digests vs. one and a slice
+    b8 = HASH_STRATEGIES["blake2b-8"]
+    out.append(Benchmark("keys.separate[x1000]", lambda: [(url_key(u), b8.digest(u)) for u in urls]))
+    out.append(
+        Benchmark("keys.shared[x1000]", lambda: [(k, k[:DEDUPE_BYTES]) for k in map(url_key, urls)])
+    )
+
+    # cold: a fresh LRU per call; warm: repeated URLs served from the cache
+    messy = [f"http://www.site{i % 97}.example.com/article/{i}/?utm_source=x&id={i}#c" for i in range(1_000)]
+    cold = Canonicalizer()
+
+    def canonicalize_cold() -> Any:
+        cold.canonicalize.cache_clear()  # type: ignore[attr-defined]
+        return cold.canonicalize_many(messy)
+
+    out.append(Benchmark("canonicalize_many[x1000,cold]", canonicalize_cold))
+    warm = Canonicalizer()
+    warm.canonicalize_many(messy)
+    out.append(Benchmark("canonicalize_many[x1000,warm]", lambda: warm.canonicalize_many(messy)))
+
+    payload = {
+        "keywords": ["european union", "ai act", "enforcement"],
+        "boolean": "AND",
+        "filters": {
+            "sites": ["reuters.com", "ft.com", "politico.eu", "euractiv.com"],
+            "date_after": "{{days_ago:7}}",
+            "date_before": "{{today}}",
+            "lang": "en",
+            "geo": "BE",
+            "max_results": 20,
+        },
+    }
+    out.append(Benchmark("schema.model_validate", lambda: ProviderNeutralQuery.model_validate(payload)))
+    schema = ProviderNeutralQuery.model_validate(payload)
+    out.append(Benchmark("build_query_from_schema", lambda: build_query_from_schema(schema)))
+    out.append(
+        Benchmark(
+            "build_query_from_schema[or_sites]",
+            lambda: build_query_from_schema(schema, {"site_join": "OR"}),
+        )
+    )
+
+    out.extend(serialization_benchmarks())
+
+    today = date(2025, 1, 15)
+    tokens = ["{{today}}", "{{yesterday}}", "{{days_ago:30}}", "2025-01-01"]
+    out.append(
+        Benchmark(
+            "expand_date_placeholder[x4]",
+            lambda: [expand_date_placeholder(t, today=today) for t in tokens],
+        )
+    )
+    return out
+
+
+def serialization_benchmarks() -> list[Benchmark]:
+    """Encoding one 1,000-result run body: the earlier stdlib/pydantic paths vs. the current ones."""
+    import gzip
+    import importlib.util
+
+    from app.config import ResponseSettings
+    from app.core.encoding import Representation, dumps
+    from app.main import SearchRunResponse
+
+    body = {
+        "id": 1,
+        "providers_used": ["serper", "google"],
+        "per_provider_query_used": {"serper": "q", "google": "q"},
+        "per_provider_queries_used": {"serper": ["q"], "google": ["q"]},
+        "processed": [
+            {"url": u, "providers": ["google", "serper"], "confidence": 2, "score": 2 / (61 + i), "novel": True}
+            for i, u in enumerate(_urls(1_000))
+        ],
+    }
+    encoded = dumps(body)
+    settings = ResponseSettings()
+    out = [
+        Benchmark(
+            "serialize.pydantic[x1000]",
+            lambda: SearchRunResponse.model_validate(body).model_dump_json().encode(),
+        ),
+        Benchmark(
+            "serialize.json_stdlib[x1000]",
+            lambda: json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        ),
+        Benchmark("serialize.orjson[x1000]", lambda: dumps(body)),
+        Benchmark(
+            "serialize.fields_url[x1000]",
+            lambda: Representation(fields=("url",)).render(encoded, settings),
+        ),
+        Benchmark(
+            "compress.gzip[x1000]",
+            lambda: gzip.compress(encoded, compresslevel=settings.gzip_level, mtime=0),
+        ),
+    ]
+    # Optional extras: measured only where installed
+    if importlib.util.find_spec("msgpack") is not None:
+        import msgpack
+
+        out.append(Benchmark("serialize.msgpack[x1000]", lambda: msgpack.packb(body, use_bin_type=True)))
+    if importlib.util.find_spec("brotli") is not None:
+        import brotli
+
+        out.append(
+            Benchmark(
+                "compress.brotli[x1000]",
+                lambda: brotli.compress(encoded, quality=settings.brotli_quality),
+            )
+        )
+    return out
+
+
+def adapter_benchmarks() -> list[Benchmark]:
+    from app.adapters.brave import BraveAdapter
+    from app.adapters.google import GoogleCSEAdapter
+    from app.adapters.serper import SerperAdapter
+
+    def items(n: int, link_key: str, snippet_key: str) -> list[dict[str, Any]]:
+        return [
+            {link_key: u, "title": f"Result {i}", snippet_key: f"Snippet text for result {i} " * 4}
+            for i, u in enumerate(_urls(n))
+        ]
+
+    # Decode + parse from bytes, which is what the adapter does per response
+    bodies = {
+        "serper": (SerperAdapter(api_key="k"), json.dumps({"organic": items(20, "link", "snippet")})),
+        "google": (
+            GoogleCSEAdapter(api_key="k", cse_id="cx"),
+            json.dumps({"items": items(10, "link", "snippet")}),
+        ),
+        "brave": (
+            BraveAdapter(api_key="k"),
+            json.dumps({"web": {"results": items(20, "url", "description")}}),
+        ),
+    }
+    return [
+        Benchmark(
+            f"adapter_parse.{name}",
+            lambda adapter=adapter, body=body: adapter.parse(json.loads(body), "q"),
+        )
+        for name, (adapter, body) in bodies.items()
+    ]
+
+
+async def db_benchmarks(db_path: Path) -> tuple[list[Benchmark], Callable[[], Awaitable[None]]]:
+    """bulk_insert_* and run reads against a scratch SQLite file; returns benchmarks and a cleanup hook."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.core.hashing import dedupe_key
+    from app.core.snapshot import encode_run_body, pack_snapshot, run_payload
+    from app.db.queries import (
+        bulk_insert_processed,
+        bulk_insert_raw,
+        get_run,
+        get_run_snapshot,
+        init_models,
+        insert_search_run,
+        set_run_snapshot,
+    )
+    from app.db.novelty import mark_novel, novelty_key
+    from app.db.urls import upsert_urls
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session = async_sessionmaker(bind=engine, expire_on_commit=False)()
+    await init_models(session)
+
+    async def new_run() -> int:
+        # processed rows are unique per (run_id, dedupe_hash), so each call gets its own run
+        return await insert_search_run(session, "bench", "{}", {}, ["serper"], commit=False)
+
+    out: list[Benchmark] = []
+    for n in BULK_SIZES:
+        raw = [
+            {"provider": "serper", "url": u, "rank": i, "meta": {"queryUsed": "q", "title": "t"}}
+            for i, u in enumerate(_urls(n), start=1)
+        ]
+        processed = [
+            {"url": u, "providers": ["serper"], "confidence": 1, "dedupe_hash": dedupe_key(u)}
+            for u in _urls(n)
+        ]
+
+        async def insert_raw(rows: list[dict[str, Any]] = raw) -> None:
+            await bulk_insert_raw(session, await new_run(), rows)
+
+        async def insert_processed(rows: list[dict[str, Any]] = processed) -> None:
+            await bulk_insert_processed(session, await new_run(), rows)
+
+        out.append(Benchmark(f"bulk_insert_raw[{n}]", insert_raw))
+        out.append(Benchmark(f"bulk_insert_processed[{n}]", insert_processed))
+
+        # GET /search-runs/{id} cold path: rebuild from rows vs. one snapshot lookup
+        read_id = await new_run()
+        await bulk_insert_processed(session, read_id, processed, commit=False)
+        data = await get_run(session, read_id)
+        assert data is not None
+        body = encode_run_body(run_payload(data["run"], data["processed"]))
+        await set_run_snapshot(session, read_id, pack_snapshot(body))
+        await session.commit()
+
+        async def read_rows(run_id: int = read_id) -> None:
+            data = await get_run(session, run_id)
+            encode_run_body(run_payload(data["run"], data["processed"]))  # type: ignore[index]
+
+        async def read_snapshot(run_id: int = read_id) -> None:
+            await get_run_snapshot(session, run_id)
+
+        out.append(Benchmark(f"get_run.rows[{n}]", read_rows))
+        out.append(Benchmark(f"get_run.snapshot[{n}]", read_snapshot))
+
+        # Novelty probe for a query that has already seen every URL (steady state)
+        url_ids = list((await upsert_urls(session, _urls(n))).values())
+        key = novelty_key(f"bench {n}")
+        await mark_novel(session, key, read_id, url_ids)
+        await session.commit()
+
+        async def novelty_check(key: bytes = key, ids: list[int] = url_ids) -> None:
+            await mark_novel(session, key, 0, ids)
+
+        out.append(Benchmark(f"novelty.check[{n}]", novelty_check))
+
+    async def close() -> None:
+        await session.close()
+        await engine.dispose()
+
+    return out, close
+
+
+async def run_all(
+    *, only: str | None, repeat: int, min_time_s: float, names: set[str] | None = None
+) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db, close = await db_benchmarks(Path(tmp) / "micro.sqlite3")
+        try:
+            for b in core_benchmarks() + adapter_benchmarks() + db:
+                if (only and only not in b.name) or (names is not None and b.name not in names):
+                    continue
+                results[b.name] = await measure(b.fn, repeat=repeat, min_time_s=min_time_s)
+        finally:
+            await close()
+    return {"benchmark": "micro", "environment": environment(), "results": results}
+
+
+def _noise(stats: dict[str, float]) -> float:
+    """Relative median/min spread of one measurement."""
+    return stats["median_us"] / stats["min_us"] - 1 if stats["min_us"] else 0.0
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> tuple[list[dict[str, Any]], bool]:
+    """Per-benchmark ratio current/baseline on the minimum; ok=False on any regression or missing benchmark.
+
+    The allowed slowdown is `threshold` plus the larger noise of the two measurements,
+    the latter capped at `threshold`.
+    """
+    rows: list[dict[str, Any]] = []
+    ok = True
+    base, cur = baseline["results"], current["results"]
+    for name in sorted(set(base) | set(cur)):
+        if name not in cur:
+            ok = False
+            rows.append({"name": name, "status": "MISSING"})
+            continue
+        if name not in base:
+            rows.append({"name": name, "status": "new"})
+            continue
+        b, c = base[name], cur[name]
+        ratio = c["min_us"] / b["min_us"] if b["min_us"] else 1.0
+        allowed = threshold + min(max(_noise(b), _noise(c)), threshold)
+        regressed = ratio > 1 + allowed
+        ok = ok and not regressed
+        rows.append(
+            {
+                "name": name,
+                "baseline_us": b["min_us"],
+                "current_us": c["min_us"],
+                "ratio": round(ratio, 3),
+                "allowed": round(1 + allowed, 3),
+                "status": "REGRESSED" if regressed else ("faster" if ratio < 1 - threshold else "ok"),
+            }
+        )
+    return rows, ok
+
+
+async def check(
+    baseline: dict[str, Any], *, threshold: float, trials: int, repeat: int, min_time_s: float
+) -> tuple[dict[str, Any], list[dict[str, Any]], bool]:
+    """Run the suite against `baseline`, re-running regressed benchmarks up to `trials` times in all.
+
+    Each benchmark keeps its fastest trial, so only slowdowns that reproduce fail.
+    """
+    report = await run_all(only=None, repeat=repeat, min_time_s=min_time_s)
+    rows, ok = compare(baseline, report, threshold)
+    for _ in range(trials - 1):
+        regressed = {r["name"] for r in rows if r["status"] == "REGRESSED"}
+        if not regressed:
+            break
+        rerun = await run_all(only=None, repeat=repeat, min_time_s=min_time_s, names=regressed)
+        for name, stats in rerun["results"].items():
+            if stats["min_us"] < report["results"][name]["min_us"]:
+                report["results"][name] = stats
+        rows, ok = compare(baseline, report, threshold)
+    return report, rows, ok
+
+
+# Row statuses that fail `compare` and `check`
+_FAILING = ("REGRESSED", "MISSING")
+
+
+def _print_rows(rows: list[dict[str, Any]]) -> None:
+    for r in rows:
+        if "ratio" in r:
+            print(f"{r['status']:>9}  {r['ratio']:>6.2f}x / {r['allowed']:>4.2f}x  {r['current_us']:>12.3f}us  {r['name']}")
+        else:
+            print(f"{r['status']:>9}  {'':>15}  {'':>14}  {r['name']}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="run the suite and write a JSON report")
+    run.add_argument("--out", help="report path (default: stdout)")
+    run.add_argument("--filter", dest="only", help="only benchmarks whose name contains this")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--min-time", type=float, default=0.05, help="seconds per repeat")
+    cmp_ = sub.add_parser("compare", help="fail if CURRENT regressed against BASELINE")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown fraction")
+    chk = sub.add_parser("check", help="run the suite and fail if it regressed against BASELINE")
+    chk.add_argument("baseline")
+    chk.add_argument("--out", help="also write the JSON report here")
+    chk.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown fraction")
+    chk.add_argument("--trials", type=int, default=3, help="runs of a regressed benchmark before failing")
+    chk.add_argument("--repeat", type=int, default=5)
+    chk.add_argument("--min-time", type=float, default=0.05, help="seconds per repeat")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "run":
+        report = asyncio.run(run_all(only=args.only, repeat=args.repeat, min_time_s=args.min_time))
+        write_json(report, args.out)
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    if args.cmd == "check":
+        report, rows, ok = asyncio.run(
+            check(
+                baseline,
+                threshold=args.threshold,
+                trials=args.trials,
+                repeat=args.repeat,
+                min_time_s=args.min_time,
+            )
+        )
+        if args.out:
+            write_json(report, args.out)
+    else:
+        current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+        rows, ok = compare(baseline, current, args.threshold)
+    _print_rows(rows)
+    failed = [r["name"] for r in rows if r["status"] in _FAILING]
+    if failed:
+        print(f"{len(failed)} benchmark(s) regressed or missing: {', '.join(failed)}", file=sys.stderr)
+    return 0 if ok and not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -44,3 +44,31 @@ def test_invalid_placeholder_is_skipped():
     # invalid placeholder should be ignored and not appear
     assert "after:" not in q
 
+
+
+def test_sites_or_group_when_requested():
+    schema = ProviderNeutralQuery(keywords=["x"], filters={"sites": ["a.com", "b.com"]})
+    q = build_query_from_schema(schema, {"site_join": "OR"})
+    assert q == "x (site:a.com OR site:b.com)"
+
+
+def test_shard_sites_respects_limits_and_keeps_order():
+    from app.adapters.base import QueryLimits, shard_sites
+
+    sites = [f"site{i}.example.com" for i in range(20)]
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={"sites": sites})
+    limits = QueryLimits(max_chars=120, max_words=12)
+    groups = shard_sites(schema, limits)
+    assert len(groups) > 1
+    assert [s for g in groups for s in g] == sites
+    for g in groups:
+        sub = schema.model_copy(update={"filters": schema.filters.model_copy(update={"sites": g})})
+        assert limits.fits(build_query_from_schema(sub, {"site_join": "OR"}))
+
+
+def test_shard_sites_oversized_site_gets_own_group():
+    from app.adapters.base import QueryLimits, shard_sites
+
+    schema = ProviderNeutralQuery(keywords=["x"], filters={"sites": ["a.com", "b" * 50 + ".com"]})
+    groups = shard_sites(schema, QueryLimits(max_chars=30))
+    assert groups == [["a.com"], ["b" * 50 + ".com"]]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+import pytest_asyncio
+import respx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.adapters.replay import replay_adapters
+from app.adapters.serper import SERPER_URL, SerperAdapter
+from app.config import AppConfig, PayloadArchiveSettings, SearchSettings
+from app.core.orchestrator import orchestrate
+from app.core.reprocess import replay_run
+from app.core.schema import ProviderNeutralQuery
+from app.db.payloads import PayloadCall
+from app.db.queries import get_run, init_models
+from app.models import provider_payloads
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'replay.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+BODY = {
+    "organic": [
+        {"link": "https://a.example", "title": "A", "snippet": "first", "date": "2025-01-01"},
+        {"link": "https://b.example", "title": "B"},
+    ]
+}
+
+
+@pytest.mark.asyncio
+async def test_replay_adapter_matches_query_then_archive_order():
+    calls = [
+        PayloadCall("serper", "old query", None, None, {"organic": [{"link": "https://old"}]}),
+        PayloadCall("serper", "openai", None, None, {"organic": [{"link": "https://exact"}]}),
+        PayloadCall("serper", "openai", "de", None, {"organic": [{"link": "https://de"}]}),
+        PayloadCall("local", "openai", None, None, {}),
+    ]
+    adapters = replay_adapters(calls)
+    assert set(adapters) == {"serper"}  # no parser for local
+    serper = adapters["serper"]
+    assert serper.query_limits == SerperAdapter.query_limits
+
+    exact = await serper.search(ProviderNeutralQuery(keywords=["openai"]))
+    assert list(exact.urls) == ["https://exact"] and exact.query_used == "openai"
+    # Nothing matches the query text any more: next unused payload for the locale
+    fallback = await serper.search(ProviderNeutralQuery(keywords=["something", "else"]))
+    assert list(fallback.urls) == ["https://old"]
+    de = await serper.search(ProviderNeutralQuery(keywords=["x"], filters={"lang": "de"}))
+    assert list(de.urls) == ["https://de"]
+    with pytest.raises(LookupError):
+        await serper.search(ProviderNeutralQuery(keywords=["openai"]))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_orchestrate_archives_payloads_and_replays_offline(session: AsyncSession):
+    route = respx.post(SERPER_URL).mock(return_value=httpx.Response(200, json=BODY))
+    config = AppConfig(
+        search=SearchSettings(provider="serper"),
+        payload_archive=PayloadArchiveSettings(enabled=True),
+    )
+    schema = ProviderNeutralQuery(keywords=["openai"])
+    adapters = {"serper": SerperAdapter(api_key="k")}
+    kwargs = dict(rewritten_template=schema.model_dump_json(), schema=schema, config=config, session=session)
+    first = await orchestrate(original_query="openai", adapters=adapters, **kwargs)
+    await orchestrate(original_query="openai", adapters=adapters, **kwargs)
+    assert route.call_count == 2
+    # Identical bodies are stored once
+    assert await session.scalar(select(func.count()).select_from(provider_payloads)) == 1
+
+    replayed = await replay_run(session, first.run_id, config)
+    assert replayed is not None
+    assert route.call_count == 2  # no provider call
+    assert [p.url for p in replayed.processed] == [p.url for p in first.processed]
+    data = await get_run(session, replayed.run_id)
+    assert data is not None and data["run"]["config"]["replay_of"] == first.run_id
+
+    assert await replay_run(session, 424242, config) is None
@@ -20,7 +20,7 @@ async def test_serper_search_success_and_query_used():
         body = _json.loads(request.content.decode()) if request.content else {}
         assert "openai api" in body["q"]
         assert "site:openai.com" in body["q"]
-        return httpx.Response(200, json={"organic": [{"link": "https://openai.com"}, {"link": "https://platform.openai.com"}]})
+        return httpx.Response(200, json={"organic": [{"link": "https://openai.com", "title": "OpenAI"}, {"link": "https://platform.openai.com"}]})
 
     respx.post(SERPER_URL).mock(side_effect=handler)
 
@@ -28,3 +28,5 @@ async def test_serper_search_success_and_query_used():
     assert result.provider == "serper"
     assert "openai" in result.query_used
     assert len(result.urls) == 2
+    assert result.details[0]["title"] == "OpenAI"
+    assert result.payload is not None and len(result.payload["organic"]) == 2
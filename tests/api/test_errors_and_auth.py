@@ -3,10 +3,24 @@ from __future__ import annotations
 import json
 
 import pytest
+import pytest_asyncio
 
 from app.core.schema import ProviderNeutralQuery
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def set_test_db(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    import app.db.session as sess
+
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'api_errors.sqlite3'}")
+    # Fresh engine per test so the URL above is actually used
+    monkeypatch.setattr(sess, "_engine", None)
+    monkeypatch.setattr(sess, "_session_factory", None)
+    yield
+    if sess._engine is not None:
+        await sess._engine.dispose()
+
+
 @pytest.mark.asyncio
 async def test_post_invalid_token(monkeypatch, client):
     monkeypatch.setenv("SH_API_BEARER_TOKEN", "correct")
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 from dataclasses import dataclass
 
 import pytest
+import pytest_asyncio
 
 from app.core.schema import ProviderNeutralQuery
 
@@ -21,9 +23,17 @@ class FakeAdapter:
         return ProviderResult(provider=self.name, query_used=self.query_used, urls=self.urls, meta={})
 
 
-@pytest.fixture(autouse=True)
-def set_test_db(monkeypatch: pytest.MonkeyPatch, tmp_path):
+@pytest_asyncio.fixture(autouse=True)
+async def set_test_db(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    import app.db.session as sess
+
     monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'api.sqlite3'}")
+    # Fresh engine per test so the URL above is actually used
+    monkeypatch.setattr(sess, "_engine", None)
+    monkeypatch.setattr(sess, "_session_factory", None)
+    yield
+    if sess._engine is not None:
+        await sess._engine.dispose()
 
 
 @pytest.mark.asyncio
@@ -49,6 +59,8 @@ async def test_post_search_runs_happy_path(monkeypatch: pytest.MonkeyPatch, clie
     data = resp.json()
     assert data["id"] > 0
     assert sorted(data["providers_used"]) == ["google", "serper"]
+    assert data["per_provider_query_used"] == {"serper": "q-serper", "google": "q-google"}
+    assert data["per_provider_queries_used"] == {"serper": ["q-serper"], "google": ["q-google"]}
     proc = {p["url"]: p for p in data["processed"]}
     assert proc["https://b"]["confidence"] == 2
 
@@ -61,6 +73,42 @@ async def test_post_search_runs_happy_path(monkeypatch: pytest.MonkeyPatch, clie
     assert len(j["processed"]) == 3
 
 
+@pytest.mark.asyncio
+async def test_post_search_runs_honours_caller_max_results(monkeypatch: pytest.MonkeyPatch, client):
+    async def fake_rewrite(self, user_query: str):
+        data = {"keywords": ["limits"], "filters": {"max_results": 3}}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    limits: list[int] = []
+
+    @dataclass
+    class LimitAdapter(FakeAdapter):
+        async def search(self, schema, options=None):
+            limits.append(schema.filters.max_results)
+            return await super().search(schema, options)
+
+    urls = [f"https://{c}" for c in "abcde"]
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", fake_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters", lambda: {"serper": LimitAdapter(name="serper", urls=urls, query_used="q")}
+    )
+
+    # The smaller of options.maxResults and the rewritten query's max_results wins
+    async def post(max_results: int) -> dict:
+        body = {"query": "limits", "options": {"maxResults": max_results}}
+        return (await client.post("/search-runs", json=body)).json()
+
+    narrowed = await post(2)
+    assert [p["url"] for p in narrowed["processed"]] == ["https://a", "https://b"]
+    wider = await post(10)
+    assert len(wider["processed"]) == 3
+    assert limits == [2, 3]
+
+    # Reprocessing keeps the limit the run was requested with
+    resp = await client.post(f"/search-runs/{narrowed['id']}/reprocess")
+    assert [p["url"] for p in resp.json()["processed"]] == ["https://a", "https://b"]
+
+
 @pytest.mark.asyncio
 async def test_post_search_runs_llm_validation_error(monkeypatch: pytest.MonkeyPatch, client):
     from app.llm.client import LLMValidationError
@@ -88,3 +136,405 @@ async def test_post_search_runs_all_providers_failed(monkeypatch: pytest.MonkeyP
     resp = await client.post("/search-runs", json={"query": "openai"})
     assert resp.status_code == 502
 
+
+
+@pytest.mark.asyncio
+async def test_post_search_runs_with_locales(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["openai"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    seen: list[tuple[str | None, str | None]] = []
+
+    @dataclass
+    class LocaleAdapter:
+        name: str
+
+        async def search(self, schema, options=None):
+            from app.adapters.base import ProviderResult
+
+            seen.append((schema.filters.lang, schema.filters.geo))
+            return ProviderResult(self.name, "q", [f"https://{schema.filters.lang}.example"], {})
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr("app.main.build_adapters", lambda: {"serper": LocaleAdapter("serper")})
+
+    resp = await client.post(
+        "/search-runs",
+        json={"query": "locales", "options": {"locales": [{"lang": "en"}, {"lang": "de", "geo": "de"}]}},
+    )
+    assert resp.status_code == 201
+    assert sorted(seen, key=str) == sorted([("en", None), ("de", "de")], key=str)
+    assert {p["url"] for p in resp.json()["processed"]} == {"https://en.example", "https://de.example"}
+
+
+@pytest.mark.asyncio
+async def test_post_search_runs_against_inprocess_simulator(monkeypatch: pytest.MonkeyPatch, client):
+    monkeypatch.setenv("SH_PROVIDER_SIMULATOR_URL", "inprocess")
+    resp = await client.post("/search-runs", json={"query": "simulated end to end"})
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["providers_used"] == ["serper", "google", "brave"]
+    assert any(p["confidence"] == 3 for p in data["processed"])
+    timing = resp.headers["Server-Timing"]
+    for stage in ("schema", "cache", "llm", "providers", "merge", "persist"):
+        assert f"{stage};dur=" in timing
+
+
+@pytest.mark.asyncio
+async def test_list_search_runs_paginates_with_cursor(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["listing"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {"serper": FakeAdapter(name="serper", urls=["https://a"], query_used="q")},
+    )
+    query = f"listing {os.urandom(4).hex()}"
+    ids = [(await client.post("/search-runs", json={"query": query})).json()["id"] for _ in range(3)]
+
+    first = await client.get("/search-runs", params={"query": query, "limit": 2})
+    assert first.status_code == 200
+    page1 = first.json()
+    assert [r["id"] for r in page1["items"]] == ids[::-1][:2]
+    assert page1["items"][0]["query"] == query
+    assert page1["next_cursor"]
+
+    second = await client.get("/search-runs", params={"query": query, "limit": 2, "cursor": page1["next_cursor"]})
+    page2 = second.json()
+    assert [r["id"] for r in page2["items"]] == [ids[0]]
+    assert page2["next_cursor"] is None
+
+    future = await client.get("/search-runs", params={"query": query, "from": "2999-01-01T00:00:00Z"})
+    assert future.json()["items"] == []
+    assert (await client.get("/search-runs", params={"cursor": "not-a-cursor"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_search_run_is_cached_with_etag(monkeypatch: pytest.MonkeyPatch, app, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["etag"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {
+            "serper": FakeAdapter(name="serper", urls=["https://a", "https://b"], query_used="q"),
+            "brave": FakeAdapter(name="brave", urls=["https://b"], query_used="q"),
+        },
+    )
+    rid = (await client.post("/search-runs", json={"query": "etag run"})).json()["id"]
+    assert app.state.run_cache.get(rid) is not None  # written through at POST
+
+    cached = await client.get(f"/search-runs/{rid}")
+    assert cached.status_code == 200
+    etag = cached.headers["ETag"]
+    assert etag.startswith('"')
+
+    # A cold read from the database serializes to the same bytes and tag
+    app.state.run_cache.clear()
+    fresh = await client.get(f"/search-runs/{rid}")
+    assert fresh.content == cached.content
+    assert fresh.headers["ETag"] == etag
+
+    # Runs persisted before snapshots existed are rebuilt from their rows
+    from sqlalchemy import update
+
+    from app.db.session import get_session_factory
+    from app.models import search_runs
+
+    async with get_session_factory()() as session:
+        await session.execute(update(search_runs).where(search_runs.c.id == rid).values(snapshot=None))
+        await session.commit()
+    app.state.run_cache.clear()
+    rebuilt = await client.get(f"/search-runs/{rid}")
+    assert rebuilt.content == cached.content
+
+    not_modified = await client.get(f"/search-runs/{rid}", headers={"If-None-Match": f'"x", W/{etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+    changed = await client.get(f"/search-runs/{rid}", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_url_stats_endpoint(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["stats"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {
+            "serper": FakeAdapter(name="serper", urls=["https://stats.example/x"], query_used="q"),
+            "brave": FakeAdapter(name="brave", urls=["http://www.stats.example/x/"], query_used="q"),
+        },
+    )
+    for _ in range(2):
+        assert (await client.post("/search-runs", json={"query": "stats"})).status_code == 201
+
+    # Looked up by its canonical form, whatever variant the caller passes
+    resp = await client.get("/urls/stats", params={"url": "http://stats.example/x#frag"})
+    assert resp.status_code == 200
+    stats = resp.json()
+    assert stats["url"] == "https://stats.example/x"
+    assert stats["run_count"] == 2
+    assert stats["providers"] == ["serper", "brave"]
+    assert stats["first_seen"] <= stats["last_seen"]
+
+    by_hash = await client.get("/urls/stats", params={"hash": stats["url_hash"]})
+    assert by_hash.json() == stats
+    assert (await client.get("/urls/stats", params={"url": "https://unseen.example"})).status_code == 404
+    assert (await client.get("/urls/stats")).status_code == 400
+    assert (await client.get("/urls/stats", params={"hash": "zz"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_novel_flag_and_new_endpoint(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["novel"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    urls = ["https://a.example", "https://b.example"]
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {"serper": FakeAdapter(name="serper", urls=list(urls), query_used="q")},
+    )
+    first = (await client.post("/search-runs", json={"query": "novel"})).json()
+    assert all(p["novel"] for p in first["processed"])
+
+    urls.append("https://c.example")
+    second = (await client.post("/search-runs", json={"query": "Novel"})).json()
+    assert {p["url"]: p["novel"] for p in second["processed"]} == {
+        "https://a.example": False,
+        "https://b.example": False,
+        "https://c.example": True,
+    }
+    new = await client.get(f"/search-runs/{second['id']}/new")
+    assert new.status_code == 200
+    assert [p["url"] for p in new.json()["processed"]] == ["https://c.example"]
+    assert (await client.get("/search-runs/999999/new")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_diff_endpoint(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["drift"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    serper, google = ["https://a.example", "https://b.example"], ["https://a.example"]
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {
+            "serper": FakeAdapter(name="serper", urls=list(serper), query_used="q"),
+            "google": FakeAdapter(name="google", urls=list(google), query_used="q"),
+        },
+    )
+    first = (await client.post("/search-runs", json={"query": "drift"})).json()
+    serper[:], google[:] = ["https://a.example", "https://c.example"], ["https://c.example"]
+    second = (await client.post("/search-runs", json={"query": "drift"})).json()
+    conf_a = {p["url"]: p["confidence"] for p in first["processed"]}
+    conf_b = {p["url"]: p["confidence"] for p in second["processed"]}
+
+    resp = await client.get(f"/search-runs/{first['id']}/diff/{second['id']}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["a"], body["b"]) == (first["id"], second["id"])
+    assert [r["url"] for r in body["added"]] == ["https://c.example"]
+    assert [r["url"] for r in body["removed"]] == ["https://b.example"]
+    assert body["changed"] == [
+        {
+            "url": "https://a.example",
+            "confidence_a": conf_a["https://a.example"],
+            "confidence_b": conf_b["https://a.example"],
+            "providers_a": ["google", "serper"],
+            "providers_b": ["serper"],
+        }
+    ]
+
+    same = (await client.get(f"/search-runs/{second['id']}/diff/{second['id']}")).json()
+    assert same == {"a": second["id"], "b": second["id"], "added": [], "removed": [], "changed": []}
+    assert (await client.get(f"/search-runs/{first['id']}/diff/999999")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_export_endpoint_streams_formats(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["export"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {"serper": FakeAdapter(name="serper", urls=["https://a", "https://b"], query_used="q")},
+    )
+    first = (await client.post("/search-runs", json={"query": "export one"})).json()
+    second = (await client.post("/search-runs", json={"query": "export two"})).json()
+
+    resp = await client.get("/exports/processed", params={"run_from": second["id"]})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(r["run_id"], r["query"], r["url"]) for r in rows] == [
+        (second["id"], "export two", "https://a"),
+        (second["id"], "export two", "https://b"),
+    ]
+
+    resp = await client.get("/exports/processed", params={"format": "csv", "run_to": first["id"]})
+    assert resp.headers["content-disposition"] == 'attachment; filename="processed.csv"'
+    assert resp.text.splitlines()[0].startswith("run_id,run_timestamp,query,url")
+    assert len(resp.text.splitlines()) == 3
+    assert (await client.get("/exports/processed", params={"format": "xml"})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_feed_pages_and_long_polls(monkeypatch: pytest.MonkeyPatch, client):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["feed"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {"serper": FakeAdapter(name="serper", urls=["https://a", "https://b"], query_used="q")},
+    )
+    run = (await client.post("/search-runs", json={"query": "feed"})).json()
+
+    second = (await client.post("/search-runs", json={"query": "feed two"})).json()
+
+    # A page never splits a run, so `limit` is exceeded to finish it
+    page = (await client.get("/feed", params={"limit": 1})).json()
+    assert [(i["run_id"], i["url"]) for i in page["items"]] == [
+        (run["id"], "https://a"),
+        (run["id"], "https://b"),
+    ]
+    assert page["next_cursor"] == page["items"][-1]["seq"]
+    page = (await client.get("/feed", params={"after": page["next_cursor"]})).json()
+    assert {i["run_id"] for i in page["items"]} == {second["id"]}
+    cursor = page["next_cursor"]
+    assert (await client.get("/feed", params={"after": cursor})).json() == {
+        "items": [],
+        "next_cursor": cursor,
+    }
+
+    # A waiting fetcher is woken by the next run instead of timing out
+    poll = asyncio.create_task(client.get("/feed", params={"after": cursor, "wait": 30}))
+    await asyncio.sleep(0.05)
+    assert not poll.done()
+    third = (await client.post("/search-runs", json={"query": "feed again"})).json()
+    items = (await asyncio.wait_for(poll, 5)).json()["items"]
+    assert {i["run_id"] for i in items} == {third["id"]}
+
+
+@pytest.mark.asyncio
+async def test_reprocess_endpoint_replaces_cached_run(monkeypatch: pytest.MonkeyPatch, app, client):
+    from app.config import CanonicalizationSettings
+
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["reprocess"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {
+            "serper": FakeAdapter(
+                name="serper", urls=["https://www.a.example/x/", "https://a.example/x"], query_used="q"
+            )
+        },
+    )
+    run = (await client.post("/search-runs", json={"query": "reprocess"})).json()
+    assert [p["url"] for p in run["processed"]] == ["https://www.a.example/x/"]
+    before = await client.get(f"/search-runs/{run['id']}")
+
+    # Merge policy change: URLs are kept as providers returned them
+    search = app.state.runtime_config.settings.search
+    monkeypatch.setattr(search, "canonicalization", CanonicalizationSettings(enabled=False))
+    resp = await client.post(f"/search-runs/{run['id']}/reprocess")
+    assert resp.status_code == 200
+    assert [p["url"] for p in resp.json()["processed"]] == ["https://www.a.example/x/", "https://a.example/x"]
+    assert resp.headers["etag"] != before.headers["etag"]
+    after = await client.get(f"/search-runs/{run['id']}")
+    assert after.content == resp.content and after.headers["etag"] == resp.headers["etag"]
+    assert (await client.post("/search-runs/999999/reprocess")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_run_bodies_negotiate_fields_compression_and_msgpack(
+    monkeypatch: pytest.MonkeyPatch, app, client
+):
+    async def ok_rewrite(self, user_query: str):
+        data = {"keywords": ["formats"]}
+        return ProviderNeutralQuery.model_validate(data), json.dumps(data)
+
+    monkeypatch.setattr("app.llm.client.LLMClient.rewrite_query", ok_rewrite)
+    monkeypatch.setattr(
+        "app.main.build_adapters",
+        lambda: {"serper": FakeAdapter(name="serper", urls=["https://a", "https://b"], query_used="q")},
+    )
+    # Compress every run body, whatever its size
+    app.state.runtime_config.settings.responses.compress_min_bytes = 0
+
+    created = await client.post(
+        "/search-runs?fields=url", json={"query": "formats"}, headers={"Accept-Encoding": "identity"}
+    )
+    assert created.status_code == 201
+    assert "Content-Encoding" not in created.headers
+    assert created.headers["Vary"] == "Accept, Accept-Encoding"
+    assert created.json()["processed"] == [{"url": "https://a"}, {"url": "https://b"}]
+    rid = created.json()["id"]
+    # POST items carry the same hashes as the stored body, plus novelty
+    hashes = await client.post("/search-runs?fields=dedupe_hash,novel", json={"query": "formats"})
+    assert [set(p) for p in hashes.json()["processed"]] == [{"dedupe_hash", "novel"}] * 2
+
+    plain = await client.get(f"/search-runs/{rid}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    etag = plain.headers["ETag"]
+
+    gz = await client.get(f"/search-runs/{rid}", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert gz.content == plain.content  # httpx decodes the body
+    assert gz.headers["ETag"] == etag[:-1] + '-json-gzip"'
+    again = await client.get(
+        f"/search-runs/{rid}", headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["ETag"]}
+    )
+    assert again.status_code == 304
+    # The plain tag does not validate the gzip variant
+    stale = await client.get(f"/search-runs/{rid}", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert stale.status_code == 200
+
+    projected = await client.get(
+        f"/search-runs/{rid}?fields=url,score", headers={"Accept-Encoding": "identity"}
+    )
+    assert [set(p) for p in projected.json()["processed"]] == [{"url", "score"}] * 2
+    assert projected.headers["ETag"] == etag[:-1] + '-json-url+score"'
+    assert (await client.get(f"/search-runs/{rid}?fields=title")).status_code == 400
+    # Stored bodies have no novelty flag to project
+    assert (await client.get(f"/search-runs/{rid}?fields=novel")).status_code == 400
+
+    packed = await client.get(f"/search-runs/{rid}", headers={"Accept": "application/msgpack"})
+    try:
+        import msgpack
+    except ImportError:
+        # Optional extra missing: the client falls back to JSON
+        assert packed.headers["Content-Type"] == "application/json"
+    else:
+        assert packed.headers["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(packed.content) == plain.json()
+
+    # Reprocess answers with the same negotiated variants as GET
+    redone = await client.post(
+        f"/search-runs/{rid}/reprocess?fields=url", headers={"Accept-Encoding": "gzip"}
+    )
+    assert redone.headers["Content-Encoding"] == "gzip"
+    assert redone.headers["Vary"] == "Accept, Accept-Encoding"
+    assert redone.json()["processed"] == [{"url": "https://a"}, {"url": "https://b"}]
+    assert redone.headers["ETag"] == etag[:-1] + '-json-url-gzip"'
+    assert (await client.post(f"/search-runs/{rid}/reprocess?fields=title")).status_code == 400
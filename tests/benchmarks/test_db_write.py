@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+import pytest
+
+from benchmarks.db_write import postgres_container, run_all
+
+
+@pytest.mark.asyncio
+async def test_sqlite_sweep_reports_throughput_commit_and_lock_wait(tmp_path):
+    report = await run_all(
+        sizes=[5, 20], concurrency=[1, 3], runs=2, sqlite_path=tmp_path / "w.sqlite3"
+    )
+    results = report["results"]
+    assert [(r["rows_per_run"], r["concurrency"]) for r in results] == [(5, 1), (5, 3), (20, 1), (20, 3)]
+    for r in results:
+        assert r["backend"] == "sqlite"
+        assert r["errors"] == 0
+        assert r["runs"] == 2 * r["concurrency"]
+        assert r["rows"] == r["runs"] * (1 + 2 * r["rows_per_run"])
+        assert r["rows_per_s"] > 0
+        assert r["commit_ms"]["count"] == r["lock_wait_ms"]["count"] == r["runs"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.getenv("CI") is None or shutil.which("docker") is None,
+    reason="Runs in CI with Docker via Testcontainers",
+)
+async def test_postgres_sweep_with_testcontainers(tmp_path):
+    with postgres_container() as pg_url:
+        if pg_url is None:
+            pytest.skip("testcontainers not available")
+        report = await run_all(
+            sizes=[10], concurrency=[2], runs=2, pg_url=pg_url, sqlite_path=tmp_path / "w.sqlite3"
+        )
+    backends = [r["backend"] for r in report["results"]]
+    assert backends == ["sqlite", "postgresql"]
+    assert all(r["errors"] == 0 for r in report["results"])
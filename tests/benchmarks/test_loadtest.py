@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from benchmarks._stats import percentile, summarize_ms
+from benchmarks.loadtest import Sample, build_report, run_open_loop, run_scenarios
+
+
+@pytest.fixture(autouse=True)
+def simulator_env(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'load.sqlite3'}")
+    monkeypatch.setenv("SH_PROVIDER_SIMULATOR_URL", "inprocess")
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([], 95) == 0.0
+    assert summarize_ms([])["count"] == 0
+
+
+def test_report_flags_slo_breach_and_errors():
+    samples = [Sample(ok=True, status=201, latency_ms=4000.0, stages={"llm": 10.0})] * 19
+    samples += [Sample(ok=False, status=502, latency_ms=5.0)]
+    report = build_report("cold", samples, wall_s=2.0, rate=10.0)
+    assert report["error_rate"] == 0.05
+    assert report["errors_by_status"] == {"502": 1}
+    assert report["stages_ms"]["llm"]["p50"] == 10.0
+    assert report["slo"]["pass"] is False
+
+
+@pytest.mark.asyncio
+async def test_open_loop_does_not_wait_for_slow_responses():
+    async def send(i: int) -> Sample:
+        import asyncio
+
+        await asyncio.sleep(0.2)
+        return Sample(ok=True, status=201, latency_ms=0.0)
+
+    samples, wall = await run_open_loop(send, rate=100.0, duration_s=0.2, rng=random.Random(1))
+    # ~20 arrivals in 0.2s would take 4s closed-loop
+    assert len(samples) > 5
+    assert wall < 1.0
+    assert all(s.latency_ms >= 200 for s in samples)
+
+
+@pytest.mark.asyncio
+async def test_cold_and_warm_scenarios_against_simulator(client):
+    report = await run_scenarios(client, scenarios=["cold", "warm"], rate=20.0, duration_s=0.3)
+    cold, warm = report["scenarios"]
+    assert cold["scenario"] == "cold" and warm["scenario"] == "warm"
+    for scenario in (cold, warm):
+        assert scenario["requests"] > 0
+        assert scenario["error_rate"] == 0.0
+        assert "providers" in scenario["stages_ms"]
+    # warm requests hit the rewrite cache and never call the LLM
+    assert "llm" in cold["stages_ms"] and "llm" not in warm["stages_ms"]
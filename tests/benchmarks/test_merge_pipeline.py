@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from benchmarks.merge import _lists, compact, legacy, run_all
+
+
+def test_pipelines_produce_the_same_rows():
+    per_provider = _lists(40)
+    old, new = legacy(per_provider, 25), compact(per_provider, 25)
+    # processed rows, persisted tuples, snapshot body and response items all agree
+    assert old[1] == new[1]
+    assert old[2] == new[2]
+    assert old[3] == new[3]
+
+
+def test_report_compares_time_and_allocations():
+    report = run_all(sizes=[20], limit=None, repeat=1)
+    rows = {r["pipeline"]: r for r in report["results"]}
+    assert set(rows) == {"legacy", "compact", "compact/legacy"}
+    for name in ("legacy", "compact"):
+        assert rows[name]["median_ms"] > 0
+        assert rows[name]["peak_kib"] > 0
+    assert rows["compact/legacy"]["time_ratio"] > 0
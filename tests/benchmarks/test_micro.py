@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from benchmarks.micro import check, compare, main, run_all
+
+
+def _report(**mins: float) -> dict:
+    return {"results": {k: {"median_us": v, "min_us": v, "loops": 1} for k, v in mins.items()}}
+
+
+def test_compare_flags_regressions_past_threshold():
+    rows, ok = compare(_report(a=10.0, b=10.0), _report(a=12.0, b=14.0, new=1.0), 0.25)
+    by_name = {r["name"]: r for r in rows}
+    assert not ok
+    assert by_name["a"]["status"] == "ok"
+    assert by_name["b"]["status"] == "REGRESSED"
+    assert by_name["new"]["status"] == "new"
+
+
+def test_compare_fails_on_missing_benchmark():
+    rows, ok = compare(_report(a=10.0, gone=1.0), _report(a=10.0), 0.25)
+    assert not ok
+    assert {r["name"]: r["status"] for r in rows} == {"a": "ok", "gone": "MISSING"}
+
+
+def test_compare_uses_minimum_and_widens_threshold_by_noise():
+    base = {"results": {"a": {"median_us": 20.0, "min_us": 10.0, "loops": 1}}}
+    # A slow median alone is noise, not a regression
+    rows, ok = compare(base, {"results": {"a": {"median_us": 30.0, "min_us": 10.5, "loops": 1}}}, 0.25)
+    assert ok and rows[0]["ratio"] == 1.05
+    # Noise widens the allowance by at most the threshold itself (1.25 + 0.25)
+    rows, ok = compare(base, _report(a=14.0), 0.25)
+    assert ok and rows[0]["allowed"] == 1.5
+    rows, ok = compare(base, _report(a=16.0), 0.25)
+    assert not ok and rows[0]["status"] == "REGRESSED"
+
+
+def test_compare_cli_exit_codes(tmp_path):
+    base, cur = tmp_path / "base.json", tmp_path / "cur.json"
+    base.write_text(json.dumps(_report(a=10.0)))
+    cur.write_text(json.dumps(_report(a=9.0)))
+    assert main(["compare", str(base), str(cur)]) == 0
+    cur.write_text(json.dumps(_report(a=20.0)))
+    assert main(["compare", str(base), str(cur), "--threshold", "0.5"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_suite_runs_each_benchmark_family():
+    report = await run_all(only="[100]", repeat=1, min_time_s=0.0)
+    assert set(report["results"]) == {
+        "merge_results[100]",
+        "bulk_insert_raw[100]",
+        "bulk_insert_processed[100]",
+        "get_run.rows[100]",
+        "get_run.snapshot[100]",
+        "novelty.check[100]",
+    }
+    assert all(r["median_us"] > 0 for r in report["results"].values())
+
+
+@pytest.mark.asyncio
+async def test_check_reruns_regressed_benchmarks_and_keeps_fastest_trial(monkeypatch: pytest.MonkeyPatch):
+    import benchmarks.micro as micro
+
+    trials = iter([_report(a=10.0, b=30.0), _report(b=11.0)])
+    calls: list[set[str] | None] = []
+
+    async def fake_run_all(*, only, repeat, min_time_s, names=None):
+        calls.append(names)
+        return next(trials)
+
+    monkeypatch.setattr(micro, "run_all", fake_run_all)
+    report, rows, ok = await check(_report(a=10.0, b=10.0), threshold=0.25, trials=3, repeat=1, min_time_s=0.0)
+    assert ok
+    assert calls == [None, {"b"}]
+    assert report["results"]["b"]["min_us"] == 11.0
+
+
+def test_check_cli_exits_non_zero_on_any_regression(tmp_path, monkeypatch: pytest.MonkeyPatch, capsys):
+    import benchmarks.micro as micro
+
+    async def fake_run_all(*, only, repeat, min_time_s, names=None):
+        # b stays slow on every trial
+        return _report(a=10.0, b=30.0)
+
+    monkeypatch.setattr(micro, "run_all", fake_run_all)
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps(_report(a=10.0, b=10.0)))
+    assert main(["check", str(base), "--threshold", "0.25", "--trials", "2"]) == 1
+    out = capsys.readouterr()
+    assert "REGRESSED" in out.out
+    assert "1 benchmark(s) regressed or missing: b" in out.err
+    base.write_text(json.dumps(_report(a=10.0, b=30.0)))
+    assert main(["check", str(base)]) == 0
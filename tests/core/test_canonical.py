@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import pytest
+
+from app.config import CanonicalizationSettings
+from app.core.canonical import Canonicalizer, get_canonicalizer
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("http://www.Example.com:80/a/b/?utm_source=x&b=2&a=1#frag", "https://example.com/a/b?a=1&b=2"),
+        ("https://EXAMPLE.com:443", "https://example.com"),
+        ("https://example.com:8443/x", "https://example.com:8443/x"),
+        ("https://m.example.com/x/", "https://example.com/x"),
+        ("https://mobile.example.com/x", "https://example.com/x"),
+        ("https://amp.example.com/news/story/amp/", "https://example.com/news/story"),
+        ("https://example.com/news?outputType=amp&id=3", "https://example.com/news?id=3"),
+        ("https://example-com.cdn.ampproject.org/c/s/example.com/news/x?amp=1", "https://example.com/news/x"),
+        ("https://example.com/news/x?amp", "https://example.com/news/x"),
+        # Same keys with non-AMP values select different content and are kept
+        ("https://example.com/news?amp=0", "https://example.com/news?amp=0"),
+        ("https://example.com/shop?amp=sale", "https://example.com/shop?amp=sale"),
+        ("https://example.com/news?outputType=json", "https://example.com/news?outputType=json"),
+        ("https://example.com/news?outputType=", "https://example.com/news?outputType="),
+        ("https://example.com/p?fbclid=1&gclid=2&UTM_Medium=3", "https://example.com/p"),
+        ("https://m.com/", "https://m.com"),
+        ("https://[::1]:8443/x", "https://[::1]:8443/x"),
+        ("mailto:someone@example.com", "mailto:someone@example.com"),
+        ("not a url", "not a url"),
+    ],
+)
+def test_default_rules(url: str, expected: str):
+    assert Canonicalizer().canonicalize(url) == expected
+
+
+def test_rules_are_configurable():
+    settings = CanonicalizationSettings(
+        force_https=False, strip_www=False, drop_fragment=False, sort_query=False, strip_params=["ref"]
+    )
+    c = Canonicalizer(settings)
+    assert c.canonicalize("http://www.example.com/a/?z=1&ref=x&a=2#top") == "http://www.example.com/a?z=1&a=2#top"
+    assert Canonicalizer(CanonicalizationSettings(enabled=False)).canonicalize("http://x/") == "http://x/"
+
+
+def test_batch_and_memoization():
+    c = Canonicalizer(CanonicalizationSettings(cache_size=8))
+    mapping = c.canonicalize_many(["https://www.a.com/", "https://a.com", "https://www.a.com/"])
+    assert mapping == {"https://www.a.com/": "https://a.com", "https://a.com": "https://a.com"}
+    c.canonicalize("https://www.a.com/")
+    assert c.canonicalize.cache_info().hits >= 1  # type: ignore[attr-defined]
+    assert get_canonicalizer() is get_canonicalizer(CanonicalizationSettings())
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from app.config import ResponseSettings
+from app.core.encoding import (
+    JSON_MEDIA_TYPE,
+    RUN_FIELDS,
+    Representation,
+    dumps,
+    negotiate,
+    parse_fields,
+)
+from app.core.snapshot import encode_run_body
+
+_BODY = {
+    "id": 1,
+    "query": "q",
+    "rewritten_template": "{}",
+    "providers_used": ["serper"],
+    "processed": [
+        {"url": "https://é.example/a", "providers": ["serper"], "confidence": 1, "score": 1 / 61, "dedupe_hash": "ab"}
+    ],
+}
+
+
+def test_dumps_is_compact_utf8_json():
+    assert dumps(_BODY) == encode_run_body(_BODY)
+    assert json.loads(dumps(_BODY)) == _BODY
+    assert b"\\u" not in dumps(_BODY)
+
+
+def test_parse_fields_validates_names():
+    assert parse_fields(None) is None
+    assert parse_fields("url, score,url") == ("url", "score")
+    with pytest.raises(ValueError):
+        parse_fields("url,title")
+    # Stored run bodies have no novelty flag
+    assert parse_fields("novel") == ("novel",)
+    with pytest.raises(ValueError, match="novel"):
+        parse_fields("url,novel", RUN_FIELDS)
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate(None, None) == Representation()
+    assert negotiate("*/*", "gzip;q=0, deflate").encoding is None
+    assert negotiate(None, "*").encoding in ("br", "gzip")
+    assert negotiate(JSON_MEDIA_TYPE, "gzip;q=0.5").encoding == "gzip"
+    # JSON preferred over msgpack stays JSON whether or not msgpack is installed
+    assert negotiate("application/json, application/msgpack;q=0.5", None).media_type == JSON_MEDIA_TYPE
+
+
+def test_render_projects_compresses_past_threshold_and_memoizes():
+    settings = ResponseSettings(compress_min_bytes=64)
+    body = dumps(_BODY)
+
+    assert Representation().render(body, settings) == (body, None)
+    projected, _ = Representation(fields=("url",)).render(body, settings)
+    assert json.loads(projected)["processed"] == [{"url": "https://é.example/a"}]
+
+    memo: dict = {}
+    rep = Representation(encoding="gzip")
+    packed, encoding = rep.render(body, settings, memo)
+    assert encoding == "gzip" and gzip.decompress(packed) == body
+    assert rep.render(b"ignored", settings, memo) == (packed, "gzip")
+    assert rep.etag('"abc"', encoding) == '"abc-json-gzip"'
+    assert Representation().etag('"abc"', None) == '"abc"'
+
+    # Below the threshold the body goes out as-is
+    small, encoding = rep.render({"id": 1, "processed": []}, settings)
+    assert encoding is None and json.loads(small) == {"id": 1, "processed": []}
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from app.core.feed import FeedNotifier, sse_feed
+
+
+@pytest.mark.asyncio
+async def test_notifier_wakes_armed_waiters():
+    notifier = FeedNotifier()
+    assert await notifier.wait(0.01) is False
+    armed = notifier.arm()
+    notifier.notify()  # lands before the wait starts; the armed event still sees it
+    assert await notifier.wait(0.01, armed) is True
+
+    waiter = asyncio.create_task(notifier.wait(5))
+    await asyncio.sleep(0)
+    notifier.notify()
+    assert await waiter is True
+
+
+@pytest.mark.asyncio
+async def test_sse_feed_emits_rows_then_keepalive():
+    rows = [
+        {"seq": 1, "id": 1, "url": "https://a"},
+        {"seq": 1, "id": 2, "url": "https://b"},
+        {"seq": 2, "id": 3, "url": "https://c"},
+    ]
+    seen: list[int] = []
+
+    async def read(after: int) -> list[dict]:
+        seen.append(after)
+        return [r for r in rows if r["seq"] > after]
+
+    notifier = FeedNotifier()
+    stream = sse_feed(read, notifier, 0, keepalive=0.01)
+    first = (await anext(stream)).decode()
+    events = [e.splitlines() for e in first.split("\n\n") if e]
+    # Only the last row of a sequence carries the resume id
+    assert [e[0] for e in events] == ["event: processed", "id: 1", "id: 2"]
+    assert json.loads(events[1][2].removeprefix("data: ")) == rows[1]
+    assert await anext(stream) == b": keepalive\n\n"
+
+    rows.append({"seq": 3, "id": 4, "url": "https://d"})
+    notifier.notify()
+    assert (await anext(stream)).startswith(b"id: 3\n")
+    await stream.aclose()
+    assert seen[:2] == [0, 2]
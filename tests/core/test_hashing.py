@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import hashlib
+
+import pytest
+
+from app.core.hashing import HASH_STRATEGIES, dedupe_key, get_hash_strategy, url_hash, url_key
+
+
+def test_strategies_have_fixed_widths():
+    for strategy in HASH_STRATEGIES.values():
+        assert len(strategy.digest("https://example.com/a")) == strategy.digest_size
+    assert get_hash_strategy("sha1").hexdigest("https://a") == url_hash("https://a")
+    with pytest.raises(ValueError):
+        get_hash_strategy("md5")
+
+
+def test_dedupe_and_url_keys_are_compact_blake2b():
+    assert url_key("https://a") == hashlib.blake2b(b"https://a", digest_size=16).digest()
+    # One hash per URL: the dedupe hash is the url_key prefix
+    assert dedupe_key("https://a") == url_key("https://a")[:8]
+    assert dedupe_key("https://a") != dedupe_key("https://a/")
+    assert len(dedupe_key("https://a").hex()) == 16
+    assert url_hash("https://a") == hashlib.sha1(b"https://a").hexdigest()
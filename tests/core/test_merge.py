@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import pytest
+
+from app.core.hashing import dedupe_key, url_key
+from app.core.merge import STORED_PROVIDERS_MASK, MergedResult, RankMerger
+from app.core.providers import PROVIDER_BITS, provider_mask
+
+
+def test_merger_fuses_best_ranks_and_orders_results():
+    merger = RankMerger(rrf_k=60)
+    merger.add_ranked("serper", ["https://a", "https://b", "https://d"])
+    merger.add_ranked("google", ["https://c", "https://b"])
+    # A later sub-query of the same provider only improves a rank, never adds to it
+    merger.add_ranked("serper", ["https://b"])
+
+    out = merger.results()
+    assert [r.url for r in out] == ["https://b", "https://a", "https://c", "https://d"]
+    b = out[0]
+    assert b.providers == ["google", "serper"]
+    assert b.confidence == 2
+    assert b.score == pytest.approx(1 / 61 + 1 / 62)
+    assert b.url_key == url_key("https://b")
+    assert b.dedupe_hash == dedupe_key("https://b")
+    assert b.stored_mask == provider_mask(["google", "serper"])
+    assert not b.novel
+
+
+def test_merger_truncates_and_hashes_only_kept_rows():
+    merger = RankMerger()
+    for provider in ("serper", "brave"):
+        merger.add_ranked(provider, [f"https://x/{i}" for i in range(10)])
+    out = merger.results(3)
+    assert [r.url for r in out] == ["https://x/0", "https://x/1", "https://x/2"]
+    assert all(r.dedupe_hash for r in out)
+    # Records with the same providers share one decoded list
+    assert out[0].providers is out[1].providers
+
+
+def test_merger_dedupes_on_canonical_form_and_keeps_best_ranked_original():
+    canonical = {
+        "https://www.a.example/?utm_source=x": "https://a.example",
+        "http://a.example/#top": "https://a.example",
+        "https://b.example/": "https://b.example",
+    }
+    merger = RankMerger()
+    merger.add_ranked("serper", ["https://b.example/", "https://www.a.example/?utm_source=x"], canonical)
+    merger.add_ranked("google", ["http://a.example/#top"], canonical)
+    merger.add("brave", "https://www.a.example/?utm_source=x", 1, "https://a.example")
+
+    a, b = merger.results()
+    # Strictly better rank wins; on a tie the first seen original stays
+    assert (a.url, a.canonical_url, a.confidence) == ("http://a.example/#top", "https://a.example", 3)
+    assert a.url_key == url_key("http://a.example/#top")
+    assert a.canonical_key == url_key("https://a.example")
+    assert a.dedupe_hash == dedupe_key("https://a.example")
+    assert (b.url, b.canonical_url) == ("https://b.example/", "https://b.example")
+
+
+def test_unknown_providers_get_bits_outside_the_stored_mask():
+    merger = RankMerger()
+    merger.add("p1", "https://a", 3)
+    merger.add("p1", "https://a", 1)
+    merger.add("serper", "https://a", 2)
+    (rec,) = merger.results()
+    assert isinstance(rec, MergedResult)
+    assert rec.providers == ["p1", "serper"]
+    assert rec.confidence == 2
+    assert rec.score == pytest.approx(1 / 61 + 1 / 62)
+    assert rec.mask & ~STORED_PROVIDERS_MASK
+    assert rec.stored_mask == PROVIDER_BITS["serper"]
+
+
+def test_merged_result_has_no_instance_dict():
+    merger = RankMerger()
+    merger.add_ranked("serper", ["https://a"])
+    (rec,) = merger.results()
+    with pytest.raises(AttributeError):
+        rec.extra = 1  # type: ignore[attr-defined]
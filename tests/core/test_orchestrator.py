@@ -5,10 +5,11 @@ from dataclasses import dataclass
 import pytest
 import pytest_asyncio
 
-from app.core.hashing import url_hash
+from app.core.hashing import dedupe_key
 from app.core.orchestrator import AllProvidersFailed, orchestrate
 from app.core.schema import ProviderNeutralQuery
-from app.db.queries import init_models, get_run
+from app.core.snapshot import encode_run_body, run_payload
+from app.db.queries import init_models, get_raw_urls, get_run, get_run_snapshot
 from app.db.session import get_engine, get_session_factory
 from app.config import load_runtime_config
 
@@ -62,13 +63,49 @@ async def test_orchestrator_merge_and_persist(session):
     assert proc["https://b"].confidence == 2
     assert proc["https://c"].confidence == 1
     assert proc["https://b"].providers == ["google", "serper"]
-    assert proc["https://a"].dedupe_hash == url_hash("https://a")
+    assert proc["https://a"].dedupe_hash == dedupe_key("https://a")
 
     # Verify DB persisted
     run = await get_run(session, out.run_id)
     assert run is not None
     assert len(run["processed"]) == 3
 
+    # Snapshot written in the same transaction matches a rebuild from the rows
+    assert await get_run_snapshot(session, out.run_id) == out.snapshot
+    assert out.snapshot == encode_run_body(run_payload(run["run"], run["processed"]))
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_ranks_by_fused_score_and_truncates(session):
+    rc = load_runtime_config()
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={"max_results": 2})
+    adapters = {
+        "serper": FakeAdapter(name="serper", urls=["https://a", "https://b", "https://d"], query_used="q1"),
+        "google": FakeAdapter(name="google", urls=["https://c", "https://b"], query_used="q2"),
+    }
+
+    out = await orchestrate(
+        original_query="orig q",
+        rewritten_template="{\"keywords\":[\"openai\"],\"filters\":{\"max_results\":2}}",
+        schema=schema,
+        config=rc.settings,
+        adapters=adapters,
+        session=session,
+    )
+
+    # b: 1/62 + 1/62 beats a and c at 1/61 each; a wins the tie by first seen
+    k = rc.settings.search.rrf_k
+    assert [r.url for r in out.processed] == ["https://b", "https://a"]
+    assert out.processed[0].score == pytest.approx(2 / (k + 2))
+    assert out.processed[1].score == pytest.approx(1 / (k + 1))
+
+    run = await get_run(session, out.run_id)
+    assert [r["url"] for r in run["processed"]] == ["https://b", "https://a"]
+    assert run["processed"][0]["score"] == pytest.approx(2 / (k + 2))
+    # Raw rows keep every URL the providers returned
+    raw = await get_raw_urls(session, [out.run_id])
+    assert len(raw[out.run_id]) == 5
+
 
 @pytest.mark.asyncio
 async def test_orchestrator_all_providers_failed(session):
@@ -85,3 +122,271 @@ async def test_orchestrator_all_providers_failed(session):
             session=session,
         )
 
+
+
+@dataclass
+class ShardRecordingAdapter:
+    name: str
+    calls: list[tuple[list[str], dict | None]]
+
+    async def search(self, schema, options=None):
+        from app.adapters.base import ProviderResult, build_query_from_schema
+
+        sites = list(schema.filters.sites)
+        self.calls.append((sites, options))
+        if sites == ["bad.example"]:
+            raise RuntimeError("shard failure")
+        urls = [f"https://{s}/page" for s in sites] + ["https://shared.example/"]
+        return ProviderResult(self.name, build_query_from_schema(schema, options), urls, {})
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_site_sharding_merges_sub_queries(session, caplog: pytest.LogCaptureFixture):
+    from sqlalchemy import select
+
+    from app.adapters.base import QueryLimits
+    from app.models import search_results_raw as t_raw, urls as t_urls
+
+    rc = load_runtime_config()
+    settings = rc.settings.model_copy(deep=True)
+    settings.search.site_sharding = True
+    sites = ["a.example", "b.example", "bad.example", "c.example"]
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={"sites": sites})
+    adapter = ShardRecordingAdapter(name="serper", calls=[])
+    # one site per OR-group
+    adapter.query_limits = QueryLimits(max_chars=40)  # type: ignore[attr-defined]
+
+    out = await orchestrate(
+        original_query="sharded",
+        rewritten_template="{}",
+        schema=schema,
+        config=settings,
+        adapters={"serper": adapter},
+        session=session,
+    )
+
+    assert sorted(c[0][0] for c in adapter.calls) == sorted(sites)
+    assert all(c[1] == {"site_join": "OR"} for c in adapter.calls)
+    urls = {p.url for p in out.processed}
+    assert urls == {
+        "https://a.example/page",
+        "https://b.example/page",
+        "https://c.example/page",
+        "https://shared.example/",  # deduped on its canonical form, stored as returned
+    }
+    queries = out.per_provider_queries_used["serper"]
+    assert len(queries) == 3 and all(q.count("site:") == 1 for q in queries)
+    assert out.per_provider_query_used["serper"] == queries[0]
+
+    # The lost group is logged and marked on the run; raw rows keep their group index
+    failed = [{"provider": "serper", "shard": 2, "sites": ["bad.example"]}]
+    assert out.failed_shards == failed
+    assert "serper shard 2/4 failed" in caplog.text
+    data = await get_run(session, out.run_id)
+    assert data is not None and data["run"]["config"]["failed_shards"] == failed
+    rows = await session.execute(
+        select(t_urls.c.url, t_raw.c.meta)
+        .join(t_urls, t_urls.c.id == t_raw.c.url_id)
+        .where(t_raw.c.run_id == out.run_id, t_urls.c.url.like("%/page"))
+    )
+    assert {url: meta["shard"] for url, meta in rows} == {
+        "https://a.example/page": 0,
+        "https://b.example/page": 1,
+        "https://c.example/page": 3,
+    }
+
+
+@dataclass
+class LocaleRecordingAdapter:
+    name: str
+    seen: list[tuple[str | None, str | None]]
+
+    async def search(self, schema, options=None):
+        from app.adapters.base import ProviderResult
+
+        lang, geo = schema.filters.lang, schema.filters.geo
+        self.seen.append((lang, geo))
+        urls = [f"https://{lang}-{geo}.example/", "https://common.example/"]
+        return ProviderResult(self.name, "q", urls, {})
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_locale_matrix_single_run(session):
+    from sqlalchemy import select
+
+    from app.core.schema import Locale
+    from app.models import search_results_raw as t_raw
+
+    rc = load_runtime_config()
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={"lang": "en"})
+    serper = LocaleRecordingAdapter(name="serper", seen=[])
+    google = LocaleRecordingAdapter(name="google", seen=[])
+    locales = [Locale(lang="en", geo="us"), Locale(lang="fr", geo="ca"), Locale(geo="gb")]
+
+    out = await orchestrate(
+        original_query="locales",
+        rewritten_template="{}",
+        schema=schema,
+        config=rc.settings,
+        adapters={"serper": serper, "google": google},
+        session=session,
+        locales=locales,
+    )
+
+    expected = [("en", "us"), ("fr", "ca"), ("en", "gb")]
+    assert sorted(serper.seen) == sorted(expected)
+    assert sorted(google.seen) == sorted(expected)
+    assert out.providers_used == ["serper", "google"]
+    proc = {p.url: p for p in out.processed}
+    assert len(proc) == 4
+    assert proc["https://common.example/"].confidence == 2
+
+    rows = (await session.execute(select(t_raw.c.meta).where(t_raw.c.run_id == out.run_id))).scalars().all()
+    assert len(rows) == 12
+    # The effective pair sent to the provider, not the partial locale requested
+    assert {(m["locale"]["lang"], m["locale"]["geo"]) for m in rows} == set(expected)
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_local_index_serves_previous_results(session):
+    from app.adapters.base import ProviderResult
+    from app.adapters.local_index import LocalIndexAdapter
+
+    @dataclass
+    class TitledAdapter:
+        name: str
+
+        async def search(self, schema, options=None):
+            return ProviderResult(
+                self.name,
+                "q",
+                ["https://docs.example/openai"],
+                {},
+                details=[{"title": "OpenAI docs", "snippet": None}],
+            )
+
+    rc = load_runtime_config()
+    schema = ProviderNeutralQuery(keywords=["openai"])
+    first = await orchestrate(
+        original_query="first",
+        rewritten_template="{}",
+        schema=schema,
+        config=rc.settings,
+        adapters={"serper": TitledAdapter("serper")},
+        session=session,
+    )
+    run = await get_run(session, first.run_id)
+    assert run is not None
+    # The index is refreshed out of band (config `local_index` / `app.cli index-refresh`)
+    from app.db.search_index import refresh_search_index
+
+    await refresh_search_index(session)
+
+    settings = rc.settings.model_copy(deep=True)
+    settings.search.cascade_order = ["local"]
+    second = await orchestrate(
+        original_query="second",
+        rewritten_template="{}",
+        schema=schema,
+        config=settings,
+        adapters={"local": LocalIndexAdapter(session_factory=get_session_factory())},
+        session=session,
+    )
+    assert second.providers_used == ["local"]
+    assert [p.url for p in second.processed] == ["https://docs.example/openai"]
+    # Rows the local index served are not folded back into it
+    assert await refresh_search_index(session) == 0
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_dedupes_on_canonical_urls_and_keeps_originals(session):
+    import orjson
+    from sqlalchemy import select
+
+    from app.db.novelty import get_novel_results
+    from app.db.url_stats import get_url_stats
+    from app.models import search_results_raw as t_raw, urls as t_urls
+
+    rc = load_runtime_config()
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={})
+    adapters = {
+        "serper": FakeAdapter(
+            "serper", ["https://other.example/a", "https://www.news.example/story/?utm_source=serper"], "q1"
+        ),
+        "google": FakeAdapter("google", ["http://m.news.example/story#top"], "q2"),
+        "brave": FakeAdapter("brave", ["https://other.example/b", "https://news.example/story"], "q3"),
+    }
+    out = await orchestrate(
+        original_query="canonical",
+        rewritten_template="{}",
+        schema=schema,
+        config=rc.settings,
+        adapters=adapters,
+        session=session,
+    )
+
+    # Deduped on the canonical form; the row keeps the best-ranked URL a provider returned
+    (story,) = [p for p in out.processed if p.confidence == 3]
+    assert story.url == "http://m.news.example/story#top"
+    assert story.canonical_url == "https://news.example/story"
+    assert story.dedupe_hash == dedupe_key("https://news.example/story")
+    data = await get_run(session, out.run_id)
+    assert "http://m.news.example/story#top" in [p["url"] for p in data["processed"]]
+    assert "https://news.example/story" not in [p["url"] for p in data["processed"]]
+    snap = orjson.loads(await get_run_snapshot(session, out.run_id))
+    assert snap["processed"][0]["url"] == "http://m.news.example/story#top"
+    # Stats and novelty stay per canonical URL
+    stats = await get_url_stats(session, url="https://news.example/story")
+    assert stats is not None and stats["last_run_id"] == out.run_id
+    novel = [r["url"] for r in await get_novel_results(session, out.run_id)]
+    assert "http://m.news.example/story#top" in novel
+
+    raw = (
+        await session.execute(
+            select(t_urls.c.url, t_raw.c.meta)
+            .join(t_urls, t_urls.c.id == t_raw.c.url_id)
+            .where(t_raw.c.run_id == out.run_id, t_urls.c.url.like("%news.example%"))
+            .order_by(t_raw.c.provider)
+        )
+    ).all()
+    assert [r.url for r in raw] == [
+        "https://news.example/story",
+        "http://m.news.example/story#top",
+        "https://www.news.example/story/?utm_source=serper",
+    ]
+    assert [r.meta.get("canonicalUrl") for r in raw] == [None, "https://news.example/story", "https://news.example/story"]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_flags_urls_novel_per_normalized_query(session):
+    import os
+
+    from app.db.novelty import get_novel_results
+
+    rc = load_runtime_config()
+    schema = ProviderNeutralQuery(keywords=["openai"])
+    query = f"Novelty {os.urandom(4).hex()}"
+
+    async def run(q: str, urls: list[str]):
+        return await orchestrate(
+            original_query=q,
+            rewritten_template="{}",
+            schema=schema,
+            config=rc.settings,
+            adapters={"serper": FakeAdapter(name="serper", urls=urls, query_used="q")},
+            session=session,
+        )
+
+    first = await run(query, ["https://n.example/a", "https://n.example/b"])
+    assert all(p.novel for p in first.processed)
+    # Same query modulo case/whitespace: only the unseen URL is novel
+    second = await run(f"  {query.upper()} ", ["https://n.example/b", "https://n.example/c"])
+    assert {p.url: p.novel for p in second.processed} == {
+        "https://n.example/b": False,
+        "https://n.example/c": True,
+    }
+    assert [r["url"] for r in await get_novel_results(session, second.run_id)] == ["https://n.example/c"]
+    # A different query has its own history
+    other = await run(f"{query} other", ["https://n.example/a"])
+    assert other.processed[0].novel
+    assert await get_novel_results(session, 10**9) is None
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.cli import main as cli_main
+from app.config import SearchSettings
+from app.core.hashing import dedupe_key, url_hash
+from app.core.reprocess import reprocess_run, reprocess_runs
+from app.db.queries import (
+    bulk_insert_processed,
+    bulk_insert_raw,
+    get_run,
+    get_run_snapshot,
+    init_models,
+    insert_search_run,
+)
+from app.db.retention import compact_raw
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'reprocess.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+async def _run(session: AsyncSession, raw: list[tuple[str, str]] | None) -> int:
+    """A run stored before canonicalization: one processed row per raw URL as returned."""
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper", "google"])
+    if raw is not None:
+        await bulk_insert_raw(
+            session, run_id, ({"provider": p, "url": u, "rank": 1, "meta": {}} for p, u in raw)
+        )
+    await bulk_insert_processed(
+        session,
+        run_id,
+        (
+            {"url": u, "providers": [p], "confidence": 1, "dedupe_hash": dedupe_key(u)}
+            for p, u in (raw or [("serper", "https://orphan")])
+        ),
+    )
+    return run_id
+
+
+_RAW = [
+    ("serper", "https://www.a.example/?utm_source=x"),
+    ("google", "https://a.example"),
+    ("google", "https://b.example/"),
+]
+
+
+@pytest.mark.asyncio
+async def test_reprocess_run_applies_current_merge(session: AsyncSession):
+    run_id = await _run(session, _RAW)
+
+    body = await reprocess_run(session, run_id, SearchSettings())
+    assert body is not None
+    data = await get_run(session, run_id)
+    assert data is not None
+    got = [(p["url"], p["providers"], p["confidence"]) for p in data["processed"]]
+    # Merged on the canonical form; rows keep a URL as returned (rank tie: first seen)
+    assert got == [
+        ("https://www.a.example/?utm_source=x", ["google", "serper"], 2),
+        ("https://b.example/", ["google"], 1),
+    ]
+    assert data["processed"][0]["dedupe_hash"] == dedupe_key("https://a.example")
+    # The stored snapshot is the new body
+    assert await get_run_snapshot(session, run_id) == body
+    items = json.loads(body)["processed"]
+    assert [p["url"] for p in items] == ["https://www.a.example/?utm_source=x", "https://b.example/"]
+    assert items[0]["dedupe_hash"] == dedupe_key("https://a.example").hex()
+    assert items[0]["legacy_dedupe_hash"] == url_hash("https://www.a.example/?utm_source=x")
+
+    assert await reprocess_run(session, 424242, SearchSettings()) is None
+
+
+@pytest.mark.asyncio
+async def test_reprocess_runs_batches_uses_archive_and_skips_purged(session: AsyncSession):
+    archived = await _run(session, _RAW)
+    await compact_raw(session, datetime(2999, 1, 1))
+    live = await _run(session, [("brave", "https://m.c.example/")])
+    bare = await _run(session, None)
+    untouched = await _run(session, [("serper", "https://www.d.example")])
+
+    report = await reprocess_runs(session, SearchSettings(), run_min=archived, run_max=bare, batch_size=2)
+    assert (report.runs_reprocessed, report.runs_skipped) == (2, 1)
+
+    async def urls(run_id: int) -> list[str]:
+        data = await get_run(session, run_id)
+        assert data is not None
+        return [p["url"] for p in data["processed"]]
+
+    assert await urls(archived) == ["https://www.a.example/?utm_source=x", "https://b.example/"]
+    assert await urls(live) == ["https://m.c.example/"]
+    assert await urls(bare) == ["https://orphan"]  # left as it was
+    assert await urls(untouched) == ["https://www.d.example"]  # outside the range
+
+
+def test_cli_reprocess_prints_report(tmp_path, monkeypatch: pytest.MonkeyPatch, capsys):
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'cli.sqlite3'}")
+    monkeypatch.setattr("app.db.session._engine", None)
+    monkeypatch.setattr("app.db.session._session_factory", None)
+
+    async def seed() -> None:
+        from app.db.session import get_engine, get_session_factory
+
+        async with get_session_factory()() as s:
+            await init_models(s)
+            await _run(s, _RAW)
+        await get_engine().dispose()
+
+    asyncio.run(seed())
+    cli_main(["reprocess", "--batch-size", "10"])
+    assert json.loads(capsys.readouterr().out) == {"runs_reprocessed": 1, "runs_skipped": 0}
+
+
+@pytest.mark.asyncio
+async def test_reprocess_keeps_row_ids_and_moves_stats_and_novelty(session: AsyncSession):
+    from app.adapters.base import ProviderResult
+    from app.config import CanonicalizationSettings, load_runtime_config
+    from app.core.orchestrator import orchestrate
+    from app.core.schema import ProviderNeutralQuery
+    from app.db.feed import read_feed
+    from app.db.novelty import get_novel_results
+    from app.db.url_stats import get_url_stats
+
+    class Adapter:
+        async def search(self, schema, options=None):
+            return ProviderResult("serper", "q", ["https://www.a.example/x/", "https://a.example/x"], {})
+
+    config = load_runtime_config().settings
+    config.search.canonicalization = CanonicalizationSettings(enabled=False)
+    out = await orchestrate(
+        original_query="moves",
+        rewritten_template="{}",
+        schema=ProviderNeutralQuery(keywords=["moves"], filters={}),
+        config=config,
+        adapters={"serper": Adapter()},
+        session=session,
+    )
+    before = await get_run(session, out.run_id)
+    assert before is not None and len(before["processed"]) == 2
+    seq = (await read_feed(session, 0, 100))[-1]["seq"]
+
+    # Canonicalization on: both URLs fold into https://a.example/x
+    assert await reprocess_run(session, out.run_id, SearchSettings()) is not None
+    after = await get_run(session, out.run_id)
+    assert after is not None
+    (row,) = after["processed"]
+    assert row["url"] == "https://www.a.example/x/"  # best ranked original
+    # The row whose dedupe_hash survived was updated in place, not re-inserted
+    assert row["id"] == before["processed"][1]["id"]
+    assert row["dedupe_hash"] == dedupe_key("https://a.example/x")
+    assert await read_feed(session, seq, 100) == []
+
+    # The run no longer counts towards the URL it dropped as a canonical form
+    assert await get_url_stats(session, url="https://www.a.example/x/") is None
+    kept = await get_url_stats(session, url="https://a.example/x")
+    assert kept is not None and (kept["run_count"], kept["last_run_id"]) == (1, out.run_id)
+    novel = await get_novel_results(session, out.run_id)
+    assert [r["url"] for r in novel] == ["https://www.a.example/x/"]
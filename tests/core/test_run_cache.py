@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app.core.run_cache import RunCache, etag_matches, strong_etag
+
+
+def test_run_cache_evicts_least_recently_used():
+    cache = RunCache(max_entries=2)
+    cache.put(1, b"1")
+    cache.put(2, b"2")
+    assert cache.get(1) is not None  # 1 is now most recent
+    cache.put(3, b"3")
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert len(cache) == 2
+
+
+def test_run_cache_disabled_still_builds_entries():
+    cache = RunCache(max_entries=0)
+    entry = cache.put(1, b'{"id":1}')
+    assert entry.etag == strong_etag(entry.body)
+    assert cache.get(1) is None
+
+
+def test_etag_matches():
+    tag = strong_etag(b"{}")
+    assert etag_matches(tag, tag)
+    assert etag_matches(f'"a", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches(None, tag)
+    assert not etag_matches('"a"', tag)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.db.bulk as bulk
+from app.db.queries import init_models, insert_search_run, write_processed_records, write_raw_records
+from app.models import search_results_processed as t_processed, search_results_raw as t_raw
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'bulk.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_streamed_records_round_trip_json_in_chunks(session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(bulk, "SQLITE_CHUNK", 2)
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+
+    def records():
+        for i in range(5):
+            yield "serper", f"https://x/{i}", i + 1, {"queryUsed": "q", "locale": {"lang": "en"}}
+
+    assert await write_raw_records(session, run_id, records(), commit=False) == 5
+    assert await write_processed_records(
+        session, run_id, [("https://x/0", ["brave", "serper"], 2, "h0", 0.5)], commit=False
+    ) == 1
+    await session.commit()
+
+    raw = (await session.execute(select(t_raw).order_by(t_raw.c.rank))).mappings().all()
+    assert [r["rank"] for r in raw] == [1, 2, 3, 4, 5]
+    assert raw[0]["meta"] == {"queryUsed": "q", "locale": {"lang": "en"}}
+    assert raw[0]["inserted_at"] is not None
+    proc = (await session.execute(select(t_processed))).mappings().one()
+    assert proc["providers"] == ["brave", "serper"]
+    assert proc["score"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_rows_share_the_callers_transaction(session: AsyncSession):
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await write_raw_records(session, run_id, [("serper", "https://a", 1, None)], commit=False)
+    await session.rollback()
+    assert (await session.execute(select(t_raw))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_constraint_violations_surface_as_integrity_error(session: AsyncSession):
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"])
+    with pytest.raises(IntegrityError):
+        await write_processed_records(
+            session, run_id, [("https://a", ["serper"], 1, "dup", None), ("https://b", ["serper"], 1, "dup", None)]
+        )
+
+
+@pytest.mark.asyncio
+async def test_upsert_urls_inserts_only_unknown_urls_and_returns_their_ids(session: AsyncSession):
+    from sqlalchemy import event
+
+    from app.db.urls import upsert_urls
+    from app.models import urls as t_urls
+
+    first = await upsert_urls(session, ["https://a", "https://b"])
+    statements: list[str] = []
+    engine = session.get_bind()
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        known = await upsert_urls(session, ["https://a", "https://b"])
+        mixed = await upsert_urls(session, ["https://b", "https://c"])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    await session.commit()
+
+    # Known URLs cost one lookup and no write; new ones come back from the insert
+    assert statements == ["SELECT", "SELECT", "INSERT"]
+    assert known == first
+    stored = dict((await session.execute(select(t_urls.c.url, t_urls.c.id))).tuples().all())
+    assert mixed == {"https://b": stored["https://b"], "https://c": stored["https://c"]}
+
+
+@pytest.mark.asyncio
+async def test_mark_novel_returns_only_ids_its_own_insert_created(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+):
+    from sqlalchemy import Select, event, false
+
+    from app.db.novelty import mark_novel
+    from app.db.urls import upsert_urls
+
+    ids = await upsert_urls(session, ["https://a", "https://b", "https://c"])
+    a, b, c = ids["https://a"], ids["https://b"], ids["https://c"]
+    run1 = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    run2 = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    # Another transaction committed a and b first
+    assert await mark_novel(session, b"k" * 8, run1, [a, b]) == {a, b}
+    await session.commit()
+
+    # ...after this run's probe had read: the probe misses b
+    execute = session.execute
+
+    async def stale_probe(stmt, *args, **kwargs):
+        if isinstance(stmt, Select):
+            stmt = stmt.where(false())
+        return await execute(stmt, *args, **kwargs)
+
+    monkeypatch.setattr(session, "execute", stale_probe)
+    novel = await mark_novel(session, b"k" * 8, run2, [b, c, c])
+    monkeypatch.undo()
+    # The ignored conflict, not the probe, keeps b from counting as novel
+    assert novel == {c}
+    assert await mark_novel(session, b"j" * 8, run2, [b]) == {b}  # per query key
+
+    statements: list[str] = []
+    engine = session.get_bind()
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert await mark_novel(session, b"k" * 8, run2, [a, b, c]) == set()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # A repeat run reads; it attempts no conflicting inserts
+    assert statements == ["SELECT"]
+
+
+@pytest.mark.asyncio
+async def test_upsert_urls_inserts_keys_in_sorted_order(session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    from app.core.hashing import url_key
+    from app.db.urls import upsert_urls
+
+    urls = [f"https://{c}" for c in "abcdef"]
+    inserted: list[bytes] = []
+    execute = session.execute
+
+    async def record(stmt, params=None, *args, **kwargs):
+        if isinstance(params, list):
+            inserted.extend(p["url_hash"] for p in params)
+        return await execute(stmt, params, *args, **kwargs)
+
+    monkeypatch.setattr(session, "execute", record)
+    ids = await upsert_urls(session, urls)
+    # Every writer takes the unique-index entries in the same order
+    assert inserted == sorted(url_key(u) for u in urls)
+    assert set(ids) == set(urls)
+
+
+@pytest.mark.asyncio
+async def test_mark_novel_inserts_ids_in_sorted_order(session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    from app.db.novelty import mark_novel
+    from app.db.urls import upsert_urls
+
+    ids = await upsert_urls(session, ["https://a", "https://b", "https://c"])
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    inserted: list[int] = []
+    execute = session.execute
+
+    async def record(stmt, params=None, *args, **kwargs):
+        if isinstance(params, list):
+            inserted.extend(p["url_id"] for p in params)
+        return await execute(stmt, params, *args, **kwargs)
+
+    monkeypatch.setattr(session, "execute", record)
+    # Score order, with a repeat
+    order = [ids["https://c"], ids["https://a"], ids["https://c"], ids["https://b"]]
+    assert await mark_novel(session, b"k" * 8, run_id, order) == set(ids.values())
+    assert inserted == sorted(ids.values())
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.hashing import dedupe_key
+from app.db.diff import iter_run_diff, missing_runs
+from app.db.queries import bulk_insert_processed, init_models, insert_search_run
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'diff.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+async def _run(session: AsyncSession, confidences: dict[str, int]) -> int:
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"])
+    await bulk_insert_processed(
+        session,
+        run_id,
+        (
+            {"url": u, "providers": ["serper"], "confidence": c, "dedupe_hash": dedupe_key(u)}
+            for u, c in confidences.items()
+        ),
+    )
+    return run_id
+
+
+@pytest.mark.asyncio
+async def test_iter_run_diff_streams_in_batches(session: AsyncSession):
+    a = await _run(session, {f"https://r{i}": 1 for i in range(5)} | {"https://kept": 1})
+    b = await _run(session, {"https://kept": 3, "https://new": 1})
+
+    batches = [(kind, rows) async for kind, rows in iter_run_diff(session, a, b, batch_size=2)]
+    assert [kind for kind, _ in batches] == ["added", "removed", "removed", "removed", "changed"]
+    removed = [r["url"] for kind, rows in batches if kind == "removed" for r in rows]
+    assert removed == [f"https://r{i}" for i in range(5)]
+    assert batches[-1][1] == [
+        {
+            "url": "https://kept",
+            "confidence_a": 1,
+            "confidence_b": 3,
+            "providers_a": ["serper"],
+            "providers_b": ["serper"],
+        }
+    ]
+    assert [batch async for batch in iter_run_diff(session, b, b)] == []
+    assert await missing_runs(session, a, 424242, b) == [424242]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.cli import main as cli_main
+from app.core.export import Batches, ExportFormatUnavailable, check_export_format, encode_export
+from app.core.hashing import dedupe_key
+from app.db.export import EXPORT_COLUMNS, iter_export_batches
+from app.db.queries import bulk_insert_processed, init_models, insert_search_run
+from app.models import search_runs
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'export.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+async def _run(session: AsyncSession, when: datetime, urls: list[str]) -> int:
+    run_id = await insert_search_run(session, f"q{when:%m}", "{}", {}, ["serper"])
+    await session.execute(update(search_runs).where(search_runs.c.id == run_id).values(run_timestamp=when))
+    await bulk_insert_processed(
+        session,
+        run_id,
+        (
+            {"url": u, "providers": ["serper", "brave"], "confidence": 2, "dedupe_hash": dedupe_key(u)}
+            for u in urls
+        ),
+    )
+    return run_id
+
+
+async def _collect(fmt: str, batches: Batches) -> bytes:
+    return b"".join([c async for c in encode_export(fmt, batches, EXPORT_COLUMNS)])
+
+
+@pytest.mark.asyncio
+async def test_export_filters_and_batches(session: AsyncSession):
+    jan = await _run(session, datetime(2025, 1, 10), ["https://a", "https://b", "https://c"])
+    feb = await _run(session, datetime(2025, 2, 10), ["https://d"])
+
+    batches = [b async for b in iter_export_batches(session, batch_size=2)]
+    assert [len(b) for b in batches] == [2, 2]
+    assert batches[0][0]["run_id"] == jan and tuple(batches[0][0]) == EXPORT_COLUMNS
+
+    by_time = [b async for b in iter_export_batches(session, from_=datetime(2025, 2, 1))]
+    assert [r["url"] for b in by_time for r in b] == ["https://d"]
+    by_id = [b async for b in iter_export_batches(session, run_min=jan, run_max=jan)]
+    assert [r["run_id"] for b in by_id for r in b] == [jan] * 3
+    assert [b async for b in iter_export_batches(session, run_min=feb + 1)] == []
+
+
+@pytest.mark.asyncio
+async def test_export_encodings(session: AsyncSession):
+    await _run(session, datetime(2025, 1, 10), ["https://a", "https://b"])
+
+    lines = (await _collect("ndjson", iter_export_batches(session, batch_size=1))).decode().splitlines()
+    first = json.loads(lines[0])
+    assert len(lines) == 2
+    assert first["run_timestamp"] == "2025-01-10T00:00:00"
+    assert first["dedupe_hash"] == dedupe_key("https://a").hex()
+    assert first["providers"] == ["serper", "brave"]
+
+    text = (await _collect("csv", iter_export_batches(session, batch_size=1))).decode()
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [r["url"] for r in rows] == ["https://a", "https://b"]
+    assert rows[0]["providers"] == "serper;brave"
+    # Header only when nothing matches
+    empty = await _collect("csv", iter_export_batches(session, run_min=999))
+    assert empty.decode() == ",".join(EXPORT_COLUMNS) + "\n"
+
+    with pytest.raises(ValueError):
+        check_export_format("xml")
+
+
+@pytest.mark.asyncio
+async def test_export_parquet(session: AsyncSession):
+    try:
+        check_export_format("parquet")
+    except ExportFormatUnavailable:
+        pytest.skip("pyarrow not installed")
+    import pyarrow.parquet as pq
+
+    await _run(session, datetime(2025, 1, 10), ["https://a", "https://b", "https://c"])
+    data = await _collect("parquet", iter_export_batches(session, batch_size=2))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column("url").to_pylist() == ["https://a", "https://b", "https://c"]
+    assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == 2
+
+
+def test_cli_export_writes_file(tmp_path, monkeypatch: pytest.MonkeyPatch, capsys):
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'cli.sqlite3'}")
+    monkeypatch.setattr("app.db.session._engine", None)
+    monkeypatch.setattr("app.db.session._session_factory", None)
+
+    async def seed() -> None:
+        from app.db.session import get_engine, get_session_factory
+
+        async with get_session_factory()() as s:
+            await init_models(s)
+            await _run(s, datetime(2025, 1, 10), ["https://x", "https://y"])
+        await get_engine().dispose()
+
+    asyncio.run(seed())
+    out = tmp_path / "out.ndjson"
+    cli_main(["export", "--format", "ndjson", "--from", "2025-01-01T00:00:00+00:00", "--out", str(out)])
+    assert json.loads(capsys.readouterr().out) == {"rows": 2, "path": str(out)}
+    assert [json.loads(line)["url"] for line in out.read_text().splitlines()] == ["https://x", "https://y"]
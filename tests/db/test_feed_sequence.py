@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.hashing import dedupe_key
+from app.db.feed import read_feed
+from app.db.queries import (
+    bulk_insert_processed,
+    init_models,
+    insert_search_run,
+    stamp_run_committed,
+)
+
+
+@pytest_asyncio.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'feed.sqlite3'}")
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with Session() as s:
+        await init_models(s)
+    yield Session
+    await engine.dispose()
+
+
+async def _write(session: AsyncSession, urls: list[str]) -> int:
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await bulk_insert_processed(
+        session,
+        run_id,
+        [
+            {"url": u, "providers": ["serper"], "confidence": 1, "dedupe_hash": dedupe_key(u)}
+            for u in urls
+        ],
+        commit=False,
+    )
+    return run_id
+
+
+@pytest.mark.asyncio
+async def test_feed_serves_runs_in_commit_order_not_id_order(factory):
+    # Writer A takes the lower row ids but commits after writer B. SQLite has one
+    # writer at a time, so A's rows are flushed unstamped, as an in-flight run's
+    # rows look to Postgres readers once their ids are taken
+    async with factory() as a, factory() as b, factory() as reader:
+        run_a = await _write(a, ["https://a/1", "https://a/2"])
+        await a.commit()
+        run_b = await _write(b, ["https://b/1"])
+        await stamp_run_committed(b, run_b)
+        await b.commit()
+
+        first = await read_feed(reader, 0, 100)
+        assert [r["run_id"] for r in first] == [run_b]
+        cursor = first[-1]["seq"]
+
+        await stamp_run_committed(a, run_a)
+        await a.commit()
+        # An id cursor past B's rows would skip A's lower ids for good
+        assert first[-1]["id"] > 2
+        second = await read_feed(reader, cursor, 100)
+        assert [r["url"] for r in second] == ["https://a/1", "https://a/2"]
+        assert {r["seq"] for r in second} == {cursor + 1}
+        assert await read_feed(reader, second[-1]["seq"], 100) == []
+
+
+@pytest.mark.asyncio
+async def test_feed_limit_finishes_the_last_run(factory):
+    async with factory() as s:
+        runs = []
+        for n in (3, 2):
+            runs.append(run_id := await _write(s, [f"https://r{n}/{i}" for i in range(n)]))
+            await stamp_run_committed(s, run_id)
+            await s.commit()
+
+        page = await read_feed(s, 0, 2)
+        assert [r["run_id"] for r in page] == [runs[0]] * 3
+        page = await read_feed(s, page[-1]["seq"], 2)
+        assert [r["run_id"] for r in page] == [runs[1]] * 2
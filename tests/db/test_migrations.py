@@ -32,3 +32,430 @@ async def test_alembic_initial_migration_creates_tables(tmp_path: Path):
     finally:
         engine.dispose()
 
+
+
+_PRE_0003_SCHEMA = [
+    "CREATE TABLE search_runs (id INTEGER PRIMARY KEY, query TEXT NOT NULL, rewritten_template TEXT NOT NULL, "
+    "run_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, config JSON NOT NULL, providers_used JSON NOT NULL)",
+    "CREATE TABLE search_results_raw (id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL REFERENCES search_runs(id) "
+    "ON DELETE CASCADE, provider VARCHAR(50) NOT NULL, url TEXT NOT NULL, rank INTEGER, meta JSON, "
+    "inserted_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE INDEX ix_raw_run_provider ON search_results_raw (run_id, provider)",
+    "CREATE TABLE search_results_processed (id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL REFERENCES "
+    "search_runs(id) ON DELETE CASCADE, url TEXT NOT NULL, providers JSON NOT NULL, confidence INTEGER NOT NULL, "
+    "dedupe_hash TEXT NOT NULL, inserted_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+    "CONSTRAINT uq_processed_run_dedupe UNIQUE (run_id, dedupe_hash))",
+    "INSERT INTO search_runs (id, query, rewritten_template, config, providers_used) VALUES (1, 'q', '{}', '{}', '[]')",
+    "INSERT INTO search_results_raw (run_id, provider, url, rank) VALUES "
+    "(1, 'serper', 'https://a', 1), (1, 'google', 'https://a', 1), (1, 'google', 'https://b', 2)",
+    "INSERT INTO search_results_processed (run_id, url, providers, confidence, dedupe_hash) VALUES "
+    "(1, 'https://a', '[\"google\",\"serper\"]', 2, 'ha'), (1, 'https://b', '[\"google\"]', 1, 'hb')",
+]
+
+
+def test_urls_migration_backfills_and_drops_inline_url_columns(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0003.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "0003_urls")
+
+        insp = inspect(engine)
+        for table in ("search_results_raw", "search_results_processed"):
+            cols = {c["name"] for c in insp.get_columns(table)}
+            assert "url_id" in cols and "url" not in cols
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM urls").scalar() == 2
+            rows = conn.exec_driver_sql(
+                "SELECT r.provider, u.url FROM search_results_raw r JOIN urls u ON u.id = r.url_id ORDER BY r.id"
+            ).all()
+            assert rows == [("serper", "https://a"), ("google", "https://a"), ("google", "https://b")]
+            assert conn.exec_driver_sql(
+                "SELECT u.url FROM search_results_processed p JOIN urls u ON u.id = p.url_id "
+                "WHERE p.dedupe_hash = 'hb'"
+            ).scalar() == "https://b"
+
+        command.downgrade(cfg, "0002_url_index")
+        insp = inspect(engine)
+        assert "urls" not in insp.get_table_names()
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT url FROM search_results_raw ORDER BY id").scalars().all() == [
+                "https://a",
+                "https://a",
+                "https://b",
+            ]
+    finally:
+        engine.dispose()
+
+
+def test_dedupe_hash_migration_switches_to_binary_digest(tmp_path: Path):
+    from app.core.hashing import dedupe_key, url_hash
+
+    url = f"sqlite:///{tmp_path / 'pre_0004.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+
+        sql = (
+            "SELECT u.url, p.dedupe_hash FROM search_results_processed p "
+            "JOIN urls u ON u.id = p.url_id ORDER BY p.id"
+        )
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql).all()
+        assert rows == [("https://a", dedupe_key("https://a")), ("https://b", dedupe_key("https://b"))]
+        uniques = inspect(engine).get_unique_constraints("search_results_processed")
+        assert any(u["column_names"] == ["run_id", "dedupe_hash"] for u in uniques)
+
+        command.downgrade(cfg, "0003_urls")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(sql).all()[0][1] == url_hash("https://a")
+    finally:
+        engine.dispose()
+
+
+def test_run_listing_migration_backfills_query_hash_and_indexes(tmp_path: Path):
+    from app.core.hashing import query_key
+
+    url = f"sqlite:///{tmp_path / 'pre_0005.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+
+        with engine.connect() as conn:
+            h, ts = conn.exec_driver_sql("SELECT query_hash, run_timestamp FROM search_runs").one()
+        assert h == query_key("q")
+        assert len(ts) == len("2025-01-01 00:00:00.000000")
+        names = {i["name"] for i in inspect(engine).get_indexes("search_runs")}
+        assert {"ix_runs_timestamp_id", "ix_runs_query_hash_timestamp_id"} <= names
+
+        command.downgrade(cfg, "0004_binary_dedupe_hash")
+        insp = inspect(engine)
+        assert "query_hash" not in {c["name"] for c in insp.get_columns("search_runs")}
+        assert not {i["name"] for i in insp.get_indexes("search_runs")} & names
+    finally:
+        engine.dispose()
+
+
+def test_snapshot_migration_adds_nullable_column(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0006.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+        cols = {c["name"]: c for c in inspect(engine).get_columns("search_runs")}
+        assert cols["snapshot"]["nullable"]
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT snapshot FROM search_runs").scalar() is None
+
+        command.downgrade(cfg, "0005_run_listing_indexes")
+        assert "snapshot" not in {c["name"] for c in inspect(engine).get_columns("search_runs")}
+    finally:
+        engine.dispose()
+
+
+def test_raw_retention_migration_creates_archive_table(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0007.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+        assert "search_raw_archive" in inspect(engine).get_table_names()
+
+        command.downgrade(cfg, "0006_run_snapshot")
+        assert "search_raw_archive" not in inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+
+
+def test_url_stats_migration_backfills_from_processed_rows(tmp_path: Path):
+    from app.core.providers import provider_mask
+
+    url = f"sqlite:///{tmp_path / 'pre_0008.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT u.url, s.run_count, s.provider_mask, s.last_run_id FROM url_stats s "
+                "JOIN urls u ON u.id = s.url_id ORDER BY u.url"
+            ).all()
+        assert rows == [
+            ("https://a", 1, provider_mask(["google", "serper"]), 1),
+            ("https://b", 1, provider_mask(["google"]), 1),
+        ]
+
+        command.downgrade(cfg, "0007_raw_retention")
+        assert "url_stats" not in inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+
+
+def test_query_urls_migration_records_first_run_per_query(tmp_path: Path):
+    from app.db.novelty import novelty_key
+
+    url = f"sqlite:///{tmp_path / 'pre_0009.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+            # A later run of the same query (different case) repeating https://a
+            conn.exec_driver_sql(
+                "INSERT INTO search_runs (id, query, rewritten_template, config, providers_used) "
+                "VALUES (2, 'Q', '{}', '{}', '[]')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO search_results_processed (run_id, url, providers, confidence, dedupe_hash) "
+                "VALUES (2, 'https://a', '[\"serper\"]', 1, 'ha')"
+            )
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT q.query_hash, u.url, q.first_run_id FROM query_urls q "
+                "JOIN urls u ON u.id = q.url_id ORDER BY u.url"
+            ).all()
+        assert rows == [(novelty_key("q"), "https://a", 1), (novelty_key("q"), "https://b", 1)]
+
+        command.downgrade(cfg, "0008_url_stats")
+        assert "query_urls" not in inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+
+
+def test_provider_payloads_migration_creates_archive_tables(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0010.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+        tables = inspect(engine).get_table_names()
+        assert {"provider_payloads", "run_payloads"} <= set(tables)
+
+        command.downgrade(cfg, "0009_query_urls")
+        tables = inspect(engine).get_table_names()
+        assert "provider_payloads" not in tables and "run_payloads" not in tables
+    finally:
+        engine.dispose()
+
+
+def test_processed_score_migration_adds_nullable_column(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0011.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "head")
+        cols = {c["name"]: c for c in inspect(engine).get_columns("search_results_processed")}
+        assert cols["score"]["nullable"]
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT score FROM search_results_processed").scalar() is None
+
+        command.downgrade(cfg, "0010_provider_payloads")
+        cols = {c["name"] for c in inspect(engine).get_columns("search_results_processed")}
+        assert "score" not in cols and "dedupe_hash" in cols
+    finally:
+        engine.dispose()
+
+
+def test_commit_seq_migration_backfills_runs_and_moves_index_watermark(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0012.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "0011_processed_score")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO search_runs (id, query, query_hash, rewritten_template, config, providers_used) "
+                "VALUES (2, 'q2', x'00', '{}', '{}', '[]')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO search_results_raw (run_id, provider, url_id, rank) VALUES (2, 'serper', 1, 1)"
+            )
+            # Raw rows of run 1 (ids 1-3) were indexed, run 2 was not
+            conn.exec_driver_sql("CREATE TABLE url_index_state (source VARCHAR(50) PRIMARY KEY, last_id INTEGER)")
+            conn.exec_driver_sql("INSERT INTO url_index_state (source, last_id) VALUES ('raw', 3)")
+        command.upgrade(cfg, "head")
+
+        with engine.connect() as conn:
+            runs = conn.exec_driver_sql("SELECT id, commit_seq FROM search_runs ORDER BY id").all()
+            assert runs == [(1, 1), (2, 2)]
+            assert conn.exec_driver_sql("SELECT value FROM commit_sequence").scalar() == 2
+            state = conn.exec_driver_sql("SELECT source, last_id FROM url_index_state").all()
+            assert state == [("runs", 1)]
+
+        command.downgrade(cfg, "0011_processed_score")
+        assert "commit_sequence" not in inspect(engine).get_table_names()
+        assert "commit_seq" not in {c["name"] for c in inspect(engine).get_columns("search_runs")}
+    finally:
+        engine.dispose()
+
+
+def test_dedupe_hash_migration_derives_digest_from_url_key(tmp_path: Path):
+    import hashlib
+
+    from app.core.hashing import url_key
+
+    url = f"sqlite:///{tmp_path / 'pre_0013.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "0012_commit_seq")
+        query = (
+            "SELECT u.url, p.dedupe_hash FROM search_results_processed p "
+            "JOIN urls u ON u.id = p.url_id ORDER BY u.url"
+        )
+        with engine.begin() as conn:
+            # Rows as written before 0013: a separate 8-byte digest
+            for u in ("https://a", "https://b"):
+                conn.exec_driver_sql(
+                    "UPDATE search_results_processed SET dedupe_hash = ? "
+                    "WHERE url_id = (SELECT id FROM urls WHERE url = ?)",
+                    (hashlib.blake2b(u.encode(), digest_size=8).digest(), u),
+                )
+        command.upgrade(cfg, "head")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(query).all() == [
+                ("https://a", url_key("https://a")[:8]),
+                ("https://b", url_key("https://b")[:8]),
+            ]
+
+        command.downgrade(cfg, "0012_commit_seq")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(query).all()[0] == (
+                "https://a",
+                hashlib.blake2b(b"https://a", digest_size=8).digest(),
+            )
+    finally:
+        engine.dispose()
+
+
+def test_url_index_migration_keys_rows_on_urls(tmp_path: Path):
+    from app.core.hashing import url_hash
+
+    url = f"sqlite:///{tmp_path / 'pre_0014.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "0013_dedupe_from_url_key")
+        with engine.begin() as conn:
+            # url_index as 0002 created it: its own copy of each URL, keyed by SHA-1 hex
+            conn.exec_driver_sql(
+                "CREATE TABLE url_index (id INTEGER PRIMARY KEY, url_hash VARCHAR(64) NOT NULL UNIQUE, "
+                "url TEXT NOT NULL, title TEXT, snippet TEXT, seen_count INTEGER DEFAULT 0 NOT NULL, "
+                "last_run_id INTEGER, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO url_index (id, url_hash, url, title, seen_count, last_run_id) VALUES "
+                "(7, 'x', 'https://a', 'Alpha page', 2, 1), (8, 'y', 'https://gone', 'Orphan text', 1, 1)"
+            )
+            conn.exec_driver_sql("CREATE VIRTUAL TABLE url_index_fts USING fts5(title, snippet, url)")
+            conn.exec_driver_sql("INSERT INTO url_index_fts(rowid, title, url) SELECT id, title, url FROM url_index")
+        command.upgrade(cfg, "head")
+
+        with engine.connect() as conn:
+            assert "url_hash" not in {c["name"] for c in inspect(engine).get_columns("url_index")}
+            rows = conn.exec_driver_sql(
+                "SELECT u.url, i.title, i.seen_count FROM url_index i JOIN urls u ON u.id = i.url_id ORDER BY u.url"
+            ).all()
+            # A URL with no urls row gets one
+            assert rows == [("https://a", "Alpha page", 2), ("https://gone", "Orphan text", 1)]
+            hit = conn.exec_driver_sql(
+                "SELECT u.url FROM url_index_fts f JOIN urls u ON u.id = f.rowid WHERE url_index_fts MATCH 'alpha'"
+            ).all()
+            assert hit == [("https://a",)]
+
+        command.downgrade(cfg, "0013_dedupe_from_url_key")
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT url, url_hash, title FROM url_index ORDER BY url").all()
+            assert rows[0] == ("https://a", url_hash("https://a"), "Alpha page")
+            hit = conn.exec_driver_sql(
+                "SELECT i.url FROM url_index_fts f JOIN url_index i ON i.id = f.rowid WHERE url_index_fts MATCH 'orphan'"
+            ).all()
+            assert hit == [("https://gone",)]
+    finally:
+        engine.dispose()
+
+
+def test_purged_run_refs_migration_nulls_dangling_run_ids(tmp_path: Path):
+    url = f"sqlite:///{tmp_path / 'pre_0015.sqlite3'}"
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            for stmt in _PRE_0003_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        cfg = alembic_cfg(url)
+        command.stamp(cfg, "0002_url_index")
+        command.upgrade(cfg, "0014_url_index_url_id")
+        with engine.begin() as conn:
+            # https://b was last and first seen by run 9, purged before 0015
+            b = "(SELECT id FROM urls WHERE url = 'https://b')"
+            conn.exec_driver_sql(f"UPDATE url_stats SET last_run_id = 9 WHERE url_id = {b}")
+            conn.exec_driver_sql(f"UPDATE query_urls SET first_run_id = 9 WHERE url_id = {b}")
+        command.upgrade(cfg, "head")
+
+        stats = (
+            "SELECT u.url, s.last_run_id, q.first_run_id FROM urls u "
+            "JOIN url_stats s ON s.url_id = u.id JOIN query_urls q ON q.url_id = u.id ORDER BY u.url"
+        )
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(stats).all() == [("https://a", 1, 1), ("https://b", None, None)]
+        assert "ix_url_stats_last_run_id" in {i["name"] for i in inspect(engine).get_indexes("url_stats")}
+        assert "ix_url_index_last_run_id" in {i["name"] for i in inspect(engine).get_indexes("url_index")}
+
+        command.downgrade(cfg, "0014_url_index_url_id")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(stats).all() == [("https://a", 1, 1), ("https://b", 0, 0)]
+        columns = {c["name"]: c for c in inspect(engine).get_columns("query_urls")}
+        assert columns["first_run_id"]["nullable"] is False
+    finally:
+        engine.dispose()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import PayloadArchiveSettings, RetentionSettings
+from app.db.payloads import (
+    PayloadCall,
+    archive_payloads,
+    compress_payload,
+    decompress_payload,
+    encode_payload,
+    load_run_payloads,
+)
+from app.db.queries import init_models, insert_search_run
+from app.db.retention import run_retention
+from app.models import provider_payloads, run_payloads, search_runs
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'payloads.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+def _call(query: str, body: dict, lang: str | None = None) -> PayloadCall:
+    return PayloadCall(provider="serper", query_used=query, lang=lang, geo=None, payload=body)
+
+
+def test_compress_round_trip_and_codec_fallback():
+    body = encode_payload({"organic": [{"link": "https://a", "title": "A"}] * 50})
+    codec, blob = compress_payload(body, "zstd")
+    assert codec in {"zstd", "zlib"}  # zlib when the zstandard package is missing
+    assert len(blob) < len(body)
+    assert decompress_payload(codec, blob) == body
+    assert compress_payload(body, "zlib", level=19)[0] == "zlib"  # level clamped for zlib
+    assert encode_payload({"b": 1, "a": 2}) == encode_payload({"a": 2, "b": 1})
+    with pytest.raises(RuntimeError):
+        decompress_payload("lz4", blob)
+
+
+@pytest.mark.asyncio
+async def test_archive_dedupes_bodies_across_runs(session: AsyncSession):
+    settings = PayloadArchiveSettings()
+    same = {"organic": [{"link": "https://a"}]}
+    run1 = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    stored = await archive_payloads(
+        session, run1, [_call("q", same), _call("q", same, lang="de"), _call("q2", {"organic": []})], settings
+    )
+    run2 = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    stored2 = await archive_payloads(session, run2, [_call("q", dict(reversed(same.items())))], settings)
+    await session.commit()
+
+    assert (stored, stored2) == (2, 0)
+    assert await session.scalar(select(func.count()).select_from(provider_payloads)) == 2
+    assert await session.scalar(select(func.count()).select_from(run_payloads)) == 4
+    calls = await load_run_payloads(session, run1)
+    assert [(c.query_used, c.lang, c.payload) for c in calls] == [
+        ("q", None, same),
+        ("q", "de", same),
+        ("q2", None, {"organic": []}),
+    ]
+    assert await load_run_payloads(session, 424242) == []
+
+
+@pytest.mark.asyncio
+async def test_retention_prunes_bodies_no_run_uses(session: AsyncSession):
+    settings = PayloadArchiveSettings(codec="zlib")
+    old = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await archive_payloads(session, old, [_call("q", {"only": "old"}), _call("q", {"shared": 1})], settings)
+    new = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await archive_payloads(session, new, [_call("q", {"shared": 1})], settings)
+    now = datetime(2025, 6, 1)
+    await session.execute(
+        update(search_runs).where(search_runs.c.id == old).values(run_timestamp=now - timedelta(days=90))
+    )
+    await session.execute(update(search_runs).where(search_runs.c.id == new).values(run_timestamp=now))
+    await session.commit()
+
+    report = await run_retention(session, RetentionSettings(run_max_age_days=30), now=now)
+    assert (report.runs_purged, report.payloads_pruned) == (1, 1)
+    assert [c.payload for c in await load_run_payloads(session, new)] == [{"shared": 1}]
@@ -5,8 +5,10 @@ import shutil
 
 import pytest
 
+from app.core.hashing import dedupe_key
 from app.db.session import get_session_factory
-from app.db.queries import init_models, insert_search_run, get_run
+from app.db.queries import init_models, insert_search_run, get_run, write_raw_records, write_processed_records
+from app.db.urls import upsert_urls
 
 
 pytestmark = pytest.mark.skipif(
@@ -34,3 +36,266 @@ async def test_repositories_work_with_postgres_testcontainers(monkeypatch: pytes
             data = await get_run(session, run_id)
             assert data and data["run"]["id"] == run_id
 
+            # COPY-based bulk path, inside the same transaction as the run row
+            run2 = await insert_search_run(session, "q2", "{}", {}, ["serper"], commit=False)
+            ids = await upsert_urls(session, [f"https://x/{i}" for i in range(50)])
+            n = await write_raw_records(
+                session, run2, (("serper", ids[f"https://x/{i}"], i, {"m": i}) for i in range(50)), commit=False
+            )
+            await write_processed_records(
+                session, run2, [(ids["https://x/0"], ["serper"], 1, dedupe_key("https://x/0"), 1 / 61)], commit=False
+            )
+            await session.commit()
+            assert n == 50
+            data = await get_run(session, run2)
+            assert data and data["processed"][0]["providers"] == ["serper"]
+
+
+@pytest.mark.asyncio
+async def test_raw_partitioning_and_retention_on_postgres():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    import importlib.util
+    from datetime import UTC, datetime, timedelta
+
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from sqlalchemy import Connection, text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config import RetentionSettings
+    from app.db.retention import run_retention
+
+    spec = importlib.util.spec_from_file_location("m0007", "alembic/versions/0007_raw_retention.py")
+    m0007 = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+    spec.loader.exec_module(m0007)  # type: ignore[union-attr]
+
+    def upgrade(sync_conn: Connection) -> None:
+        with Operations.context(MigrationContext.configure(sync_conn)):
+            m0007.upgrade()
+
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        engine = create_async_engine(pg.get_connection_url())
+        try:
+            async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+                await init_models(session)
+                async with engine.begin() as conn:
+                    await conn.run_sync(upgrade)
+                kind = await session.scalar(
+                    text("SELECT relkind FROM pg_class WHERE relname = 'search_results_raw'")
+                )
+                assert kind == "p"
+
+                now = datetime.now(UTC).replace(tzinfo=None)
+                run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+                ids = await upsert_urls(session, ["https://p/1"])
+                await write_raw_records(session, run_id, [("serper", ids["https://p/1"], 1, None)])
+
+                # Over a year later this month's partition has aged out and is dropped whole
+                report = await run_retention(
+                    session, RetentionSettings(run_max_age_days=200), now=now + timedelta(days=400)
+                )
+                assert f"search_results_raw_p{now:%Y%m}" in report.partitions_dropped
+                assert report.partitions_created
+                assert report.runs_purged == 1
+        finally:
+            await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_feed_notify_reaches_listener_on_commit():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    import asyncio
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.db.feed import listen_feed, notify_feed
+
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        engine = create_async_engine(pg.get_connection_url())
+        woke = asyncio.Event()
+        listener = asyncio.create_task(listen_feed(engine, woke.set))
+        try:
+            await asyncio.sleep(0.5)  # let LISTEN register
+            async with async_sessionmaker(bind=engine)() as session:
+                await notify_feed(session, 1)
+                await asyncio.sleep(0.2)
+                assert not woke.is_set()  # held until commit
+                await session.commit()
+            await asyncio.wait_for(woke.wait(), 5)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_purge_runs_evicts_runs_from_another_workers_cache():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    import asyncio
+    from datetime import datetime, timedelta
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.core.run_cache import RunCache
+    from app.db.feed import listen_feed
+    from app.db.retention import purge_runs
+
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        url = pg.get_connection_url()
+        # Two engines stand in for two worker processes
+        worker, purger = create_async_engine(url), create_async_engine(url)
+        cache = RunCache(max_entries=10)
+        evicted = asyncio.Event()
+
+        def forget(run_ids: list[int]) -> None:
+            for rid in run_ids:
+                cache.discard(rid)
+            evicted.set()
+
+        listener = asyncio.create_task(listen_feed(worker, lambda: None, on_runs_changed=forget))
+        try:
+            async with async_sessionmaker(bind=purger)() as session:
+                await init_models(session)
+                run_id = await insert_search_run(session, "q", "{}", {}, ["serper"])
+                cache.put(run_id, b"{}")
+                await asyncio.sleep(0.5)  # let LISTEN register
+                assert await purge_runs(session, datetime.now() + timedelta(days=1)) == 1
+            await asyncio.wait_for(evicted.wait(), 5)
+            assert cache.get(run_id) is None
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await worker.dispose()
+            await purger.dispose()
+
+
+@pytest.mark.asyncio
+async def test_feed_does_not_skip_rows_of_a_run_committed_late():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from app.db.feed import read_feed
+    from app.db.queries import stamp_run_committed
+
+    async def write(session: AsyncSession, url: str) -> int:
+        run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+        ids = await upsert_urls(session, [url])
+        await write_processed_records(
+            session, run_id, [(ids[url], ["serper"], 1, dedupe_key(url), None)], commit=False
+        )
+        return run_id
+
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        engine = create_async_engine(pg.get_connection_url())
+        Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+        try:
+            async with Session() as s:
+                await init_models(s)
+            async with Session() as a, Session() as b, Session() as reader:
+                # Two open transactions: A takes the lower ids, B commits first
+                run_a = await write(a, "https://a")
+                run_b = await write(b, "https://b")
+                await stamp_run_committed(b, run_b)
+                await b.commit()
+
+                first = await read_feed(reader, 0, 100)
+                await reader.commit()
+                assert [r["run_id"] for r in first] == [run_b]
+
+                await stamp_run_committed(a, run_a)
+                await a.commit()
+                late = await read_feed(reader, first[-1]["seq"], 100)
+                assert [r["run_id"] for r in late] == [run_a]
+                assert late[0]["id"] < first[0]["id"]
+        finally:
+            await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_prune_payloads_skips_bodies_an_open_archive_is_linking():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    import asyncio
+
+    from sqlalchemy import delete, func, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config import PayloadArchiveSettings
+    from app.db.payloads import PayloadCall, archive_payloads, prune_payloads
+    from app.models import provider_payloads, run_payloads
+
+    settings = PayloadArchiveSettings(codec="zlib")
+    call = PayloadCall("serper", "q", None, None, {"organic": [{"link": "https://a"}]})
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        engine = create_async_engine(pg.get_connection_url())
+        Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+        try:
+            async with Session() as s:
+                await init_models(s)
+                # An orphaned body: its run's links are gone
+                run0 = await insert_search_run(s, "q", "{}", {}, ["serper"], commit=False)
+                await archive_payloads(s, run0, [call], settings)
+                await s.execute(delete(run_payloads))
+                await s.commit()
+
+            async with Session() as archiver, Session() as pruner:
+                run1 = await insert_search_run(archiver, "q", "{}", {}, ["serper"], commit=False)
+                assert await archive_payloads(archiver, run1, [call], settings) == 0  # known body
+                # The open archive holds the body, so prune skips it instead of waiting or deleting
+                assert await asyncio.wait_for(prune_payloads(pruner), 5) == 0
+                await pruner.commit()
+                await archiver.commit()
+
+                count = select(func.count()).select_from(provider_payloads)
+                assert await pruner.scalar(count) == 1
+                assert await prune_payloads(pruner) == 0  # linked now
+        finally:
+            await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_retention_passes_exclude_each_other():
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except Exception:  # pragma: no cover - only in CI
+        pytest.skip("testcontainers not available")
+    from sqlalchemy import func, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config import RetentionSettings
+    from app.db import retention
+
+    with PostgresContainer("postgres:16-alpine", driver="asyncpg") as pg:
+        url = pg.get_connection_url()
+        # Two engines stand in for two worker processes
+        holder, worker = create_async_engine(url), create_async_engine(url)
+        factory = async_sessionmaker(bind=worker, expire_on_commit=False)
+        try:
+            async with factory() as session:
+                await init_models(session)
+            settings = RetentionSettings(run_max_age_days=30)
+            async with holder.connect() as conn:
+                assert await conn.scalar(select(func.pg_try_advisory_lock(retention._LOCK_KEY)))
+                assert await retention.exclusive_retention(settings, factory) is None
+                await conn.scalar(select(func.pg_advisory_unlock(retention._LOCK_KEY)))
+            assert await retention.exclusive_retention(settings, factory) is not None
+            # The pass released its lock
+            async with holder.connect() as conn:
+                assert await conn.scalar(select(func.pg_try_advisory_lock(retention._LOCK_KEY)))
+        finally:
+            await holder.dispose()
+            await worker.dispose()
@@ -82,8 +82,8 @@ async def test_insert_run_and_results(session: AsyncSession):
         session,
         run_id,
         [
-            {"url": "https://a", "providers": ["serper"], "confidence": 1, "dedupe_hash": "h1"},
-            {"url": "https://b", "providers": ["google"], "confidence": 1, "dedupe_hash": "h2"},
+            {"url": "https://a", "providers": ["serper"], "confidence": 1, "dedupe_hash": b"h1"},
+            {"url": "https://b", "providers": ["google"], "confidence": 1, "dedupe_hash": b"h2"},
         ],
     )
 
@@ -100,7 +100,7 @@ async def test_processed_unique_constraint(session: AsyncSession):
         session,
         run_id,
         [
-            {"url": "https://same", "providers": ["serper"], "confidence": 1, "dedupe_hash": "dup"}
+            {"url": "https://same", "providers": ["serper"], "confidence": 1, "dedupe_hash": b"dup"}
         ],
     )
     with pytest.raises(IntegrityError):
@@ -109,6 +109,6 @@ async def test_processed_unique_constraint(session: AsyncSession):
             session,
             run_id,
             [
-                {"url": "https://same", "providers": ["serper"], "confidence": 2, "dedupe_hash": "dup"}
+                {"url": "https://same", "providers": ["serper"], "confidence": 2, "dedupe_hash": b"dup"}
             ],
         )
@@ -15,6 +15,9 @@ from app.db.queries import (
     insert_search_run,
     get_run,
     list_runs,
+    iter_runs,
+    encode_run_cursor,
+    decode_run_cursor,
     bulk_insert_raw,
     bulk_insert_processed,
 )
@@ -71,6 +74,31 @@ async def test_list_runs_filters(session: AsyncSession):
     assert rows_none == []
 
 
+@pytest.mark.asyncio
+async def test_iter_runs_keyset_pages_newest_first(session: AsyncSession):
+    ids = [await insert_search_run(session, "paged", "{}", {}, ["serper"]) for _ in range(5)]
+    await insert_search_run(session, "other", "{}", {}, ["serper"])
+
+    assert [r["id"] for r in await list_runs(session, {"query": "paged"})] == ids[::-1]
+
+    seen: list[int] = []
+    after = None
+    while True:
+        page = [r async for r in iter_runs(session, {"query": "paged"}, after=after, limit=2, batch_size=1)]
+        if not page:
+            break
+        seen += [r["id"] for r in page]
+        after = decode_run_cursor(encode_run_cursor(page[-1]["run_timestamp"], page[-1]["id"]))
+    assert seen == ids[::-1]
+
+
+def test_decode_run_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_run_cursor("%%%")
+    with pytest.raises(ValueError):
+        decode_run_cursor(encode_run_cursor(datetime(2025, 1, 1), 1)[:-3])
+
+
 @pytest.mark.asyncio
 async def test_get_run_not_found(session: AsyncSession):
     out = await get_run(session, 999999)
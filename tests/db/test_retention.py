@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import Table, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.cli import main as cli_main
+from app.config import RetentionSettings
+from app.core.hashing import dedupe_key
+from app.db.novelty import get_novel_results, mark_novel, novelty_key
+from app.db.queries import (
+    bulk_insert_processed,
+    bulk_insert_raw,
+    init_models,
+    insert_search_run,
+    stamp_run_committed,
+)
+from app.db.retention import (
+    compact_raw,
+    load_raw_archive,
+    purge_runs,
+    raw_partition_ddl,
+    raw_partition_months,
+    retention_loop,
+    run_retention,
+)
+from app.db.search_index import refresh_search_index
+from app.db.url_stats import upsert_url_stats
+from app.models import (
+    query_urls as t_query_urls,
+    search_raw_archive as t_archive,
+    search_results_processed as t_processed,
+    search_results_raw as t_raw,
+    search_runs as t_runs,
+    url_index as t_index,
+    url_stats as t_stats,
+    urls as t_urls,
+)
+
+NOW = datetime(2025, 6, 15, 12, 0)
+
+
+@pytest_asyncio.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'retention.sqlite3'}")
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with Session() as s:
+        await init_models(s)
+    yield Session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session(factory) -> AsyncSession:
+    async with factory() as s:
+        yield s
+
+
+async def _run(session: AsyncSession, age_days: int, urls: list[str]) -> int:
+    run_id = await insert_search_run(session, f"q{age_days}", "{}", {}, ["serper"], commit=False)
+    await session.execute(
+        update(t_runs).where(t_runs.c.id == run_id).values(run_timestamp=NOW - timedelta(days=age_days))
+    )
+    await bulk_insert_raw(
+        session,
+        run_id,
+        [{"provider": "serper", "url": u, "rank": i, "meta": {"title": u}} for i, u in enumerate(urls, 1)],
+        commit=False,
+    )
+    await bulk_insert_processed(
+        session,
+        run_id,
+        [{"url": u, "providers": ["serper"], "confidence": 1, "dedupe_hash": dedupe_key(u)} for u in urls],
+        commit=False,
+    )
+    await session.commit()
+    return run_id
+
+
+async def _count(session: AsyncSession, table: Table, run_ids: list[int]) -> int:
+    return (await session.execute(select(func.count()).where(table.c.run_id.in_(run_ids)))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_purge_runs_deletes_old_runs_and_children_in_batches(session: AsyncSession):
+    old = [await _run(session, 40 + i, [f"https://old/{i}"]) for i in range(5)]
+    fresh = await _run(session, 1, ["https://fresh"])
+    seen: list[list[int]] = []
+
+    n = await purge_runs(session, NOW - timedelta(days=30), batch_size=2, on_purged=seen.append)
+
+    assert n == 5
+    assert [len(b) for b in seen] == [2, 2, 1]
+    assert sorted(i for b in seen for i in b) == sorted(old)
+    remaining = (await session.execute(select(t_runs.c.id))).scalars().all()
+    assert remaining == [fresh]
+    assert await _count(session, t_raw, old) == 0
+    assert await _count(session, t_processed, old) == 0
+
+
+@pytest.mark.asyncio
+async def test_purge_runs_nulls_run_ids_kept_without_foreign_keys(session: AsyncSession):
+    old = await _run(session, 40, ["https://shared", "https://old"])
+    fresh = await _run(session, 1, ["https://shared"])
+    key = novelty_key("q")
+    for run_id in (old, fresh):
+        url_ids = (
+            await session.execute(select(t_processed.c.url_id).where(t_processed.c.run_id == run_id))
+        ).scalars().all()
+        await upsert_url_stats(session, run_id, [(u, 1) for u in url_ids])
+        await mark_novel(session, key, run_id, url_ids)
+        await stamp_run_committed(session, run_id)
+    await session.commit()
+    await refresh_search_index(session)
+
+    await purge_runs(session, NOW - timedelta(days=30))
+
+    stats = (
+        await session.execute(
+            select(t_urls.c.url, t_stats.c.last_run_id)
+            .join(t_stats, t_stats.c.url_id == t_urls.c.id)
+            .order_by(t_urls.c.url)
+        )
+    ).all()
+    assert stats == [("https://old", None), ("https://shared", fresh)]
+    # First sightings stay, so the purge does not make old URLs novel again
+    firsts = (
+        await session.execute(
+            select(t_urls.c.url, t_query_urls.c.first_run_id)
+            .join(t_query_urls, t_query_urls.c.url_id == t_urls.c.id)
+            .order_by(t_urls.c.url)
+        )
+    ).all()
+    assert firsts == [("https://old", None), ("https://shared", None)]
+    seen = (await session.execute(select(t_query_urls.c.url_id))).scalars().all()
+    assert await mark_novel(session, key, fresh + 1, seen) == set()
+    indexed = (
+        await session.execute(
+            select(t_urls.c.url, t_index.c.last_run_id)
+            .join(t_index, t_index.c.url_id == t_urls.c.id)
+            .order_by(t_urls.c.url)
+        )
+    ).all()
+    assert indexed == [("https://old", None), ("https://shared", fresh)]
+    assert await get_novel_results(session, fresh) == []
+
+
+@pytest.mark.asyncio
+async def test_purge_runs_notifies_other_workers_inside_each_batch(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+):
+    old = [await _run(session, 40 + i, [f"https://old/{i}"]) for i in range(3)]
+    sent: list[tuple[list[int], bool]] = []
+
+    async def notify(s: AsyncSession, run_ids: list[int]) -> None:
+        # Queued before the delete commits, so listeners never see a half-purged batch
+        sent.append((list(run_ids), s.in_transaction()))
+
+    monkeypatch.setattr("app.db.retention.notify_runs_changed", notify)
+    await purge_runs(session, NOW - timedelta(days=30), batch_size=2)
+
+    assert [ids for ids, _ in sent] == [old[::-1][:2], old[::-1][2:]]
+    assert all(in_tx for _, in_tx in sent)
+
+
+@pytest.mark.asyncio
+async def test_compact_raw_archives_rows_per_run(session: AsyncSession):
+    old = await _run(session, 10, ["https://a", "https://b"])
+    fresh = await _run(session, 1, ["https://c"])
+
+    assert await compact_raw(session, NOW - timedelta(days=7), batch_size=1) == (1, 2)
+
+    assert await _count(session, t_raw, [old]) == 0
+    assert await _count(session, t_raw, [fresh]) == 1
+    assert await _count(session, t_processed, [old]) == 2  # processed rows are untouched
+    assert await load_raw_archive(session, old) == [
+        {"provider": "serper", "url": "https://a", "rank": 1, "meta": {"title": "https://a"}},
+        {"provider": "serper", "url": "https://b", "rank": 2, "meta": {"title": "https://b"}},
+    ]
+    assert await load_raw_archive(session, fresh) is None
+    # Nothing left to compact on a second pass
+    assert await compact_raw(session, NOW - timedelta(days=7)) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_run_retention_applies_policy_and_purges_archives(session: AsyncSession):
+    ancient = await _run(session, 100, ["https://x"])
+    old = await _run(session, 20, ["https://y"])
+    fresh = await _run(session, 1, ["https://z"])
+
+    settings = RetentionSettings(run_max_age_days=90, raw_compact_after_days=14)
+    report = await run_retention(session, settings, now=NOW)
+
+    assert (report.runs_compacted, report.raw_rows_archived, report.runs_purged) == (2, 2, 1)
+    assert report.partitions_dropped == []  # SQLite: no partitions
+    assert (await session.execute(select(t_archive.c.run_id))).scalars().all() == [old]
+    assert await _count(session, t_raw, [fresh]) == 1
+    assert (await session.execute(select(t_runs.c.id).where(t_runs.c.id == ancient))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_retention_loop_runs_until_cancelled(factory):
+    async with factory() as s:
+        await _run(s, 400, ["https://gone"])
+    purged: list[int] = []
+    task = asyncio.create_task(
+        retention_loop(RetentionSettings(run_max_age_days=1, interval_seconds=60), factory, on_purged=purged.extend)
+    )
+    for _ in range(100):
+        if purged:
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert len(purged) == 1
+
+
+def test_cli_retention_prints_report(tmp_path, monkeypatch: pytest.MonkeyPatch, capsys):
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'cli.sqlite3'}")
+    monkeypatch.setattr("app.db.session._engine", None)
+    monkeypatch.setattr("app.db.session._session_factory", None)
+
+    async def seed() -> None:
+        from app.db.session import get_engine, get_session_factory
+
+        async with get_session_factory()() as s:
+            await init_models(s)
+            await _run(s, 3650, ["https://cli"])
+        await get_engine().dispose()
+
+    asyncio.run(seed())
+    cli_main(["retention", "--run-max-age-days", "30"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["runs_purged"] == 1
+
+
+def test_raw_partition_months_cover_history_and_lookahead():
+    months = list(raw_partition_months(datetime(2024, 11, 20), datetime(2025, 1, 5), 2))
+    assert [m.strftime("%Y-%m") for m in months] == ["2024-11", "2024-12", "2025-01", "2025-02", "2025-03"]
+    name, ddl = raw_partition_ddl(datetime(2024, 12, 1))
+    assert name == "search_results_raw_p202412"
+    assert "FROM ('2024-12-01') TO ('2025-01-01')" in ddl
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.adapters.local_index import LocalIndexAdapter
+from app.core.schema import ProviderNeutralQuery
+from app.db.queries import bulk_insert_raw, init_models, insert_search_run, stamp_run_committed
+from app.db.search_index import refresh_search_index, search_index
+from app.db.session import get_session_factory
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path, monkeypatch: pytest.MonkeyPatch) -> AsyncSession:
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'index.sqlite3'}")
+    import app.db.session as sess
+
+    sess._engine = None  # type: ignore[attr-defined]
+    sess._session_factory = None  # type: ignore[attr-defined]
+    Session = get_session_factory()
+    async with Session() as s:
+        await init_models(s)
+        yield s
+
+
+async def _seed(session: AsyncSession, *, commit: bool = True) -> int:
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await bulk_insert_raw(
+        session,
+        run_id,
+        [
+            {
+                "provider": "serper",
+                "url": "https://openai.com/blog/gpt",
+                "rank": 1,
+                "meta": {"title": "OpenAI API release", "snippet": "New models for developers"},
+            },
+            {"provider": "google", "url": "https://openai.com/blog/gpt", "rank": 2, "meta": {}},
+            {
+                "provider": "serper",
+                "url": "https://news.example.org/ai",
+                "rank": 2,
+                "meta": {"title": "AI regulation news", "snippet": "The EU AI Act"},
+            },
+            # Served by the local index itself; never folded back in
+            {"provider": "local", "url": "https://old.example.net/ai", "rank": 1, "meta": {}},
+        ],
+        commit=False,
+    )
+    if commit:
+        # As the orchestrator does: stamp the commit order last, then commit
+        await stamp_run_committed(session, run_id)
+        await session.commit()
+    return run_id
+
+
+@pytest.mark.asyncio
+async def test_refresh_is_incremental(session: AsyncSession):
+    await _seed(session)
+    assert await refresh_search_index(session) == 3
+    assert await refresh_search_index(session) == 0
+    await _seed(session)
+    await _seed(session)
+    assert await refresh_search_index(session, batch_size=1) == 6
+    assert await refresh_search_index(session) == 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_waits_for_runs_committed_late(session: AsyncSession):
+    # A run whose transaction is still open has no commit order yet
+    late = await _seed(session, commit=False)
+    await session.commit()
+    await _seed(session)
+    assert await refresh_search_index(session) == 3
+
+    # It commits after a newer run was indexed and is still picked up
+    await stamp_run_committed(session, late)
+    await session.commit()
+    assert await refresh_search_index(session) == 3
+
+
+@pytest.mark.asyncio
+async def test_refresh_skips_rows_served_by_local_index(session: AsyncSession):
+    await _seed(session)
+    await refresh_search_index(session)
+    assert await search_index(session, ProviderNeutralQuery(keywords=["old"])) == []
+
+
+@pytest.mark.asyncio
+async def test_search_index_matches_keywords_and_sites(session: AsyncSession):
+    await _seed(session)
+    await refresh_search_index(session)
+
+    schema = ProviderNeutralQuery(keywords=["openai api"])
+    assert await search_index(session, schema) == ["https://openai.com/blog/gpt"]
+
+    either = ProviderNeutralQuery(keywords=["developers", "regulation"], boolean="OR")
+    assert set(await search_index(session, either)) == {
+        "https://openai.com/blog/gpt",
+        "https://news.example.org/ai",
+    }
+
+    both = ProviderNeutralQuery(keywords=["developers", "regulation"])
+    assert await search_index(session, both) == []
+
+    scoped = ProviderNeutralQuery(keywords=["ai"], filters={"sites": ["example.org"]})
+    assert await search_index(session, scoped) == ["https://news.example.org/ai"]
+
+
+@pytest.mark.asyncio
+async def test_local_adapter_searches_refreshed_index(session: AsyncSession):
+    await _seed(session)
+    await refresh_search_index(session)
+    adapter = LocalIndexAdapter(session_factory=get_session_factory())
+    res = await adapter.search(ProviderNeutralQuery(keywords=["EU AI act"]))
+    assert res.provider == "local"
+    assert res.urls == ["https://news.example.org/ai"]
+    assert res.meta["raw_count"] == 1
+
+
+def test_cli_index_refresh_prints_rows_consumed(tmp_path, monkeypatch: pytest.MonkeyPatch, capsys):
+    import asyncio
+    import json
+
+    from app.cli import main as cli_main
+    from app.db.session import get_engine
+
+    monkeypatch.setenv("SH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path/'cli.sqlite3'}")
+    monkeypatch.setattr("app.db.session._engine", None)
+    monkeypatch.setattr("app.db.session._session_factory", None)
+
+    async def seed() -> None:
+        async with get_session_factory()() as s:
+            await init_models(s)
+            await _seed(s)
+        await get_engine().dispose()
+
+    asyncio.run(seed())
+    cli_main(["index-refresh"])
+    assert json.loads(capsys.readouterr().out) == {"raw_rows": 3}
+
+
+@pytest.mark.asyncio
+async def test_index_rows_reference_urls(session: AsyncSession):
+    from sqlalchemy import select
+
+    from app.models import url_index as t_index, urls as t_urls
+
+    await _seed(session)
+    await refresh_search_index(session)
+    rows = await session.execute(
+        select(t_urls.c.url, t_index.c.seen_count).join(t_index, t_index.c.url_id == t_urls.c.id)
+    )
+    # One row per URL, counted across providers; the text stays in `urls`
+    assert dict(rows.tuples().all()) == {"https://openai.com/blog/gpt": 2, "https://news.example.org/ai": 1}
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.hashing import url_key
+from app.core.providers import provider_mask, providers_from_mask
+from app.db.queries import init_models, insert_search_run
+from app.db.url_stats import get_url_stats, upsert_url_stats
+from app.db.urls import upsert_urls
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path) -> AsyncSession:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'stats.sqlite3'}")
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as s:
+        await init_models(s)
+        yield s
+    await engine.dispose()
+
+
+def test_provider_mask_round_trip():
+    mask = provider_mask(["brave", "serper", "unknown"])
+    assert mask == 0b101
+    assert providers_from_mask(mask) == ["serper", "brave"]
+
+
+@pytest.mark.asyncio
+async def test_upsert_url_stats_accumulates_across_runs(session: AsyncSession):
+    ids = await upsert_urls(session, ["https://a", "https://b"])
+    t1, t2 = datetime(2025, 1, 1), datetime(2025, 2, 1)
+    run1 = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    await upsert_url_stats(session, run1, [(ids["https://a"], provider_mask(["serper"]))], seen_at=t2)
+    run2 = await insert_search_run(session, "q", "{}", {}, ["google"], commit=False)
+    await upsert_url_stats(
+        session,
+        run2,
+        [(ids["https://a"], provider_mask(["google"])), (ids["https://b"], provider_mask(["google"]))],
+        seen_at=t1,  # written out of order: widens first_seen, leaves last_seen
+    )
+    await session.commit()
+
+    a = await get_url_stats(session, url="https://a")
+    assert a is not None
+    assert (a["run_count"], a["providers"], a["last_run_id"]) == (2, ["serper", "google"], run2)
+    assert (a["first_seen"], a["last_seen"]) == (t1, t2)
+    b = await get_url_stats(session, url_hash=url_key("https://b"))
+    assert b and b["run_count"] == 1 and b["url"] == "https://b"
+    assert await get_url_stats(session, url="https://never") is None
+
+
+@pytest.mark.asyncio
+async def test_upsert_url_stats_writes_in_url_id_order(session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    ids = await upsert_urls(session, ["https://a", "https://b", "https://c"])
+    run_id = await insert_search_run(session, "q", "{}", {}, ["serper"], commit=False)
+    written: list[int] = []
+    execute = session.execute
+
+    async def record(stmt, params=None, *args, **kwargs):
+        if isinstance(params, list):
+            written.extend(p["url_id"] for p in params)
+        return await execute(stmt, params, *args, **kwargs)
+
+    monkeypatch.setattr(session, "execute", record)
+    # Score order differs between runs; lock order on shared rows must not
+    await upsert_url_stats(session, run_id, [(ids[u], 1) for u in ("https://c", "https://a", "https://b")])
+    assert written == sorted(ids.values())
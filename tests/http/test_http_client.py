@@ -101,3 +101,28 @@ async def test_telemetry_hooks_called_and_run_id_propagated():
     finally:
         await client.aclose()
 
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_retry_after_is_opt_in_and_capped(monkeypatch: pytest.MonkeyPatch):
+    delays: list[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr("app.http.client.asyncio.sleep", fake_sleep)
+    respx.get("https://example.com/busy").mock(
+        return_value=httpx.Response(429, headers={"Retry-After": "30"})
+    )
+
+    client = build_async_client()
+    try:
+        base = RetryPolicy(max_attempts=2, backoff_base_s=0.01, jitter_s=0.0)
+        await request_with_retries(client, "GET", "https://example.com/busy", policy=base)
+        opted_in = RetryPolicy(max_attempts=2, backoff_base_s=0.01, jitter_s=0.0, max_retry_after_s=0.5)
+        await request_with_retries(client, "GET", "https://example.com/busy", policy=opted_in)
+    finally:
+        await client.aclose()
+    # The default keeps the exponential backoff; opting in waits up to the cap
+    assert delays == [0.01, 0.5]
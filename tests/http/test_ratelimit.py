@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import ProviderRateLimit, SearchSettings
+from app.http.ratelimit import RateLimiter, get_provider_limiter, reset_limiters
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_caps_concurrency():
+    limiter = RateLimiter(max_concurrency=2)
+    active = 0
+    peak = 0
+
+    async def work():
+        nonlocal active, peak
+        async with limiter:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(work() for _ in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_paces_request_starts():
+    limiter = RateLimiter(max_concurrency=10, requests_per_second=50)
+    starts: list[float] = []
+
+    async def work():
+        async with limiter:
+            starts.append(time.monotonic())
+
+    await asyncio.gather(*(work() for _ in range(4)))
+    # 4 starts at 50 rps need at least 3 intervals of 20ms
+    assert starts[-1] - starts[0] >= 0.055
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_releases_slot_when_cancelled_while_pacing():
+    limiter = RateLimiter(max_concurrency=1, requests_per_second=1)
+    async with limiter:
+        pass  # the next start is now ~1s away
+
+    async def paced():
+        async with limiter:
+            pass
+
+    task = asyncio.create_task(paced())
+    await asyncio.sleep(0.01)  # holds the only slot, sleeping for its start
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The slot came back: acquiring it again does not block
+    await asyncio.wait_for(limiter._sem.acquire(), timeout=0.1)
+    limiter._sem.release()
+
+
+@pytest.mark.asyncio
+async def test_provider_limiter_shared_per_provider():
+    reset_limiters()
+    settings = SearchSettings(rate_limits={"brave": ProviderRateLimit(max_concurrency=1)})
+    brave = get_provider_limiter("brave", settings)
+    assert brave is get_provider_limiter("brave", settings)
+    assert brave.max_concurrency == 1
+    assert get_provider_limiter("serper", settings).max_concurrency == 4
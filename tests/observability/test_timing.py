@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from app.observability.timing import StageTimer, parse_server_timing
+
+
+def test_stage_timer_accumulates_and_round_trips_server_timing():
+    timer = StageTimer()
+    with timer.stage("db"):
+        pass
+    with timer.stage("db"):
+        pass
+    with timer.stage("llm"):
+        pass
+    assert list(timer.stages) == ["db", "llm"]
+    parsed = parse_server_timing(timer.server_timing())
+    assert set(parsed) == {"db", "llm"}
+    assert all(v >= 0 for v in parsed.values())
+
+
+def test_parse_server_timing_skips_entries_without_duration():
+    assert parse_server_timing('cache;desc="hit", db;dur=12.5, bad;dur=x') == {"db": 12.5}
+    assert parse_server_timing("") == {}
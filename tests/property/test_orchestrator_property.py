@@ -5,6 +5,7 @@ from itertools import chain
 
 from hypothesis import given, strategies as st
 
+from app.core.canonical import get_canonicalizer
 from app.core.orchestrator import orchestrate
 from app.core.schema import ProviderNeutralQuery
 from app.db.queries import init_models
@@ -58,13 +59,14 @@ def test_orchestrator_confidence_equals_distinct_provider_count(providers, serpe
                 adapters=adapters,
                 session=s,
             )
-            by_url = {p.url: p for p in out.processed}
-            # Expected providers for each URL
+            by_url = {p.canonical_url: p for p in out.processed}
+            # Expected providers for each canonical URL (www./m./trailing-slash variants fold)
+            canon = get_canonicalizer(rc.settings.search.canonicalization).canonicalize
             expected_map = {}
             for name, urls in [("serper", serper_urls), ("google", google_urls), ("brave", brave_urls)]:
                 if name in providers:
                     for u in urls:
-                        expected_map.setdefault(u, set()).add(name)
+                        expected_map.setdefault(canon(u), set()).add(name)
             for u, provs in expected_map.items():
                 assert by_url[u].confidence == len(provs)
 
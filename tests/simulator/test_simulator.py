@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+
+import httpx
+import pytest
+
+from app.adapters.brave import BraveAdapter
+from app.adapters.google import GoogleCSEAdapter
+from app.adapters.serper import SerperAdapter
+from app.config import LLMSettings
+from app.core.schema import ProviderNeutralQuery
+from app.http.client import RetryPolicy, request_with_retries
+from app.llm.client import LLMClient
+from app.simulator import (
+    EndpointProfile,
+    LatencyProfile,
+    RedirectTransport,
+    SimulatorProfile,
+    simulator_client,
+)
+
+
+@pytest.mark.asyncio
+async def test_adapters_parse_simulated_wire_formats():
+    client = simulator_client(SimulatorProfile(url_pool=50))
+    schema = ProviderNeutralQuery(keywords=["openai"], filters={"max_results": 8})
+    try:
+        serper = await SerperAdapter(api_key="k", client=client).search(schema)
+        google = await GoogleCSEAdapter(api_key="k", cse_id="cx", client=client).search(schema)
+        brave = await BraveAdapter(api_key="k", client=client).search(schema)
+    finally:
+        await client.aclose()
+    assert len(serper.urls) == 8
+    assert len(google.urls) == 8
+    assert len(brave.urls) == 8
+    assert brave.details[0]["snippet"]
+    # overlapping windows of the same per-query permutation
+    assert set(serper.urls) & set(google.urls)
+
+
+@pytest.mark.asyncio
+async def test_llm_client_against_simulator():
+    client = simulator_client(SimulatorProfile(llm_schema={"keywords": ["eu", "ai act"]}))
+    llm = LLMClient(settings=LLMSettings(), api_key="sk", prompt_text="p", http=client)
+    try:
+        schema, template = await llm.rewrite_query("anything")
+    finally:
+        await client.aclose()
+    assert schema.keywords == ["eu", "ai act"]
+    assert "ai act" in template
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_responses_carry_retry_after_and_are_retried():
+    profile = SimulatorProfile(serper=EndpointProfile(rate_429=1.0, retry_after_s=0.05))
+    client = simulator_client(profile)
+    try:
+        t0 = time.perf_counter()
+        resp = await request_with_retries(
+            client,
+            "POST",
+            "https://google.serper.dev/search",
+            json={"q": "x"},
+            policy=RetryPolicy(max_attempts=2, backoff_base_s=0.0, jitter_s=0.0, max_retry_after_s=1.0),
+        )
+        elapsed = time.perf_counter() - t0
+        stats = (await client.get("http://sim/_sim/stats")).json()
+    finally:
+        await client.aclose()
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "0.05"
+    assert elapsed >= 0.05
+    assert stats["serper"]["429"] == 2
+
+
+@pytest.mark.asyncio
+async def test_error_rate_latency_and_runtime_profile_swap():
+    profile = SimulatorProfile(
+        seed=1, google=EndpointProfile(error_rate=1.0, latency=LatencyProfile(ms=20))
+    )
+    client = simulator_client(profile)
+    try:
+        t0 = time.perf_counter()
+        bad = await client.get("https://www.googleapis.com/customsearch/v1", params={"q": "x"})
+        assert bad.status_code == 500
+        assert time.perf_counter() - t0 >= 0.02
+        # recover from the brownout without rebuilding the client
+        swap = await client.put("http://sim/_sim/profile", json={"google": {"results": 3}})
+        assert swap.status_code == 200
+        ok = await client.get("https://www.googleapis.com/customsearch/v1", params={"q": "x"})
+        assert ok.status_code == 200
+        assert len(ok.json()["items"]) == 3
+    finally:
+        await client.aclose()
+
+
+def test_latency_distributions_sample_within_bounds():
+    import random
+
+    rng = random.Random(0)
+    uni = LatencyProfile(distribution="uniform", min_ms=10, max_ms=20)
+    assert all(0.010 <= uni.sample_s(rng) <= 0.020 for _ in range(100))
+    logn = LatencyProfile(distribution="lognormal", ms=100, sigma=0.5)
+    samples = sorted(logn.sample_s(rng) for _ in range(501))
+    assert 0.07 < samples[250] < 0.14
+
+
+@pytest.mark.asyncio
+async def test_redirect_transport_rewrites_host():
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(str(request.url))
+        return httpx.Response(200, json={})
+
+    transport = RedirectTransport("http://127.0.0.1:9100", inner=httpx.MockTransport(handler))
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.get("https://api.search.brave.com/res/v1/web/search?q=a")
+    assert seen == ["http://127.0.0.1:9100/res/v1/web/search?q=a"]
+
+
+def test_example_profile_loads():
+    profile = SimulatorProfile.from_yaml("configs/simulator.yaml")
+    assert profile.google.retry_after_s == 1
+    assert profile.brave.latency.distribution == "uniform"
@@ -11,3 +11,12 @@ def test_app_startup_creates_fastapi_app():
     # openapi schema should be buildable
     assert app.openapi()  # type: ignore[truthy-function]
 
+
+
+def test_app_import_does_not_load_provider_simulator():
+    import subprocess
+    import sys
+
+    code = "import sys, app.main; print('app.simulator' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
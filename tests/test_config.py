@@ -41,6 +41,20 @@ def test_secret_presence_serper_prod(monkeypatch: pytest.MonkeyPatch):
     assert rc.settings.search.provider == "serper"
 
 
+def test_local_index_does_not_satisfy_auto_provider_secrets(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SH_ENVIRONMENT", "prod")
+    monkeypatch.setenv("SH_SEARCH__CASCADE_ORDER", '["local", "serper"]')
+    monkeypatch.setenv("SH_LLM__PROVIDER", "local")
+    for name in ("SH_SERPER_KEY", "SH_GOOGLE_API_KEY", "SH_GOOGLE_CSE_ID", "SH_BRAVE_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValueError) as e:
+        load_runtime_config()
+    assert "SH_SERPER_KEY" in str(e.value)
+
+    monkeypatch.setenv("SH_SERPER_KEY", "test-key")
+    assert load_runtime_config().settings.search.cascade_order == ["local", "serper"]
+
+
 def test_llm_secret_presence_openai_prod(monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setenv("SH_ENVIRONMENT", "prod")
     # ensure provider requirement is satisfied independently
@@ -66,3 +80,11 @@ async def test_app_boot_reads_config(app, client):
     rc = app.state.runtime_config
     assert isinstance(rc.settings, AppConfig)
     assert rc.settings.environment in {"dev", "test", "staging", "prod"}
+
+
+def test_retention_run_in_process_accepts_old_key():
+    from app.config import RetentionSettings
+
+    assert RetentionSettings().run_in_process is False
+    assert RetentionSettings.model_validate({"enabled": True}).run_in_process is True
+    assert RetentionSettings.model_validate({"run_in_process": True}).run_in_process is True